@@ -0,0 +1,208 @@
+# backend/benchmarks/executar.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+from typing import Any, Callable, Dict, List
+
+# Adiciona o diretório 'backend' ao sys.path para importar o pacote 'services'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+ENTRADAS_PADRAO = os.path.join(DIRETORIO, "entradas_gravadas.json")
+# A baseline depende da máquina: gere a sua com --salvar-baseline antes de comparar
+BASELINE_PADRAO = os.path.join(DIRETORIO, "baseline.json")
+LIMITE_PADRAO = float(os.getenv("BENCHMARK_LIMITE", "0.25"))   # 25% de piora tolerada
+
+LOCATION_BENCHMARK = "benchmark-location"
+
+# Custom fields usados por build_contact_payload (evita chamar o GHL durante a medição)
+CUSTOM_FIELDS_BENCHMARK = {
+    "contact.cpf_ou_cnpj": "cf-cpf",
+    "contact.consumo_medio_mensal": "cf-consumo",
+    "contact.potncia_dos_mdulos_w": "cf-pot-modulos",
+    "contact.potncia_do_sistema_kw": "cf-pot-sistema",
+    "contact.quantidade_de_mdulos": "cf-qtd-modulos",
+    "contact.valor_da_proposta_r": "cf-valor",
+    "contact.observaes_da_proposta": "cf-observacoes",
+}
+
+
+def preparar_ambiente(diretorio_temp: str) -> None:
+    """Isola fila, tokens e cache de custom fields num diretório temporário (antes de importar main)."""
+    os.environ.setdefault("WEBHOOK_URL", "http://localhost/benchmark")
+    os.environ["FILA_DB_PATH"] = os.path.join(diretorio_temp, "fila.db")
+    os.environ["TOKENS_DB_PATH"] = os.path.join(diretorio_temp, "tokens.db")
+    os.environ["CUSTOM_FIELDS_CACHE_DIR"] = diretorio_temp
+    with open(os.path.join(diretorio_temp, f"{LOCATION_BENCHMARK}.json"), "w", encoding="utf-8") as f:
+        json.dump({"obtido_em": time.time() + 86400 * 365, "campos": CUSTOM_FIELDS_BENCHMARK}, f)
+
+
+def medir(funcao: Callable[[Any], Any], entradas: List[Any], repeticoes: int, aquecimento: int) -> Dict[str, float]:
+    """
+    Executa `funcao` sobre todas as entradas `repeticoes` vezes. Latência é o
+    tempo médio por chamada em cada rodada (mediana e p95 entre rodadas);
+    vazão é o total de chamadas dividido pelo tempo total.
+    """
+    for _ in range(aquecimento):
+        for entrada in entradas:
+            funcao(entrada)
+
+    por_chamada = []
+    total = 0.0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for entrada in entradas:
+            funcao(entrada)
+        decorrido = time.perf_counter() - inicio
+        total += decorrido
+        por_chamada.append(decorrido / len(entradas))
+
+    por_chamada.sort()
+    p95 = por_chamada[min(len(por_chamada) - 1, int(round(0.95 * (len(por_chamada) - 1))))]
+    return {
+        "latencia_us_mediana": round(statistics.median(por_chamada) * 1e6, 3),
+        "latencia_us_p95": round(p95 * 1e6, 3),
+        "ops_por_segundo": round(repeticoes * len(entradas) / total, 1),
+    }
+
+
+def montar_benchmarks(formularios: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """(função, entradas) de cada benchmark, a partir dos formulários gravados."""
+    from fastapi.testclient import TestClient
+
+    import main
+    from services.cache_precificacao import cache_precificacao
+    from services.calculos import calcular_detalhamento_proposta, calcular_valor_proposta
+    from services.contact_manager import build_contact_payload
+    from services.propostas import montar_inputs_calculo, montar_payload_webhook
+
+    inputs = [montar_inputs_calculo(f) for f in formularios]
+    payloads_webhook = [montar_payload_webhook(f, calcular_detalhamento_proposta(i)) for f, i in zip(formularios, inputs)]
+    # /calcular recebe o PropostaInput completo, como o frontend enviava
+    corpos_calcular = [main.PropostaInput(**i).dict() for i in inputs]
+
+    # Sem o gerenciador de contexto: não dispara o startup (workers e agendador de tokens)
+    cliente = TestClient(main.app)
+
+    def rota_calcular_cache(corpo):
+        resp = cliente.post("/calcular", json=corpo)
+        if resp.status_code != 200:
+            raise RuntimeError(f"/calcular respondeu {resp.status_code}: {resp.text}")
+        return resp
+
+    def rota_calcular(corpo):
+        # Esvazia o cache de precificação a cada chamada: mede validação + cálculo, não só o acerto
+        cache_precificacao.invalidar()
+        return rota_calcular_cache(corpo)
+
+    return {
+        "calcular_valor_proposta": (calcular_valor_proposta, inputs),
+        "proposta_input_validacao": (lambda corpo: main.PropostaInput(**corpo), corpos_calcular),
+        "rota_calcular": (rota_calcular, corpos_calcular),
+        # Após o aquecimento, todas as chamadas acertam o cache
+        "rota_calcular_cache": (rota_calcular_cache, corpos_calcular),
+        "build_contact_payload": (lambda payload: build_contact_payload(payload, LOCATION_BENCHMARK), payloads_webhook),
+    }
+
+
+def comparar(resultados: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], limite: float) -> List[str]:
+    """Lista as regressões: latência acima ou vazão abaixo da baseline por mais que `limite`."""
+    regressoes = []
+    for nome, atual in resultados.items():
+        base = baseline.get(nome)
+        if not base:
+            continue
+        if atual["latencia_us_mediana"] > base["latencia_us_mediana"] * (1 + limite):
+            regressoes.append(f"{nome}: latência {atual['latencia_us_mediana']:.1f}µs > "
+                              f"{base['latencia_us_mediana']:.1f}µs (+{limite:.0%})")
+        if atual["ops_por_segundo"] < base["ops_por_segundo"] * (1 - limite):
+            regressoes.append(f"{nome}: vazão {atual['ops_por_segundo']:.0f} ops/s < "
+                              f"{base['ops_por_segundo']:.0f} ops/s (-{limite:.0%})")
+    return regressoes
+
+
+def _variacao(atual: float, base: float) -> str:
+    return f"{(atual / base - 1):+.1%}" if base else "-"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks do motor de precificação e do payload do GHL.")
+    parser.add_argument("--entradas", default=ENTRADAS_PADRAO, help="JSON com os formulários gravados.")
+    parser.add_argument("--baseline", default=BASELINE_PADRAO, help="Arquivo da baseline.")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava os resultados como nova baseline.")
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO,
+                        help="Piora tolerada antes de falhar (fração; padrão BENCHMARK_LIMITE ou 0.25).")
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--aquecimento", type=int, default=3)
+    parser.add_argument("--apenas", nargs="*", default=None, help="Roda só os benchmarks informados.")
+    args = parser.parse_args()
+
+    with open(args.entradas, "r", encoding="utf-8") as f:
+        formularios = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_precificacao_") as diretorio_temp:
+        preparar_ambiente(diretorio_temp)
+        # Antes de importar main: só avisos, em texto, para não misturar logs à medição
+        from services.logging_config import configurar_logging
+        configurar_logging(formato="texto", nivel="WARNING")
+        benchmarks = montar_benchmarks(formularios)
+        desconhecidos = set(args.apenas or []) - set(benchmarks)
+        if desconhecidos:
+            print(f"Benchmarks desconhecidos: {', '.join(sorted(desconhecidos))}. Disponíveis: {', '.join(benchmarks)}.")
+            return 2
+
+        resultados = {}
+        for nome, (funcao, entradas) in benchmarks.items():
+            if args.apenas and nome not in args.apenas:
+                continue
+            resultados[nome] = medir(funcao, entradas, args.repeticoes, args.aquecimento)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("resultados", {})
+
+    print(f"\n{'BENCHMARK':<26} | {'MEDIANA (µs)':>12} | {'P95 (µs)':>10} | {'OPS/S':>10} | {'VS. BASELINE':>12}")
+    print("-" * 82)
+    for nome, r in resultados.items():
+        base = baseline.get(nome)
+        variacao = _variacao(r["latencia_us_mediana"], base["latencia_us_mediana"]) if base else "sem baseline"
+        print(f"{nome:<26} | {r['latencia_us_mediana']:>12.1f} | {r['latencia_us_p95']:>10.1f} | "
+              f"{r['ops_por_segundo']:>10.0f} | {variacao:>12}")
+
+    if args.salvar_baseline:
+        dados = {
+            "gerado_em": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "entradas": len(formularios),
+            "repeticoes": args.repeticoes,
+            "resultados": {**baseline, **resultados},
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dados, f, indent=4, ensure_ascii=False)
+        print(f"\n>>> Baseline salva em '{args.baseline}'.")
+        return 0
+
+    if not baseline:
+        print("\n!!! Nenhuma baseline encontrada; rode com --salvar-baseline para criar uma.")
+        return 0
+
+    regressoes = comparar(resultados, baseline, args.limite)
+    if regressoes:
+        print("\n❌ Regressões acima do limite:")
+        for regressao in regressoes:
+            print(f"   - {regressao}")
+        return 1
+    print(f"\n✅ Nenhuma regressão acima de {args.limite:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
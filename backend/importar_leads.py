@@ -0,0 +1,236 @@
+# backend/importar_leads.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from services.calculos import calcular_detalhamento_proposta
+from services.contact_manager import execute_proposal_webhook_async
+from services.custom_fields import custom_field_cache
+from services.ghl_http import ghl_http, ghl_http_async
+from services.idempotencia import chave_idempotencia
+from services.logging_config import configurar_logging
+from services.lote_stream import FORMATOS, detectar_formato, ler_registros
+from services.modelos import PropostaInput, formatar_erro_validacao
+from services.pipelines import pipeline_resolver
+from services.webhook_queue import descrever_erro, erro_definitivo
+
+# Colunas planas do arquivo de leads -> seção do payload do webhook
+CAMPOS_CLIENTE = ("nome", "telefone", "email", "cidade", "cpf", "endereco", "origem")
+CAMPOS_NEGOCIO = ("titulo", "consultor", "concessionaria")
+CAMPOS_EQUIPAMENTOS = ("potencia_modulos_w", "potencia_sistema_kw", "quantidade_modulos")
+
+OK = "ok"
+ERRO = "erro"
+
+
+def _informados(campos: Dict[str, Any]) -> Dict[str, Any]:
+    return {chave: valor for chave, valor in campos.items() if valor not in ("", None)}
+
+
+def montar_payload_lead(campos: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte uma linha do arquivo no payload do webhook (mesmo formato do
+    formulário). Linhas já no formato do payload (com "cliente") passam direto.
+    Sem valor_proposta, a linha é precificada com os campos do PropostaInput
+    (percentuais em fração, como em /calcular).
+    """
+    if isinstance(campos.get("cliente"), dict):
+        return campos
+
+    informados = _informados(campos)
+    payload: Dict[str, Any] = {
+        "cliente": {c: informados[c] for c in CAMPOS_CLIENTE if c in informados},
+        "negocio": {c: informados[c] for c in CAMPOS_NEGOCIO if c in informados},
+        "consumo": {c: informados[c] for c in ("consumo_medio_mensal",) if c in informados},
+        "equipamentos": {c: informados[c] for c in CAMPOS_EQUIPAMENTOS if c in informados},
+        "observacoes_gerais": informados.get("observacoes_gerais", ""),
+    }
+    if not payload["cliente"].get("nome"):
+        raise ValueError("Coluna 'nome' vazia.")
+
+    if "valor_proposta" in informados:
+        payload["valor_proposta"] = float(informados["valor_proposta"])
+        return payload
+
+    try:
+        detalhamento = calcular_detalhamento_proposta(PropostaInput(**informados).dict())
+    except ValidationError as e:
+        raise ValueError(f"Sem valor_proposta e sem dados para precificar: {formatar_erro_validacao(e)}")
+    payload["valor_proposta"] = detalhamento["valor_proposta"]
+    payload["equipamentos"]["quantidade_modulos"] = detalhamento["quantidade_modulos"]
+    return payload
+
+
+class Checkpoint:
+    """
+    Arquivo JSONL só de acréscimo: uma linha por lead processado. Ao retomar,
+    leads com status "ok" são pulados; os com "erro" são tentados de novo.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.concluidos: Set[str] = set()
+        if os.path.exists(caminho):
+            with open(caminho, "r", encoding="utf-8") as f:
+                for texto in f:
+                    try:
+                        registro = json.loads(texto)
+                    except json.JSONDecodeError:
+                        continue  # última linha cortada por uma interrupção
+                    if registro.get("status") == OK:
+                        self.concluidos.add(registro["chave"])
+        self._arquivo = open(caminho, "a", encoding="utf-8")
+
+    def registrar(self, chave: str, linha: int, status: str, **dados: Any) -> None:
+        registro = {"chave": chave, "linha": linha, "status": status, "em": time.time(), **dados}
+        self._arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        # Uma linha por lead: flush imediato para que uma interrupção não perca o progresso
+        self._arquivo.flush()
+        if status == OK:
+            self.concluidos.add(chave)
+
+    def fechar(self) -> None:
+        self._arquivo.close()
+
+
+class Importacao:
+    def __init__(self, location_id: str, checkpoint: Checkpoint, concorrencia: int, tentativas: int,
+                 coluna_id: Optional[str]):
+        self.location_id = location_id
+        self.checkpoint = checkpoint
+        self.concorrencia = max(1, concorrencia)
+        self.tentativas = max(1, tentativas)
+        self.coluna_id = coluna_id
+        self.resumo = {"lidos": 0, "pulados": 0, OK: 0, ERRO: 0}
+        self._vistos: Set[str] = set()
+        self._inicio = time.perf_counter()
+
+    def _leads(self, registros) -> Iterator[Tuple[int, Optional[str], Optional[Dict[str, Any]], Optional[str]]]:
+        """(linha, chave, payload, erro) de cada lead ainda não importado."""
+        for numero, campos, erro in registros:
+            self.resumo["lidos"] += 1
+            payload = None
+            if erro is None:
+                try:
+                    payload = montar_payload_lead(campos)
+                except (ValueError, TypeError) as e:
+                    erro = str(e)
+            id_lead = str(campos.get(self.coluna_id) or "") if self.coluna_id else None
+            if payload is None and not id_lead:
+                # Sem payload, cliente/negocio/valor_proposta não existem: a chave usa a linha e
+                # o conteúdo bruto, senão todas as linhas inválidas cairiam na mesma chave
+                bruto = json.dumps(campos, sort_keys=True, ensure_ascii=False, default=str)
+                chave = chave_idempotencia(self.location_id, {}, f"linha:{numero}|{bruto}")
+            else:
+                chave = chave_idempotencia(self.location_id, payload or {}, id_lead)
+            # Já importado numa execução anterior, ou repetido no próprio arquivo
+            if chave in self.checkpoint.concluidos or chave in self._vistos:
+                self.resumo["pulados"] += 1
+                continue
+            if payload is not None:
+                self._vistos.add(chave)
+            yield numero, chave, payload, erro
+
+    async def _enviar(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Upsert + oportunidade, repetindo erros transitórios (5xx, rede) com backoff."""
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                return await execute_proposal_webhook_async(self.location_id, payload)
+            except Exception as e:
+                if tentativa == self.tentativas or erro_definitivo(e):
+                    raise
+                await asyncio.sleep(min(30.0, 2 ** tentativa) * random.uniform(0.5, 1.0))
+
+    async def _worker(self, leads) -> None:
+        # Os workers compartilham o mesmo iterador: só `concorrencia` leads em memória por vez
+        for numero, chave, payload, erro in leads:
+            if erro is None:
+                try:
+                    resultado = await self._enviar(payload)
+                    self.checkpoint.registrar(chave, numero, OK, **resultado)
+                    self.resumo[OK] += 1
+                    self._progresso()
+                    continue
+                except Exception as e:
+                    erro = descrever_erro(e)
+            self.checkpoint.registrar(chave, numero, ERRO, erro=erro)
+            self.resumo[ERRO] += 1
+            self._progresso()
+
+    def _progresso(self, final: bool = False) -> None:
+        feitos = self.resumo[OK] + self.resumo[ERRO]
+        if final or feitos % 100 == 0:
+            decorrido = time.perf_counter() - self._inicio
+            print(f">>> {feitos} lead(s) enviados ({self.resumo[OK]} ok, {self.resumo[ERRO]} com erro, "
+                  f"{self.resumo['pulados']} já importados) em {decorrido:.0f}s "
+                  f"({feitos / decorrido if decorrido else 0:.1f}/s).")
+
+    async def executar(self, registros) -> Optional[Dict[str, int]]:
+        """Importa os registros e devolve o resumo, ou None se a location não puder ser preparada."""
+        try:
+            # Aquece os caches da location antes de abrir a concorrência (uma busca de cada, não N)
+            try:
+                await asyncio.to_thread(custom_field_cache.mapa, self.location_id)
+                await asyncio.to_thread(pipeline_resolver.resolver, self.location_id)
+            except Exception as e:
+                print(f"\n>>> FALHA ao preparar a location {self.location_id}: {descrever_erro(e)}")
+                return None
+
+            leads = self._leads(registros)
+            await asyncio.gather(*(self._worker(leads) for _ in range(self.concorrencia)))
+        finally:
+            await ghl_http_async.aclose()
+        self._progresso(final=True)
+        return self.resumo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Importa um arquivo de leads (CSV ou NDJSON) para uma location: contato + oportunidade por lead."
+    )
+    parser.add_argument("arquivo", help="Arquivo de leads (uma linha por lead).")
+    parser.add_argument("--location", required=True, help="Location ID de destino.")
+    parser.add_argument("--formato", choices=FORMATOS, default=None, help="Formato do arquivo (padrão: pela extensão).")
+    parser.add_argument("--concorrencia", type=int, default=8, help="Leads enviados ao GHL ao mesmo tempo.")
+    parser.add_argument("--tentativas", type=int, default=3, help="Tentativas por lead em erros transitórios.")
+    parser.add_argument("--coluna-id", default=None,
+                        help="Coluna que identifica o lead (padrão: o conteúdo de cliente/negócio/valor).")
+    parser.add_argument("--checkpoint", default=None, help="Arquivo de checkpoint (padrão: <arquivo>.<location>.checkpoint.jsonl).")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs de cada contato/oportunidade.")
+    args = parser.parse_args()
+
+    configurar_logging(formato="texto", nivel="INFO" if args.verbose else "WARNING")
+    formato = args.formato or detectar_formato(nome_arquivo=args.arquivo)
+    if formato is None:
+        parser.error("não foi possível deduzir o formato pela extensão; use --formato.")
+
+    caminho_checkpoint = args.checkpoint or f"{args.arquivo}.{args.location}.checkpoint.jsonl"
+    checkpoint = Checkpoint(caminho_checkpoint)
+    print(f"=== Importando '{args.arquivo}' para a location {args.location} "
+          f"(concorrência {args.concorrencia}; checkpoint '{caminho_checkpoint}', "
+          f"{len(checkpoint.concluidos)} lead(s) já importados) ===")
+
+    importacao = Importacao(args.location, checkpoint, args.concorrencia, args.tentativas, args.coluna_id)
+    try:
+        with open(args.arquivo, "r", encoding="utf-8-sig", newline="") as f:
+            resumo = asyncio.run(importacao.executar(ler_registros(f, formato)))
+    except KeyboardInterrupt:
+        print("\n!!! Interrompido. Rode o mesmo comando para continuar de onde parou.")
+        exit(130)
+    finally:
+        checkpoint.fechar()
+        ghl_http.close()
+
+    if resumo is None:
+        exit(1)
+    print(f"=== Concluído: {resumo[OK]} importado(s), {resumo[ERRO]} com erro, {resumo['pulados']} pulado(s). ===")
+    if resumo[ERRO]:
+        print("    Os erros estão no checkpoint; rode de novo para tentar só esses leads.")
+    exit(1 if resumo[ERRO] else 0)
@@ -0,0 +1,19 @@
+# backend/importar_tokens_json.py
+
+import argparse
+
+from services.token_db import AGENCY_TOKEN_FILE, LOCATIONS_DATA_FILE, TOKENS_DB_PATH, token_db
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Importa gohighlevel_token.json e installed_locations_data.json para o banco de tokens (SQLite)."
+    )
+    parser.add_argument("--agencia", default=AGENCY_TOKEN_FILE, help="Caminho do gohighlevel_token.json.")
+    parser.add_argument("--locations", default=LOCATIONS_DATA_FILE, help="Caminho do installed_locations_data.json.")
+    args = parser.parse_args()
+
+    print(f"=== Importando tokens para '{TOKENS_DB_PATH}' ===\n")
+    agencia, total = token_db.importar_json(args.agencia, args.locations)
+    print(f">>> [TOKENS] Token da agência importado: {'sim' if agencia else 'não (arquivo não encontrado)'}")
+    print(f">>> [TOKENS] Locations importadas: {total}")
+    print("\n=== Importação concluída. Os arquivos JSON podem ser arquivados. ===")
@@ -0,0 +1,246 @@
+# backend/loadtest/fake_ghl.py
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Adiciona o diretório 'backend' ao sys.path para importar o pacote 'services'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ------------------------------------------------------------
+# Substituto local da API GoHighLevel para testes de carga. Aponte a API
+# para ele com GHL_API_BASE_URL=http://127.0.0.1:<porta>.
+# ------------------------------------------------------------
+FAKE_GHL_LOCATIONS = [l for l in os.getenv("FAKE_GHL_LOCATIONS", "loc-carga-1").split(",") if l]
+
+# Pipeline/stage padrão de services/pipelines.py, para a API funcionar sem configuração extra
+PIPELINE_ID = os.getenv("GHL_PIPELINE_ID", "8pMqwP5PVLR5LoM87lx8")
+STAGE_ID = os.getenv("GHL_STAGE_ID", "6a4d8f9a-1aff-4bc3-8a3e-76714b7722a7")
+
+CUSTOM_FIELD_KEYS = [
+    "contact.cpf_ou_cnpj",
+    "contact.consumo_medio_mensal",
+    "contact.potncia_dos_mdulos_w",
+    "contact.potncia_do_sistema_kw",
+    "contact.quantidade_de_mdulos",
+    "contact.valor_da_proposta_r",
+    "contact.observaes_da_proposta",
+]
+
+
+class ConfigFake(BaseModel):
+    latencia_ms: float = float(os.getenv("FAKE_GHL_LATENCIA_MS", "80"))
+    jitter_ms: float = float(os.getenv("FAKE_GHL_JITTER_MS", "40"))
+    taxa_erro: float = float(os.getenv("FAKE_GHL_TAXA_ERRO", "0"))     # fração de respostas 500
+    taxa_429: float = float(os.getenv("FAKE_GHL_TAXA_429", "0"))       # fração de respostas 429
+    retry_after_s: float = float(os.getenv("FAKE_GHL_RETRY_AFTER", "1"))
+    limite_max: int = int(os.getenv("FAKE_GHL_LIMITE_MAX", "100"))     # anunciado em X-RateLimit-Max
+
+
+class EstadoFake:
+    def __init__(self):
+        self.config = ConfigFake()
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        self.ids = itertools.count(1)
+        self.chamadas: Dict[str, int] = {}
+        self.injetados = {"500": 0, "429": 0}
+        self.contatos: Dict[str, str] = {}
+        self.oportunidades: List[Dict[str, Any]] = []
+
+
+estado = EstadoFake()
+app = FastAPI(title="GoHighLevel (fake para testes de carga)")
+
+
+@app.middleware("http")
+async def simular_rede(request: Request, call_next):
+    """Latência, erros 500 e 429 injetados em todas as rotas da API (exceto /_fake)."""
+    if request.url.path.startswith("/_fake"):
+        return await call_next(request)
+
+    cfg = estado.config
+    caminho = request.url.path
+    if caminho.startswith("/locations/") and caminho.endswith("/customFields"):
+        caminho = "/locations/{id}/customFields"
+    rota = f"{request.method} {caminho}"
+    estado.chamadas[rota] = estado.chamadas.get(rota, 0) + 1
+    await asyncio.sleep(max(0.0, cfg.latencia_ms + random.uniform(-cfg.jitter_ms, cfg.jitter_ms)) / 1000.0)
+
+    cabecalhos = {
+        "X-RateLimit-Max": str(cfg.limite_max),
+        "X-RateLimit-Interval-Milliseconds": "10000",
+    }
+    sorteio = random.random()
+    if sorteio < cfg.taxa_429:
+        estado.injetados["429"] += 1
+        return JSONResponse({"message": "Too many requests (fake)"}, status_code=429,
+                            headers={**cabecalhos, "Retry-After": str(cfg.retry_after_s), "X-RateLimit-Remaining": "0"})
+    if sorteio < cfg.taxa_429 + cfg.taxa_erro:
+        estado.injetados["500"] += 1
+        return JSONResponse({"message": "Internal error (fake)"}, status_code=500, headers=cabecalhos)
+
+    resposta = await call_next(request)
+    resposta.headers.update(cabecalhos)
+    return resposta
+
+
+def _novo_id(prefixo: str) -> str:
+    return f"{prefixo}{next(estado.ids):08d}"
+
+
+# --- OAuth ---
+
+@app.post("/oauth/token")
+async def oauth_token():
+    return {
+        "access_token": _novo_id("fake-agencia-"),
+        "refresh_token": "fake-refresh",
+        "token_type": "Bearer",
+        "expires_in": 86399,
+        "userType": "Company",
+        "companyId": os.getenv("AGENCY_COMPANY_ID", "fake-company"),
+    }
+
+
+@app.get("/oauth/installedLocations")
+async def installed_locations():
+    return {"locations": [{"_id": l, "name": f"Location de carga {l}", "isInstalled": True} for l in FAKE_GHL_LOCATIONS]}
+
+
+@app.post("/oauth/locationToken")
+async def location_token(request: Request):
+    form = await request.form()
+    location_id = form.get("locationId", "")
+    return {"access_token": f"fake-location-{location_id}", "token_type": "Bearer",
+            "expires_in": 86399, "locationId": location_id, "userType": "Location"}
+
+
+# --- Recursos usados pelos webhooks ---
+
+@app.get("/locations/{location_id}/customFields")
+async def custom_fields(location_id: str):
+    return {"customFields": [{"id": f"cf-{i}", "fieldKey": key, "name": key} for i, key in enumerate(CUSTOM_FIELD_KEYS)]}
+
+
+@app.get("/opportunities/pipelines")
+async def pipelines(locationId: str = ""):
+    return {"pipelines": [{"id": PIPELINE_ID, "name": "Vendas", "stages": [{"id": STAGE_ID, "name": "Proposta Enviada"}]}]}
+
+
+@app.post("/contacts/upsert")
+async def upsert_contato(request: Request):
+    corpo = await request.json()
+    chave = f"{corpo.get('locationId')}|{corpo.get('phone') or corpo.get('email') or corpo.get('name')}"
+    novo = chave not in estado.contatos
+    if novo:
+        estado.contatos[chave] = _novo_id("contato-")
+    return {"new": novo, "contact": {"id": estado.contatos[chave], "name": corpo.get("name")}}
+
+
+@app.post("/opportunities/")
+async def criar_oportunidade(request: Request):
+    corpo = await request.json()
+    oportunidade = {
+        "id": _novo_id("oportunidade-"),
+        "name": corpo.get("name"),
+        "contactId": corpo.get("contactId"),
+        "monetaryValue": corpo.get("monetaryValue"),
+        "criado_em": time.time(),
+    }
+    estado.oportunidades.append(oportunidade)
+    # O GHL devolve o objeto em "opportunity"; o id também vai na raiz, como lido pelo contact_manager
+    return {"id": oportunidade["id"], "opportunity": oportunidade}
+
+
+# --- Controle do fake ---
+
+@app.get("/_fake/config")
+async def obter_config():
+    return estado.config
+
+
+@app.post("/_fake/config")
+async def alterar_config(config: ConfigFake):
+    estado.config = config
+    return estado.config
+
+
+@app.get("/_fake/estatisticas")
+async def estatisticas():
+    return {
+        "chamadas": estado.chamadas,
+        "injetados": estado.injetados,
+        "contatos": len(estado.contatos),
+        "oportunidades": len(estado.oportunidades),
+    }
+
+
+@app.get("/_fake/oportunidades")
+async def listar_oportunidades(desde: Optional[float] = None):
+    return [o for o in estado.oportunidades if desde is None or o["criado_em"] >= desde]
+
+
+@app.post("/_fake/reiniciar")
+async def reiniciar():
+    estado.reiniciar()
+    return {"status": "ok"}
+
+
+def semear_tokens(location_ids: List[str]) -> None:
+    """
+    Grava no banco de tokens (TOKENS_DB_PATH) tokens fake da agência e das
+    locations. Substitui a lista de locations: exige TOKENS_DB_PATH explícito
+    para nunca sobrescrever o banco real.
+    """
+    if not os.getenv("TOKENS_DB_PATH"):
+        raise SystemExit("!!! [FAKE GHL] Defina TOKENS_DB_PATH (um banco só para o teste) antes de usar --semear-tokens.")
+    from services.ghl_client import _marcar_refresh
+    from services.token_db import token_db
+
+    token_db.salvar_agency_token(_marcar_refresh({
+        "access_token": "fake-agencia", "refresh_token": "fake-refresh", "expires_in": 86399,
+        "userType": "Company", "companyId": os.getenv("AGENCY_COMPANY_ID", "fake-company"),
+    }))
+    token_db.sincronizar_locations([{"_id": l, "name": f"Location de carga {l}"} for l in location_ids])
+    for location_id in location_ids:
+        token_db.salvar_token_location(location_id, _marcar_refresh({
+            "access_token": f"fake-location-{location_id}", "expires_in": 86399, "locationId": location_id,
+        }))
+    print(f">>> [FAKE GHL] Tokens fake gravados em '{token_db.caminho}' para: {', '.join(location_ids)}.")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor fake da API GoHighLevel para testes de carga.")
+    parser.add_argument("--porta", type=int, default=8900)
+    parser.add_argument("--latencia-ms", type=float, default=estado.config.latencia_ms)
+    parser.add_argument("--jitter-ms", type=float, default=estado.config.jitter_ms)
+    parser.add_argument("--taxa-erro", type=float, default=estado.config.taxa_erro, help="Fração de respostas 500.")
+    parser.add_argument("--taxa-429", type=float, default=estado.config.taxa_429, help="Fração de respostas 429.")
+    parser.add_argument("--retry-after", type=float, default=estado.config.retry_after_s)
+    parser.add_argument("--locations", default=",".join(FAKE_GHL_LOCATIONS), help="Location IDs separados por vírgula.")
+    parser.add_argument("--semear-tokens", action="store_true",
+                        help="Grava tokens fake no banco de tokens da API (use o mesmo TOKENS_DB_PATH).")
+    args = parser.parse_args()
+
+    from services.logging_config import configurar_logging
+    configurar_logging(formato="texto")
+    FAKE_GHL_LOCATIONS[:] = [l for l in args.locations.split(",") if l]
+    estado.config = ConfigFake(latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, taxa_erro=args.taxa_erro,
+                               taxa_429=args.taxa_429, retry_after_s=args.retry_after)
+    if args.semear_tokens:
+        semear_tokens(FAKE_GHL_LOCATIONS)
+    print(f">>> [FAKE GHL] Escutando em http://127.0.0.1:{args.porta} com {estado.config}")
+    uvicorn.run(app, host="127.0.0.1", port=args.porta, log_level="warning")
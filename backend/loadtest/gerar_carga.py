@@ -0,0 +1,158 @@
+# backend/loadtest/gerar_carga.py
+
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Status finais de um job da fila (services/webhook_queue.py)
+STATUS_FINAIS = ("concluido", "falhou")
+
+
+def montar_payload(indice: int, execucao: str) -> Dict[str, Any]:
+    """Payload no formato do formulário, único por requisição (não cai na supressão de duplicados)."""
+    consumo = random.choice([250, 400, 550, 800, 1200])
+    return {
+        "valor_proposta": round(random.uniform(12000, 60000), 2),
+        "quantidade_modulos": random.randint(6, 30),
+        "cliente": {
+            "nome": f"Cliente carga {execucao}-{indice}",
+            "telefone": f"+5511{9000000000 + indice}",
+            "cidade": "Campinas",
+            "cpf": f"000.000.{indice % 1000:03d}-00",
+        },
+        "negocio": {"titulo": f"Teste de carga {execucao} #{indice}"},
+        "consumo": {"consumo_medio_mensal": consumo},
+        "equipamentos": {"potencia_modulos_w": 585, "potencia_sistema_kw": 4.68},
+        "observacoes_gerais": "Gerado por loadtest/gerar_carga.py",
+    }
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def enviar(cliente: httpx.AsyncClient, location_id: str, indice: int, execucao: str,
+                 envios: List[Dict[str, Any]]) -> None:
+    envio: Dict[str, Any] = {"indice": indice, "enviado_em": time.time(), "job_id": None, "erro": None}
+    envios.append(envio)
+    try:
+        resp = await cliente.post(f"/webhook/new-proposal/{location_id}", json=montar_payload(indice, execucao))
+        envio["aceito_em"] = time.time()
+        if resp.status_code != 200:
+            envio["erro"] = f"HTTP {resp.status_code}"
+        else:
+            envio["job_id"] = resp.json().get("job_id")
+    except httpx.HTTPError as e:
+        envio["erro"] = f"{type(e).__name__}: {e}"
+
+
+async def gerar_carga(cliente: httpx.AsyncClient, location_id: str, taxa: float, duracao: float, execucao: str) -> List[Dict[str, Any]]:
+    """Dispara webhooks em malha aberta: um a cada 1/taxa segundos, sem esperar as respostas."""
+    envios: List[Dict[str, Any]] = []
+    tarefas = []
+    total = int(taxa * duracao)
+    inicio = time.perf_counter()
+    for indice in range(total):
+        atraso = inicio + indice / taxa - time.perf_counter()
+        if atraso > 0:
+            await asyncio.sleep(atraso)
+        tarefas.append(asyncio.create_task(enviar(cliente, location_id, indice, execucao, envios)))
+    await asyncio.gather(*tarefas)
+    return envios
+
+
+async def aguardar_conclusao(cliente: httpx.AsyncClient, envios: List[Dict[str, Any]],
+                             timeout: float, intervalo: float, concorrencia: int) -> None:
+    """Consulta /webhook/jobs/{id} até cada job terminar (ou o timeout), anotando status e horário final."""
+    pendentes = [e for e in envios if e["job_id"] is not None]
+    limite = time.time() + timeout
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def consultar(envio: Dict[str, Any]) -> None:
+        async with semaforo:
+            try:
+                resp = await cliente.get(f"/webhook/jobs/{envio['job_id']}")
+                if resp.status_code == 200:
+                    job = resp.json()
+                    envio["status"] = job["status"]
+                    envio["tentativas"] = job["tentativas"]
+                    if job["status"] in STATUS_FINAIS:
+                        envio["finalizado_em"] = job["atualizado_em"]
+            except httpx.HTTPError:
+                pass
+
+    while pendentes and time.time() < limite:
+        await asyncio.gather(*(consultar(e) for e in pendentes))
+        pendentes = [e for e in pendentes if e.get("status") not in STATUS_FINAIS]
+        if pendentes:
+            await asyncio.sleep(intervalo)
+
+
+def relatorio(envios: List[Dict[str, Any]], taxa: float, duracao: float) -> Dict[str, Any]:
+    aceitos = [e for e in envios if e["job_id"] is not None]
+    concluidos = [e for e in aceitos if e.get("status") == "concluido"]
+    falhos = [e for e in aceitos if e.get("status") == "falhou"]
+    latencia_aceite = [(e["aceito_em"] - e["enviado_em"]) * 1000 for e in aceitos]
+    latencia_conclusao = [(e["finalizado_em"] - e["enviado_em"]) * 1000 for e in concluidos]
+    janela = (max(e["finalizado_em"] for e in concluidos) - min(e["enviado_em"] for e in envios)) if concluidos else 0
+
+    def ms(valor: Optional[float]) -> Optional[float]:
+        return round(valor, 1) if valor is not None else None
+
+    return {
+        "taxa_alvo_por_s": taxa,
+        "duracao_s": duracao,
+        "enviados": len(envios),
+        "aceitos": len(aceitos),
+        "erros_envio": len(envios) - len(aceitos),
+        "concluidos": len(concluidos),
+        "falhos": len(falhos),
+        "sem_conclusao": len(aceitos) - len(concluidos) - len(falhos),
+        "com_retentativa": sum(1 for e in concluidos if e.get("tentativas", 1) > 1),
+        "vazao_ponta_a_ponta_por_s": round(len(concluidos) / janela, 2) if janela else 0.0,
+        "aceite_ms": {"p50": ms(percentil(latencia_aceite, 50)), "p99": ms(percentil(latencia_aceite, 99))},
+        "conclusao_ms": {"p50": ms(percentil(latencia_conclusao, 50)), "p99": ms(percentil(latencia_conclusao, 99)),
+                         "max": ms(max(latencia_conclusao) if latencia_conclusao else None)},
+        "exemplos_erro": sorted({e["erro"] for e in envios if e["erro"]})[:5],
+    }
+
+
+async def executar(args) -> Dict[str, Any]:
+    execucao = time.strftime("%H%M%S")
+    limites = httpx.Limits(max_connections=args.conexoes, max_keepalive_connections=args.conexoes)
+    async with httpx.AsyncClient(base_url=args.api, timeout=30, limits=limites) as cliente:
+        print(f">>> Enviando {int(args.taxa * args.duracao)} webhooks a {args.taxa}/s para {args.api} (location {args.location})...")
+        envios = await gerar_carga(cliente, args.location, args.taxa, args.duracao, execucao)
+        print(">>> Envio concluído; aguardando o processamento dos jobs...")
+        await aguardar_conclusao(cliente, envios, args.timeout, args.intervalo_consulta, args.conexoes)
+    return relatorio(envios, args.taxa, args.duracao)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gera carga em /webhook/new-proposal/{location_id} e mede o processamento ponta a ponta."
+    )
+    parser.add_argument("--api", default="http://127.0.0.1:8001", help="URL da API de Precificação.")
+    parser.add_argument("--location", default="loc-carga-1")
+    parser.add_argument("--taxa", type=float, default=20, help="Webhooks por segundo.")
+    parser.add_argument("--duracao", type=float, default=30, help="Segundos de envio.")
+    parser.add_argument("--timeout", type=float, default=120, help="Segundos máximos aguardando os jobs terminarem.")
+    parser.add_argument("--intervalo-consulta", type=float, default=0.25)
+    parser.add_argument("--conexoes", type=int, default=50)
+    parser.add_argument("--saida", default=None, help="Grava o relatório em JSON neste arquivo.")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    exit(1 if resultado["erros_envio"] or resultado["falhos"] or resultado["sem_conclusao"] else 0)
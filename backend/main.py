@@ -1,13 +1,20 @@
 # backend/main.py
 
+import io
 import os
 import sys
 import json
-from typing import Dict, Any
+import time
+import uuid
+import asyncio
+import logging
+import tempfile
+from typing import Dict, Any, List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
 
 # Constrói o caminho explícito para o arquivo .env e o carrega
@@ -17,11 +24,25 @@ load_dotenv(dotenv_path=dotenv_path)
 # Adiciona o diretório 'backend' ao sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Logs em JSON, escritos por uma thread separada (ver services/logging_config.py)
+from services.logging_config import configurar_logging, id_correlacao, registros_descartados
+configurar_logging()
+logger = logging.getLogger("main")
+
 # Lê a variável do webhook do .env
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
 if not WEBHOOK_URL:
     raise RuntimeError("A variável de ambiente WEBHOOK_URL não está definida.")
 
+# Location padrão das propostas enviadas pelo formulário (POST /propostas)
+GHL_LOCATION_ID = os.getenv("GHL_LOCATION_ID", "").strip()
+
+# Limite de células da grade de cenários (protege memória e tamanho da resposta)
+CENARIOS_MAX_CELULAS = int(os.getenv("CENARIOS_MAX_CELULAS", "100000"))
+
+# Corpo de /calcular/stream mantido em memória até este tamanho; acima disso vai para arquivo temporário
+LOTE_STREAM_SPOOL_MB = float(os.getenv("LOTE_STREAM_SPOOL_MB", "8"))
+
 app = FastAPI(title="API de Precificação Solar")
 
 # --- Configuração de CORS ---
@@ -35,16 +56,223 @@ app.add_middleware(
 # -----------------------------
 
 # Importa a lógica de cálculo e de gerenciamento de contatos
-from services.calculos import calcular_valor_proposta
-from services.contact_manager import process_proposal_webhook
+from services.cache_precificacao import cache_precificacao, calcular_valor_proposta_cache
+from services.calculos import calcular_detalhamento_proposta
+from services.propostas import montar_inputs_calculo, montar_payload_webhook
+from services.calculos_lote import calcular_valor_proposta_lote
+from services.modelos import ParametrosSimulacao, PropostaInput, formatar_erro_validacao, validar_premissas_linha
+from services.lote_stream import FORMATOS, LOTE_STREAM_BLOCO, TIPOS_CONTEUDO, detectar_formato, precificar_stream
+from services.catalogo import obter_catalogo, recarregar_catalogo
+from services.calculos_inverso import resolver_campo
+from services.simulacao import SIMULACAO_ANOS, resumir_simulacao, simular_propostas
+from services.calculos_cenarios import calcular_grade_cenarios, contar_faixa, expandir_faixa
+from services.contact_manager import execute_proposal_webhook_async
+from services.webhook_queue import WebhookQueue, WebhookWorkerPool
+from services.idempotencia import RegistroIdempotencia, chave_idempotencia
+from services.token_scheduler import token_scheduler, TOKEN_REFRESH_ATIVO
+from services.ghl_http import ghl_http, ghl_http_async
+from services.ghl_client import load_agency_token, refresh_location_token
+from services.location_tokens import location_token_store
+from services.metrics import http_duracao, metricas
+from services.rate_limiter import rate_limiter
+from services.tracing import rastreador, rastrear
+
+# Fila durável dos webhooks e workers que a consomem
+fila_webhooks = WebhookQueue()
+# Num 401 do GHL, o worker renova o token da location antes de tentar de novo
+workers_webhooks = WebhookWorkerPool(fila_webhooks, execute_proposal_webhook_async,
+                                     renovar_token=refresh_location_token)
+# Webhooks repetidos (retries do GHL ou do formulário) reaproveitam o job original
+registro_idempotencia = RegistroIdempotencia(fila_webhooks)
+
+@app.middleware("http")
+async def instrumentar_requisicoes(request: Request, call_next):
+    """
+    ID de correlação da requisição (X-Request-ID recebido ou gerado), anotado em
+    todos os logs e devolvido na resposta, e histograma de latência por rota
+    (o template da rota, não o caminho com IDs).
+    """
+    correlacao = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    token_correlacao = id_correlacao.set(correlacao)
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        resposta = await call_next(request)
+        status = resposta.status_code
+        resposta.headers["X-Request-ID"] = correlacao
+        return resposta
+    finally:
+        id_correlacao.reset(token_correlacao)
+        rota = request.scope.get("route")
+        http_duracao.observar(
+            time.perf_counter() - inicio,
+            metodo=request.method,
+            rota=rota.path if rota is not None else "nao_encontrada",
+            status=str(status),
+        )
+
+def _coletar_metricas():
+    """Valores lidos no momento do scrape: fila, idade dos tokens, caches e rate limiter."""
+    agora = time.time()
+    for status, total in fila_webhooks.contar_por_status().items():
+        yield ("precificacao_fila_jobs", "gauge", "Jobs na fila de webhooks, por status.", {"status": status}, total)
+
+    tokens = []
+    agencia = load_agency_token()
+    if agencia:
+        tokens.append(("agencia", agencia.get("companyId") or "agencia", agencia))
+    for loc in location_token_store.listar():
+        tokens.append(("location", loc.get("_id") or loc.get("id"), loc.get("location_specific_token_data") or {}))
+    for tipo, token_id, token_data in tokens:
+        emitido_em = token_data.get("refreshed_at_unix_timestamp")
+        if emitido_em is None:
+            continue
+        rotulos = {"tipo": tipo, "id": token_id}
+        yield ("precificacao_ghl_token_idade_segundos", "gauge",
+               "Segundos desde a emissão do token.", rotulos, agora - float(emitido_em))
+        if token_data.get("expires_in") is not None:
+            yield ("precificacao_ghl_token_expira_em_segundos", "gauge",
+                   "Segundos até o token expirar (negativo se já expirou).", rotulos,
+                   float(emitido_em) + float(token_data["expires_in"]) - agora)
+
+    cache = cache_precificacao.estatisticas()
+    for campo in ("acertos", "falhas", "despejos", "expiracoes", "invalidacoes"):
+        yield (f"precificacao_cache_{campo}_total", "counter", f"Cache de precificação: {campo}.", {}, cache[campo])
+    yield ("precificacao_cache_itens", "gauge", "Itens no cache de precificação.", {}, cache["tamanho"])
+
+    yield ("precificacao_logs_descartados_total", "counter",
+           "Registros de log descartados com a fila de logs cheia.", {}, registros_descartados())
+
+    yield ("precificacao_webhooks_duplicados_total", "counter",
+           "Webhooks repetidos respondidos sem nova chamada ao GHL.", {}, registro_idempotencia.duplicados)
+
+    for chave, estado in rate_limiter.estatisticas().items():
+        rotulos = {"chave": chave}
+        yield ("precificacao_ghl_rate_limit_esperas_total", "counter",
+               "Chamadas ao GHL que aguardaram o rate limiter.", rotulos, estado["esperas"])
+        yield ("precificacao_ghl_rate_limit_429_total", "counter",
+               "Respostas 429 recebidas do GHL.", rotulos, estado["respostas_429"])
+        yield ("precificacao_ghl_rate_limit_tokens", "gauge",
+               "Tokens disponíveis no bucket do rate limiter.", rotulos, estado["tokens"])
+
+metricas.registrar_coletor(_coletar_metricas)
 
 # ------------------------------------------------------------
 #  Modelos Pydantic para validação dos dados de entrada/saída
 # ------------------------------------------------------------
 
-class PropostaInput(BaseModel):
-    consumo_medio_mensal: float = Field(..., example=400.0)
-    potencia_modulos_w: float = Field(..., example=585.0)
+class PropostaOutput(BaseModel):
+    valor_proposta: float
+
+class PropostaLoteInput(BaseModel):
+    # Aceita linhas (uma proposta por item) e/ou colunas (campo -> lista de valores)
+    propostas: List[Dict[str, Any]] = Field(default_factory=list)
+    colunas: Optional[Dict[str, List[Any]]] = Field(None, example={"consumo_medio_mensal": [400.0, 550.0]})
+    # Informado: cada linha válida ganha o resumo da simulação (payback, TIR, VPL, economia)
+    simulacao: Optional[ParametrosSimulacao] = None
+
+class ResultadoLinhaLote(BaseModel):
+    indice: int
+    valor_proposta: Optional[float] = None
+    quantidade_modulos: Optional[int] = None
+    simulacao: Optional[Dict[str, Any]] = None
+    erro: Optional[str] = None
+
+class PropostaLoteOutput(BaseModel):
+    total: int
+    sucesso: int
+    falhas: int
+    resultados: List[ResultadoLinhaLote]
+
+class FaixaValores(BaseModel):
+    inicio: float = Field(..., example=0.10)
+    fim: float = Field(..., example=0.30)
+    passo: float = Field(..., example=0.01)
+
+class CenarioInput(BaseModel):
+    base: PropostaInput
+    # Campo do PropostaInput -> lista explícita de valores ou faixa {inicio, fim, passo}
+    variacoes: Dict[str, Union[List[Any], FaixaValores]] = Field(
+        ..., example={"percentual_margem": {"inicio": 0.10, "fim": 0.30, "passo": 0.05}, "valor_desconto": [0, 2.5, 5]}
+    )
+
+class EixoCenario(BaseModel):
+    campo: str
+    valores: List[Any]
+
+class CenarioOutput(BaseModel):
+    eixos: List[EixoCenario]
+    formato: List[int]
+    total_celulas: int
+    celulas_invalidas: int
+    valor_proposta: List[Any]
+    quantidade_modulos: List[Any]
+
+class InversoInput(BaseModel):
+    base: PropostaInput
+    # Campo resolvido: percentual_margem, valor_desconto ou valor_adicional
+    campo: str = Field(..., example="percentual_margem")
+    alvos: List[float] = Field(..., example=[25000.0, 27500.0])
+    casas_decimais: Optional[int] = Field(None, ge=0, le=10, example=4)
+
+class ResultadoInverso(BaseModel):
+    alvo: float
+    percentual_margem: Optional[float] = None
+    valor_desconto: Optional[float] = None
+    valor_adicional: Optional[float] = None
+    # Preço recalculado pelo caminho normal com o valor resolvido
+    valor_proposta: Optional[float] = None
+    aviso: Optional[str] = None
+    erro: Optional[str] = None
+
+class InversoOutput(BaseModel):
+    campo: str
+    resultados: List[ResultadoInverso]
+
+class PropostaSimulacaoInput(PropostaInput, ParametrosSimulacao):
+    # Investimento simulado; sem ele, vale o valor_proposta calculado
+    valor_proposta: Optional[float] = Field(None, example=21000.0)
+
+class SimulacaoInput(BaseModel):
+    propostas: List[PropostaSimulacaoInput]
+    parametros: ParametrosSimulacao = Field(default_factory=ParametrosSimulacao)
+    anos: int = Field(SIMULACAO_ANOS, ge=1, le=50)
+    # Inclui as séries mês a mês (anos × 12 valores por série)
+    mensal: bool = False
+
+class KitInput(BaseModel):
+    consumo_medio_mensal: float = Field(..., gt=0, example=400.0)
+    indice_irrad: float = Field(3.79, gt=0, example=4.0)
+    taxa_desempenho: float = Field(0.8, gt=0, example=0.8)
+    custo_base_por_kw: float = Field(400.0, ge=0, example=400.0)
+    # Demais campos do PropostaInput para precificar a proposta com o kit escolhido
+    proposta: Optional[Dict[str, Any]] = Field(None, example={"percentual_margem": 0.25})
+
+# --- Formulário completo de proposta (POST /propostas); percentuais em % como no frontend ---
+
+class ClienteForm(BaseModel):
+    nome: str = Field(..., example="Maria Souza")
+    telefone: str = Field(..., example="+5511999990000")
+    cidade: str = Field(..., example="Campinas")
+    email: Optional[str] = None
+    origem: Optional[str] = None
+    cpf: Optional[str] = None
+    endereco: Optional[str] = None
+
+class NegocioForm(BaseModel):
+    titulo: Optional[str] = None
+    consultor: Optional[str] = None
+    anexo_fatura: Optional[str] = None
+    concessionaria: Optional[str] = None
+
+class ConsumoForm(BaseModel):
+    consumo_medio_mensal: float = Field(..., ge=0, example=400.0)
+    taxa_simultaneidade: float = Field(0.0, example=30.0)
+    indice_irrad: float = Field(3.79, gt=0, example=4.0)
+    taxa_desempenho: float = Field(80.0, gt=0, example=80.0)
+
+class EquipamentosForm(BaseModel):
+    potencia_modulos_w: float = Field(..., gt=0, example=585.0)
     potencia_sistema_kw: float = Field(..., example=4.68)
     custo_unitario_modulo: float = Field(1000.0, example=1200.0)
     quantidade_inversor: int = Field(1, example=1)
@@ -53,17 +281,62 @@ class PropostaInput(BaseModel):
     custo_cabos: float = Field(200.0, example=250.0)
     ajuste_telhas: float = Field(0.0, example=100.0)
     ajuste_padrao_entrada: float = Field(0.0, example=120.0)
-    percentual_indiretos: float = Field(0.05, example=0.05)
-    percentual_margem: float = Field(0.20, example=0.20)
-    aliquota_impostos: float = Field(0.15, example=0.15)
+
+class ComercialForm(BaseModel):
+    custo_base_por_kw: float = Field(400.0, example=400.0)
+    percentual_indiretos: float = Field(5.0, example=5.0)
+    percentual_margem: float = Field(20.0, example=20.0)
+    aliquota_impostos: float = Field(15.0, example=15.0)
     valor_adicional: float = Field(0.0, example=100.0)
     forma_desconto: str = Field("Sem Desconto", example="Porcentagem")
     valor_desconto: float = Field(0.0, example=5.0)
-    indice_irrad: float = Field(3.79, example=4.0)
-    taxa_desempenho: float = Field(0.8, example=0.85)
 
-class PropostaOutput(BaseModel):
+class PropostaFormInput(BaseModel):
+    cliente: ClienteForm
+    negocio: NegocioForm = Field(default_factory=NegocioForm)
+    consumo: ConsumoForm
+    equipamentos: EquipamentosForm
+    comercial: ComercialForm = Field(default_factory=ComercialForm)
+    observacoes_gerais: Optional[str] = ""
+    # Se omitido, usa GHL_LOCATION_ID do .env
+    location_id: Optional[str] = None
+
+class DetalhamentoProposta(BaseModel):
+    quantidade_modulos: int
+    custo_total_modulos: float
+    custo_total_inversor: float
+    custo_equipamentos: float
+    custo_mao_de_obra: float
+    custos_indiretos: float
+    custo_total_projeto: float
+    valor_margem: float
+    preco_antes_impostos: float
+    valor_impostos: float
+    preco_com_impostos: float
+    valor_adicional: float
+    preco_antes_desconto: float
+    valor_desconto_aplicado: float
+    valor_proposta: float
+
+class PropostaFormOutput(BaseModel):
     valor_proposta: float
+    quantidade_modulos: int
+    detalhamento: DetalhamentoProposta
+    location_id: str
+    job_id: int
+    job_status: str
+    duplicado: bool
+
+def _linhas_do_lote(lote: PropostaLoteInput) -> List[Dict[str, Any]]:
+    """Junta as linhas e as colunas do lote em uma única lista de linhas."""
+    linhas = list(lote.propostas)
+    if lote.colunas:
+        tamanhos = {len(valores) for valores in lote.colunas.values()}
+        if len(tamanhos) > 1:
+            raise HTTPException(status_code=400, detail="Todas as colunas devem ter o mesmo número de valores.")
+        campos = list(lote.colunas.keys())
+        linhas.extend(dict(zip(campos, valores)) for valores in zip(*lote.colunas.values()))
+    return linhas
 
 # ----------------------------
 #  Rotas da API (endpoints)
@@ -71,7 +344,7 @@ class PropostaOutput(BaseModel):
 
 @app.get("/")
 def home():
-    return {"mensagem": "API de Precificação Solar rodando. Use POST /calcular ou GET /config para obter webhook."}
+    return {"mensagem": "API de Precificação Solar rodando. Use POST /calcular, POST /propostas ou GET /config para obter webhook."}
 
 @app.get("/config")
 def get_config():
@@ -80,34 +353,394 @@ def get_config():
 @app.post("/calcular", response_model=PropostaOutput)
 def calcular_proposta(input_data: PropostaInput):
     try:
-        valor = calcular_valor_proposta(input_data.dict())
+        # O pydantic já validou o corpo; o cache evita só o recálculo do preço
+        valor = calcular_valor_proposta_cache(input_data.dict())
         return {"valor_proposta": valor}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/cache/precificacao")
+def get_cache_precificacao():
+    """Estatísticas do cache de precificação (acertos, falhas, despejos, expirações)."""
+    return cache_precificacao.estatisticas()
+
+@app.post("/cache/precificacao/invalidar")
+def invalidar_cache_precificacao():
+    """Esvazia o cache de precificação; use quando os custos padrão mudarem."""
+    removidos = cache_precificacao.invalidar()
+    return {"removidos": removidos, "estatisticas": cache_precificacao.estatisticas()}
+
+@app.post("/calcular/lote", response_model=PropostaLoteOutput, response_model_exclude_none=True)
+def calcular_propostas_lote(lote: PropostaLoteInput):
+    """
+    Precifica várias propostas em uma única chamada, usando o motor vetorizado.
+    Cada linha é validada como um PropostaInput; linhas inválidas voltam com "erro"
+    sem impedir o cálculo das demais. Com simulação, uma linha cujas premissas
+    ou simulação falham também volta só com "indice" e "erro" (sem preço).
+    """
+    linhas = _linhas_do_lote(lote)
+
+    resultados: List[Dict[str, Any]] = [None] * len(linhas)
+    validas: List[Dict[str, Any]] = []
+    indices_validos: List[int] = []
+    for i, linha in enumerate(linhas):
+        try:
+            validas.append(PropostaInput(**linha).dict())
+            indices_validos.append(i)
+        except ValidationError as e:
+            resultados[i] = {"indice": i, "erro": formatar_erro_validacao(e)}
+
+    for i, resultado in zip(indices_validos, calcular_valor_proposta_lote(validas)):
+        resultado["indice"] = i
+        resultados[i] = resultado
+
+    if lote.simulacao is not None:
+        # Premissas por linha (ex.: taxa_simultaneidade) sobrescrevem as do lote, com os mesmos limites
+        simular: List[Dict[str, Any]] = []
+        indices_simulados: List[int] = []
+        for i, proposta in zip(indices_validos, validas):
+            if "erro" in resultados[i]:
+                continue
+            try:
+                premissas = validar_premissas_linha(linhas[i])
+            except ValidationError as e:
+                resultados[i] = {"indice": i, "erro": formatar_erro_validacao(e)}
+                continue
+            simular.append({**proposta, **premissas, "valor_proposta": resultados[i]["valor_proposta"]})
+            indices_simulados.append(i)
+        simulacoes = simular_propostas(simular, lote.simulacao.dict(exclude_none=True))
+        for i, simulacao in zip(indices_simulados, simulacoes):
+            if "erro" in simulacao:
+                resultados[i] = {"indice": i, "erro": simulacao["erro"]}
+            else:
+                resultados[i]["simulacao"] = resumir_simulacao(simulacao)
+
+    falhas = sum(1 for r in resultados if "erro" in r)
+    return {
+        "total": len(resultados),
+        "sucesso": len(resultados) - falhas,
+        "falhas": falhas,
+        "resultados": resultados,
+    }
+
+def _validar_variacoes(base: Dict[str, Any], variacoes: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """
+    Expande as faixas e passa cada valor pela validação do PropostaInput,
+    devolvendo os valores já convertidos para o tipo do campo. O tamanho da
+    grade é conferido contra CENARIOS_MAX_CELULAS antes de expandir qualquer faixa.
+    """
+    total_celulas = 1
+    for campo, variacao in variacoes.items():
+        if campo not in base:
+            raise HTTPException(status_code=400, detail=f"Campo desconhecido em variacoes: '{campo}'.")
+        if isinstance(variacao, FaixaValores):
+            try:
+                total_celulas *= contar_faixa(variacao.inicio, variacao.fim, variacao.passo)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Faixa inválida para '{campo}': {e}")
+        else:
+            total_celulas *= len(variacao)
+    if total_celulas > CENARIOS_MAX_CELULAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A grade teria {total_celulas} células; o limite é {CENARIOS_MAX_CELULAS}.",
+        )
+
+    validadas: Dict[str, List[Any]] = {}
+    for campo, variacao in variacoes.items():
+        if isinstance(variacao, FaixaValores):
+            variacao = expandir_faixa(variacao.inicio, variacao.fim, variacao.passo)
+        if not variacao:
+            raise HTTPException(status_code=400, detail=f"Nenhum valor informado para '{campo}'.")
+        valores = []
+        for valor in variacao:
+            try:
+                valores.append(getattr(PropostaInput(**{**base, campo: valor}), campo))
+            except ValidationError as e:
+                raise HTTPException(status_code=400, detail=f"Valor inválido para '{campo}' ({valor!r}): {formatar_erro_validacao(e)}")
+        validadas[campo] = valores
+    return validadas
+
+@app.post("/calcular/stream")
+async def calcular_propostas_stream(request: Request,
+                                    formato: Optional[str] = None,
+                                    saida: Optional[str] = None,
+                                    bloco: int = LOTE_STREAM_BLOCO,
+                                    simulacao: bool = False):
+    """
+    Precifica um arquivo CSV ou NDJSON enviado como corpo da requisição (não
+    multipart). O formato vem de `formato` ou do Content-Type; a saída usa o
+    mesmo formato, salvo `saida`. Cada linha volta com as colunas originais
+    mais linha, valor_proposta, quantidade_modulos e erro (e, com `simulacao`,
+    payback, TIR, VPL e economia com as premissas padrão ou as colunas de mesmo
+    nome), em blocos de `bloco` linhas transmitidos assim que ficam prontos.
+    """
+    formato = formato or detectar_formato(request.headers.get("content-type"))
+    saida = saida or formato
+    if formato not in FORMATOS or saida not in FORMATOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Informe o formato (Content-Type text/csv ou application/x-ndjson, ou ?formato=) entre: {', '.join(FORMATOS)}.",
+        )
+    if bloco < 1:
+        raise HTTPException(status_code=400, detail="'bloco' deve ser maior que zero.")
+
+    # O corpo é copiado para um arquivo temporário (só os primeiros MB ficam em memória)
+    # e lido linha a linha enquanto a resposta é enviada
+    arquivo = tempfile.SpooledTemporaryFile(max_size=int(LOTE_STREAM_SPOOL_MB * 1024 * 1024))
+    async for pedaco in request.stream():
+        await asyncio.to_thread(arquivo.write, pedaco)
+    arquivo.seek(0)
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+
+    def gerar():
+        # Gerador síncrono: o StreamingResponse o consome numa thread, fora do event loop
+        try:
+            yield from precificar_stream(texto, formato, saida, bloco, {} if simulacao else None)
+        finally:
+            texto.close()
+
+    return StreamingResponse(gerar(), media_type=TIPOS_CONTEUDO[saida])
+
+@app.post("/calcular/cenarios", response_model=CenarioOutput)
+def calcular_cenarios(cenario: CenarioInput):
+    """
+    Calcula a grade completa (produto cartesiano) de valor_proposta e quantidade
+    de módulos para as variações pedidas sobre uma proposta base.
+    Células cujo cálculo falharia (ex.: divisão por zero) voltam como null.
+    """
+    if not cenario.variacoes:
+        raise HTTPException(status_code=400, detail="Informe ao menos um campo em 'variacoes'.")
+
+    base = cenario.base.dict()
+    variacoes = _validar_variacoes(base, cenario.variacoes)
+    return calcular_grade_cenarios(base, variacoes)
+
+@app.post("/calcular/simulacao")
+def calcular_simulacao(simulacao: SimulacaoInput):
+    """
+    Simula geração, economia, payback, TIR e VPL ao longo de `anos` para cada
+    proposta (séries anuais; mensais com `mensal`). As premissas de cada
+    proposta sobrescrevem as de `parametros`.
+    """
+    if not simulacao.propostas:
+        raise HTTPException(status_code=400, detail="Informe ao menos uma proposta.")
+    if len(simulacao.propostas) * simulacao.anos * 12 > CENARIOS_MAX_CELULAS * 100:
+        raise HTTPException(status_code=400, detail="Simulação grande demais para uma chamada; divida em lotes menores.")
+    linhas = [proposta.dict(exclude_none=True) for proposta in simulacao.propostas]
+    resultados = simular_propostas(linhas, simulacao.parametros.dict(exclude_none=True), simulacao.anos, simulacao.mensal)
+    return {"anos": simulacao.anos, "resultados": resultados}
+
+@app.post("/calcular/inverso", response_model=InversoOutput, response_model_exclude_none=True)
+def calcular_inverso(inverso: InversoInput):
+    """
+    Resolve percentual_margem, valor_desconto ou valor_adicional para que a
+    proposta base chegue a cada valor_proposta em `alvos`, numa única chamada.
+    """
+    if not inverso.alvos:
+        raise HTTPException(status_code=400, detail="Informe ao menos um valor em 'alvos'.")
+    if len(inverso.alvos) > CENARIOS_MAX_CELULAS:
+        raise HTTPException(status_code=400, detail=f"No máximo {CENARIOS_MAX_CELULAS} alvos por chamada.")
+    try:
+        resultados = resolver_campo(inverso.base.dict(), inverso.campo, inverso.alvos, inverso.casas_decimais)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"campo": inverso.campo, "resultados": resultados}
+
+@app.get("/catalogo")
+def get_catalogo():
+    """Resumo do catálogo de equipamentos carregado (arquivo e quantidades de SKUs)."""
+    try:
+        return obter_catalogo().resumo()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=503, detail=f"Catálogo de equipamentos indisponível: {e}")
+
+@app.post("/catalogo/recarregar")
+def post_recarregar_catalogo():
+    """Relê o arquivo do catálogo (ex.: depois de atualizar preços)."""
+    try:
+        return recarregar_catalogo().resumo()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Catálogo inválido, o anterior continua em uso: {e}")
+
+@app.post("/catalogo/kit")
+def selecionar_kit(kit: KitInput):
+    """
+    Kit mais barato do catálogo (módulo + inversor e quantidades) para o consumo.
+    Devolve os campos do PropostaInput preenchidos e o valor_proposta calculado
+    com eles (mais os campos extras em `proposta`, se houver).
+    """
+    try:
+        catalogo = obter_catalogo()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=503, detail=f"Catálogo de equipamentos indisponível: {e}")
+
+    resultado = catalogo.selecionar_kit(kit.consumo_medio_mensal, kit.indice_irrad, kit.taxa_desempenho,
+                                        kit.custo_base_por_kw)
+    if resultado is None:
+        raise HTTPException(status_code=422, detail="Nenhum kit do catálogo atende esse consumo.")
+
+    campos = {
+        **(kit.proposta or {}),
+        "consumo_medio_mensal": kit.consumo_medio_mensal,
+        "indice_irrad": kit.indice_irrad,
+        "taxa_desempenho": kit.taxa_desempenho,
+        "custo_base_por_kw": kit.custo_base_por_kw,
+        **resultado["inputs_proposta"],
+    }
+    try:
+        resultado["valor_proposta"] = calcular_valor_proposta_cache(PropostaInput(**campos).dict())
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=formatar_erro_validacao(e))
+    return resultado
+
 # --- ENDPOINT DE WEBHOOK CORRIGIDO ---
 @app.post("/webhook/new-proposal/{location_id}")
-async def handle_new_proposal(location_id: str, request: Request, background_tasks: BackgroundTasks):
+async def handle_new_proposal(location_id: str, request: Request):
     """
-    Endpoint que recebe os dados (do GHL ou de um teste) e inicia o processo
-    de criação/atualização de contato e oportunidade.
+    Endpoint que recebe os dados (do GHL ou de um teste) e grava o payload na
+    fila durável; os workers fazem a criação/atualização de contato e oportunidade.
     Ele lê o corpo da requisição de forma bruta para evitar erros de validação.
+    Repetições com o mesmo Idempotency-Key (ou, sem o cabeçalho, com o mesmo
+    cliente/negocio/valor_proposta) devolvem o job original sem chamar o GHL de novo.
     """
-    print(f"--- Webhook recebido para a location: {location_id} ---")
-    try:
-        payload = await request.json()
-        print("--- Payload JSON recebido com sucesso. Iniciando processamento em background. ---")
-        
-        # Chama a lógica principal em segundo plano
-        background_tasks.add_task(process_proposal_webhook, location_id, payload)
-        
-        return {"status": "success", "detail": "Payload recebido e processamento iniciado."}
-        
-    except json.JSONDecodeError:
-        body_text = await request.body()
-        print("!!! ERRO: Não foi possível decodificar o corpo da requisição como JSON.")
-        print(f"--- Corpo recebido (texto bruto): ---\n{body_text.decode()}")
-        raise HTTPException(status_code=400, detail="O corpo da requisição não é um JSON válido.")
+    logger.info("Webhook recebido.", extra={"location_id": location_id})
+    with rastrear("webhook.receber", location_id=location_id) as span:
+        try:
+            with rastrear("webhook.ler_json"):
+                payload = await request.json()
+            if not isinstance(payload, dict):
+                raise HTTPException(status_code=400, detail="O corpo da requisição deve ser um objeto JSON.")
+
+            chave = chave_idempotencia(location_id, payload, request.headers.get("Idempotency-Key"))
+
+            # Grava na fila (SQLite) e responde; o processamento fica com os workers
+            with rastrear("webhook.enfileirar"):
+                job, duplicado = await asyncio.to_thread(
+                    registro_idempotencia.enfileirar_ou_obter, chave, location_id, payload
+                )
+            # O processamento aparece no trace "job-<id>" (ver WebhookWorkerPool)
+            span.definir(job_id=job["id"], duplicado=duplicado)
+            if duplicado:
+                logger.info("Webhook repetido (chave %s...): devolvendo o job %s (%s).", chave[:12], job["id"], job["status"],
+                            extra={"location_id": location_id, "job_id": job["id"]})
+                return {
+                    "status": "duplicate",
+                    "detail": "Payload já recebido; nenhuma nova chamada ao GHL foi feita.",
+                    "job_id": job["id"],
+                    "job_status": job["status"],
+                    "resultado": job["resultado"],
+                }
+
+            workers_webhooks.notificar()
+            logger.info("Payload recebido; job %s enfileirado.", job["id"], extra={"location_id": location_id, "job_id": job["id"]})
+
+            return {"status": "success", "detail": "Payload recebido e processamento iniciado.", "job_id": job["id"]}
+
+        except json.JSONDecodeError:
+            body_text = await request.body()
+            # Só o tamanho: o corpo bruto pode ter dados pessoais e não passa pela redação de campos
+            logger.warning("Não foi possível decodificar o corpo da requisição como JSON (%s bytes).", len(body_text),
+                           extra={"location_id": location_id})
+            raise HTTPException(status_code=400, detail="O corpo da requisição não é um JSON válido.")
+
+@app.post("/propostas", response_model=PropostaFormOutput)
+async def enviar_proposta(formulario: PropostaFormInput, request: Request):
+    """
+    Envio do formulário em uma única requisição: precifica a proposta, completa
+    valor e quantidade de módulos calculados no servidor, enfileira a criação do
+    contato/oportunidade no GHL e devolve o detalhamento do preço.
+    """
+    location_id = formulario.location_id or GHL_LOCATION_ID
+    if not location_id:
+        raise HTTPException(status_code=400, detail="Informe 'location_id' ou defina GHL_LOCATION_ID no .env.")
+
+    dados = formulario.dict()
+    with rastrear("proposta.receber", location_id=location_id) as span:
+        try:
+            with rastrear("proposta.calcular"):
+                detalhamento = calcular_detalhamento_proposta(montar_inputs_calculo(dados))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        payload = montar_payload_webhook(dados, detalhamento)
+        chave = chave_idempotencia(location_id, payload, request.headers.get("Idempotency-Key"))
+        with rastrear("webhook.enfileirar"):
+            job, duplicado = await asyncio.to_thread(
+                registro_idempotencia.enfileirar_ou_obter, chave, location_id, payload
+            )
+        span.definir(job_id=job["id"], duplicado=duplicado)
+    if not duplicado:
+        workers_webhooks.notificar()
+    logger.info("Proposta precificada em R$ %.2f; job %s (%s).", detalhamento["valor_proposta"], job["id"],
+                "repetido" if duplicado else "enfileirado", extra={"location_id": location_id, "job_id": job["id"]})
+
+    return {
+        "valor_proposta": detalhamento["valor_proposta"],
+        "quantidade_modulos": detalhamento["quantidade_modulos"],
+        "detalhamento": detalhamento,
+        "location_id": location_id,
+        "job_id": job["id"],
+        "job_status": job["status"],
+        "duplicado": duplicado,
+    }
+
+@app.get("/webhook/jobs/{job_id}")
+def get_webhook_job(job_id: int):
+    """Consulta o status de um job da fila de webhooks."""
+    job = fila_webhooks.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} não encontrado.")
+    job.pop("payload", None)
+    return job
+
+@app.get("/webhook/idempotencia")
+def get_idempotencia():
+    """Estatísticas do registro de chaves de idempotência (inclui duplicados suprimidos)."""
+    return registro_idempotencia.estatisticas()
+
+def _formatar_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else None
+
+@app.get("/tokens/agenda")
+def get_agenda_tokens():
+    """Expiração e próximo refresh planejado de cada token (agência e locations)."""
+    agenda = token_scheduler.agenda()
+    for item in agenda:
+        item["expira_em_legivel"] = _formatar_timestamp(item["expira_em"])
+        item["proximo_refresh_em_legivel"] = _formatar_timestamp(item["proximo_refresh_em"])
+    return {"ativo": TOKEN_REFRESH_ATIVO, "lider": token_scheduler.lider, "tokens": agenda}
+
+@app.get("/metrics")
+def get_metrics():
+    """Métricas no formato texto do Prometheus."""
+    return Response(content=metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/debug/traces")
+def get_traces(trace_id: Optional[str] = None,
+               nome: Optional[str] = None,
+               min_duracao_ms: float = 0.0,
+               limite: int = 50):
+    """
+    Traces recentes do buffer em memória (mais novos primeiro). trace_id é o
+    X-Request-ID da requisição ou "job-<id>" para o processamento de um job.
+    """
+    return {"ativo": rastreador.ativo, "traces": rastreador.consultar(trace_id, nome, min_duracao_ms, limite)}
+
+@app.on_event("startup")
+async def iniciar_workers():
+    """Inicia os workers da fila de webhooks e o agendador de refresh de tokens."""
+    workers_webhooks.iniciar()
+    if TOKEN_REFRESH_ATIVO:
+        token_scheduler.iniciar()
+
+@app.on_event("shutdown")
+async def fechar_clientes_http():
+    """Para os workers e fecha os pools de conexão com o GoHighLevel ao encerrar a API."""
+    await token_scheduler.parar()
+    await workers_webhooks.parar()
+    await ghl_http_async.aclose()
+    ghl_http.close()
 
 # --- Bloco para execução direta ---
 if __name__ == "__main__":
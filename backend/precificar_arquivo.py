@@ -0,0 +1,59 @@
+# backend/precificar_arquivo.py
+
+import sys
+import time
+import argparse
+
+from services.lote_stream import (
+    FORMATOS, LOTE_STREAM_BLOCO, detectar_formato, escrever_csv, escrever_ndjson, ler_registros, precificar_em_blocos,
+)
+
+
+def contar(blocos, resumo):
+    """Repassa os blocos anotando totais de linhas e de erros."""
+    for bloco in blocos:
+        resumo["linhas"] += len(bloco)
+        resumo["erros"] += sum(1 for linha in bloco if linha["erro"])
+        yield bloco
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precifica um arquivo CSV ou NDJSON de propostas (uma por linha) sem carregá-lo inteiro na memória."
+    )
+    parser.add_argument("entrada", help="Arquivo de entrada ('-' para stdin).")
+    parser.add_argument("--saida", default="-", help="Arquivo de saída (padrão: stdout).")
+    parser.add_argument("--formato", choices=FORMATOS, default=None, help="Formato da entrada (padrão: pela extensão).")
+    parser.add_argument("--formato-saida", choices=FORMATOS, default=None, help="Formato da saída (padrão: o da entrada).")
+    parser.add_argument("--bloco", type=int, default=LOTE_STREAM_BLOCO, help="Linhas precificadas por bloco.")
+    parser.add_argument("--simulacao", action="store_true",
+                        help="Acrescenta payback, TIR, VPL e economia da simulação de longo prazo.")
+    args = parser.parse_args()
+
+    formato = args.formato or detectar_formato(nome_arquivo=args.entrada)
+    if formato is None:
+        parser.error("não foi possível deduzir o formato pela extensão; use --formato.")
+    formato_saida = args.formato_saida or formato
+
+    entrada = sys.stdin if args.entrada == "-" else open(args.entrada, "r", encoding="utf-8-sig", newline="")
+    saida = sys.stdout if args.saida == "-" else open(args.saida, "w", encoding="utf-8", newline="")
+
+    resumo = {"linhas": 0, "erros": 0}
+    inicio = time.perf_counter()
+    try:
+        simulacao = {} if args.simulacao else None
+        blocos = contar(precificar_em_blocos(ler_registros(entrada, formato), max(1, args.bloco), simulacao), resumo)
+        escrever = escrever_csv if formato_saida == "csv" else escrever_ndjson
+        for texto in escrever(blocos):
+            saida.write(texto)
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+
+    decorrido = time.perf_counter() - inicio
+    # Resumo em stderr para não misturar com a saída em stdout
+    print(f">>> {resumo['linhas']} linha(s) precificada(s) em {decorrido:.1f}s "
+          f"({resumo['linhas'] / decorrido if decorrido else 0:.0f} linhas/s); {resumo['erros']} com erro.",
+          file=sys.stderr)
@@ -0,0 +1,56 @@
+# backend/services/cache_precificacao.py
+
+import os
+from typing import Any, Dict, Tuple
+
+from services.calculos import VALORES_PADRAO, calcular_valor_proposta
+from services.calculos_lote import CAMPOS_NUMERICOS
+from services.lru_ttl_cache import AUSENTE, LRUTTLCache
+
+# Tamanho e TTL configuráveis pelo .env (TTL 0 = sem expiração)
+PRECIFICACAO_CACHE_TAMANHO = int(os.getenv("PRECIFICACAO_CACHE_TAMANHO", "1024"))
+PRECIFICACAO_CACHE_TTL = float(os.getenv("PRECIFICACAO_CACHE_TTL", "3600"))
+
+cache_precificacao = LRUTTLCache(
+    tamanho_maximo=PRECIFICACAO_CACHE_TAMANHO,
+    ttl_segundos=PRECIFICACAO_CACHE_TTL,
+)
+
+
+def _categoria_desconto(forma_desconto: Any) -> str:
+    """Reduz forma_desconto às três categorias que calcular_valor_proposta distingue."""
+    forma = str(forma_desconto).lower()
+    if forma in ("porcentagem", "%"):
+        return "porcentagem"
+    if forma == "valor":
+        return "valor"
+    return "sem desconto"
+
+
+def chave_canonica(inputs: Dict[str, Any]) -> Tuple:
+    """
+    Monta a chave do cache a partir dos campos que afetam o preço, já com os
+    valores padrão aplicados e a forma de desconto normalizada. Os números
+    entram exatos (sem arredondar): o cálculo usa ceil() na quantidade de
+    módulos, então qualquer diferença pode mudar o preço. Campos extras (que o
+    cálculo ignora) não entram na chave.
+    """
+    numeros = tuple(
+        float(inputs[campo] if campo in inputs else VALORES_PADRAO[campo])
+        for campo in CAMPOS_NUMERICOS
+    )
+    forma = _categoria_desconto(inputs.get("forma_desconto", VALORES_PADRAO["forma_desconto"]))
+    return numeros + (forma,)
+
+
+def calcular_valor_proposta_cache(inputs: Dict[str, Any]) -> float:
+    """
+    Mesmo contrato de calcular_valor_proposta, consultando o cache antes de
+    recalcular. Erros de cálculo não são armazenados.
+    """
+    chave = chave_canonica(inputs)
+    valor = cache_precificacao.get(chave)
+    if valor is AUSENTE:
+        valor = calcular_valor_proposta(inputs)
+        cache_precificacao.set(chave, valor)
+    return valor
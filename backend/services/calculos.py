@@ -1,7 +1,27 @@
 # backend/services/calculos.py
 
 from math import ceil
-from typing import Dict
+from typing import Any, Dict
+
+# Valores assumidos quando um campo opcional não vem nos inputs
+VALORES_PADRAO = {
+    "indice_irrad": 3.79,
+    "taxa_desempenho": 0.8,
+    "custo_unitario_modulo": 1000.0,
+    "quantidade_inversor": 1,
+    "custo_unitario_inversor": 3000.0,
+    "custo_estrutura": 500.0,
+    "custo_cabos": 200.0,
+    "custo_base_por_kw": 400.0,
+    "ajuste_telhas": 100.0,
+    "ajuste_padrao_entrada": 100.0,
+    "percentual_indiretos": 0.05,
+    "percentual_margem": 0.20,
+    "aliquota_impostos": 0.15,
+    "valor_adicional": 0.0,
+    "forma_desconto": "Sem Desconto",
+    "valor_desconto": 0.0,
+}
 
 def calcular_quantidade_modulos(consumo_mensal: float,
                                potencia_modulo_w: float,
@@ -18,64 +38,65 @@ def calcular_quantidade_modulos(consumo_mensal: float,
     geracao_modulo = (potencia_modulo_w / 1000.0) * indice_irrad * taxa_desempenho
     return ceil(geracao_diaria / geracao_modulo)
 
-def calcular_valor_proposta(inputs: Dict) -> float:
+def calcular_detalhamento_proposta(inputs: Dict) -> Dict[str, Any]:
     """
     Orquestra a precificação completa:
     1. Pega inputs (consumo, potência, custos, percentuais etc.)
     2. Calcula quantidade de módulos
     3. Calcula custos de equipamentos, mão de obra, indiretos, margem, impostos, descontos…
     (por ora, usamos valores fixos como placeholders)
+    Devolve cada etapa do cálculo (valores em R$ arredondados a centavos).
     """
     # --- 1) Calcular quantidade de módulos ---
     quantidade_modulos = calcular_quantidade_modulos(
         consumo_mensal=inputs["consumo_medio_mensal"],
         potencia_modulo_w=inputs["potencia_modulos_w"],
-        indice_irrad=inputs.get("indice_irrad", 3.79),
-        taxa_desempenho=inputs.get("taxa_desempenho", 0.8),
+        indice_irrad=inputs.get("indice_irrad", VALORES_PADRAO["indice_irrad"]),
+        taxa_desempenho=inputs.get("taxa_desempenho", VALORES_PADRAO["taxa_desempenho"]),
     )
 
     # --- 2) Custos de Equipamentos (placeholder simples) ---
-    custo_unitario_modulo = inputs.get("custo_unitario_modulo", 1000.0)
+    custo_unitario_modulo = inputs.get("custo_unitario_modulo", VALORES_PADRAO["custo_unitario_modulo"])
     custo_total_modulos = quantidade_modulos * custo_unitario_modulo
 
-    quantidade_inversor = inputs.get("quantidade_inversor", 1)
-    custo_unitario_inversor = inputs.get("custo_unitario_inversor", 3000.0)
+    quantidade_inversor = inputs.get("quantidade_inversor", VALORES_PADRAO["quantidade_inversor"])
+    custo_unitario_inversor = inputs.get("custo_unitario_inversor", VALORES_PADRAO["custo_unitario_inversor"])
     custo_total_inversor = quantidade_inversor * custo_unitario_inversor
 
-    custo_estrutura = inputs.get("custo_estrutura", 500.0)
-    custo_cabos = inputs.get("custo_cabos", 200.0)
+    custo_estrutura = inputs.get("custo_estrutura", VALORES_PADRAO["custo_estrutura"])
+    custo_cabos = inputs.get("custo_cabos", VALORES_PADRAO["custo_cabos"])
 
     ce = custo_total_modulos + custo_total_inversor + custo_estrutura + custo_cabos
 
     # --- 3) Custo de Mão de Obra (placeholder) ---
     potencia_sistema_kw = inputs["potencia_sistema_kw"]
-    custo_base_por_kw = inputs.get("custo_base_por_kw", 400.0)
-    ajuste_telhas = inputs.get("ajuste_telhas", 100.0)
-    ajuste_padrao = inputs.get("ajuste_padrao_entrada", 100.0)
+    custo_base_por_kw = inputs.get("custo_base_por_kw", VALORES_PADRAO["custo_base_por_kw"])
+    ajuste_telhas = inputs.get("ajuste_telhas", VALORES_PADRAO["ajuste_telhas"])
+    ajuste_padrao = inputs.get("ajuste_padrao_entrada", VALORES_PADRAO["ajuste_padrao_entrada"])
     cmo = (potencia_sistema_kw * custo_base_por_kw) + ajuste_telhas + ajuste_padrao
 
     # --- 4) Custos Indiretos ---
-    percentual_indiretos = inputs.get("percentual_indiretos", 0.05)
+    percentual_indiretos = inputs.get("percentual_indiretos", VALORES_PADRAO["percentual_indiretos"])
     ci = (ce + cmo) * percentual_indiretos
 
     # --- 5) Custo Total do Projeto ---
     ctp = ce + cmo + ci
 
     # --- 6) Aplicar margem e impostos ---
-    percentual_margem = inputs.get("percentual_margem", 0.20)
+    percentual_margem = inputs.get("percentual_margem", VALORES_PADRAO["percentual_margem"])
     valor_margem = ctp * percentual_margem
     preco_antes_impostos = ctp + valor_margem
 
-    aliquota_impostos = inputs.get("aliquota_impostos", 0.15)
+    aliquota_impostos = inputs.get("aliquota_impostos", VALORES_PADRAO["aliquota_impostos"])
     valor_impostos = preco_antes_impostos * aliquota_impostos
     preco_com_impostos = preco_antes_impostos + valor_impostos
 
     # --- 7) Adicionar valor adicional e aplicar desconto ---
-    valor_adicional = inputs.get("valor_adicional", 0.0)
+    valor_adicional = inputs.get("valor_adicional", VALORES_PADRAO["valor_adicional"])
     preco_antes_desconto = preco_com_impostos + valor_adicional
 
-    forma_desconto = inputs.get("forma_desconto", "Sem Desconto")
-    valor_desconto = inputs.get("valor_desconto", 0.0)
+    forma_desconto = inputs.get("forma_desconto", VALORES_PADRAO["forma_desconto"])
+    valor_desconto = inputs.get("valor_desconto", VALORES_PADRAO["valor_desconto"])
     if forma_desconto.lower() in ("porcentagem", "%"):
         preco_final = preco_antes_desconto * (1 - valor_desconto / 100.0)
     elif forma_desconto.lower() == "valor":
@@ -83,4 +104,24 @@ def calcular_valor_proposta(inputs: Dict) -> float:
     else:
         preco_final = preco_antes_desconto
 
-    return round(preco_final, 2)
+    return {
+        "quantidade_modulos": quantidade_modulos,
+        "custo_total_modulos": round(custo_total_modulos, 2),
+        "custo_total_inversor": round(custo_total_inversor, 2),
+        "custo_equipamentos": round(ce, 2),
+        "custo_mao_de_obra": round(cmo, 2),
+        "custos_indiretos": round(ci, 2),
+        "custo_total_projeto": round(ctp, 2),
+        "valor_margem": round(valor_margem, 2),
+        "preco_antes_impostos": round(preco_antes_impostos, 2),
+        "valor_impostos": round(valor_impostos, 2),
+        "preco_com_impostos": round(preco_com_impostos, 2),
+        "valor_adicional": round(valor_adicional, 2),
+        "preco_antes_desconto": round(preco_antes_desconto, 2),
+        "valor_desconto_aplicado": round(preco_antes_desconto - preco_final, 2),
+        "valor_proposta": round(preco_final, 2),
+    }
+
+def calcular_valor_proposta(inputs: Dict) -> float:
+    """Preço final da proposta (ver calcular_detalhamento_proposta)."""
+    return calcular_detalhamento_proposta(inputs)["valor_proposta"]
@@ -0,0 +1,81 @@
+# backend/services/calculos_cenarios.py
+
+import numpy as np
+from typing import Dict, List, Any, Sequence
+
+from services.calculos import VALORES_PADRAO
+from services.calculos_lote import CAMPOS_NUMERICOS, calcular_lote
+
+
+def contar_faixa(inicio: float, fim: float, passo: float) -> int:
+    """
+    Quantidade de valores que expandir_faixa geraria, sem gerá-los (permite
+    checar o tamanho da grade antes de alocar qualquer coisa).
+    """
+    if not all(np.isfinite(v) for v in (inicio, fim, passo)):
+        raise ValueError("Início, fim e passo da faixa devem ser números finitos.")
+    if passo <= 0:
+        raise ValueError("O passo da faixa deve ser maior que zero.")
+    if fim < inicio:
+        raise ValueError("O fim da faixa deve ser maior ou igual ao início.")
+    quantidade = np.floor((fim - inicio) / passo + 1e-9)
+    if not np.isfinite(quantidade):
+        raise ValueError("A faixa tem valores demais para o passo informado.")
+    return int(quantidade) + 1
+
+
+def expandir_faixa(inicio: float, fim: float, passo: float) -> List[float]:
+    """
+    Gera os valores de inicio até fim (inclusive) com o passo informado.
+    Os valores são arredondados em 10 casas para não propagar resíduos de ponto
+    flutuante (ex.: 0.30000000000000004) para a grade.
+    Quem recebe faixas de fora deve limitar contar_faixa() antes de chamar.
+    """
+    quantidade = contar_faixa(inicio, fim, passo)
+    return np.round(inicio + passo * np.arange(quantidade), 10).tolist()
+
+
+def _para_lista_json(valores: np.ndarray, valido: np.ndarray, tipo) -> list:
+    """Converte a grade em listas aninhadas, trocando células inválidas por None."""
+    saida = valores.astype(object)
+    saida[valido] = [tipo(v) for v in valores[valido].tolist()]
+    saida[~valido] = None
+    return saida.tolist()
+
+
+def calcular_grade_cenarios(base: Dict[str, Any], variacoes: Dict[str, Sequence]) -> Dict[str, Any]:
+    """
+    Calcula valor_proposta e quantidade de módulos para o produto cartesiano das
+    variações informadas, partindo dos valores de `base`.
+
+    Cada campo variado vira um eixo da grade. Os demais campos entram como
+    escalares e o NumPy faz o broadcast, então o custo é de um único passe
+    vetorizado em calcular_lote, sem materializar a grade campo a campo.
+    """
+    campos = list(variacoes.keys())
+    formato = tuple(len(variacoes[campo]) for campo in campos)
+
+    colunas: Dict[str, Any] = {}
+    for campo in CAMPOS_NUMERICOS + ("forma_desconto",):
+        dtype = str if campo == "forma_desconto" else np.float64
+        if campo in variacoes:
+            eixo = campos.index(campo)
+            forma_eixo = [1] * len(campos)
+            forma_eixo[eixo] = formato[eixo]
+            colunas[campo] = np.array(variacoes[campo], dtype=dtype).reshape(forma_eixo)
+        else:
+            colunas[campo] = np.array(base.get(campo, VALORES_PADRAO.get(campo)), dtype=dtype)
+
+    resultado = calcular_lote(colunas)
+    valido = np.broadcast_to(resultado["valido"], formato)
+    valor_proposta = np.broadcast_to(resultado["valor_proposta"], formato)
+    quantidade_modulos = np.broadcast_to(resultado["quantidade_modulos"], formato)
+
+    return {
+        "eixos": [{"campo": campo, "valores": list(variacoes[campo])} for campo in campos],
+        "formato": list(formato),
+        "total_celulas": int(np.prod(formato)),
+        "celulas_invalidas": int((~valido).sum()),
+        "valor_proposta": _para_lista_json(valor_proposta, valido, float),
+        "quantidade_modulos": _para_lista_json(quantidade_modulos, valido, int),
+    }
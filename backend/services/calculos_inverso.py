@@ -0,0 +1,100 @@
+# backend/services/calculos_inverso.py
+
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+from services.calculos import VALORES_PADRAO
+from services.calculos_lote import CAMPOS_NUMERICOS, calcular_lote
+
+# Campos que podem ser resolvidos a partir do valor_proposta desejado
+CAMPOS_RESOLVIVEIS = ("percentual_margem", "valor_desconto", "valor_adicional")
+
+# Valor resolvido negativo = o alvo está fora do que o campo consegue alcançar no sentido usual
+AVISOS_NEGATIVO = {
+    "percentual_margem": "Margem negativa: o preço alvo fica abaixo do custo do projeto com impostos.",
+    "valor_desconto": "Desconto negativo: o preço alvo fica acima do preço sem desconto.",
+    "valor_adicional": "Valor adicional negativo: o preço alvo fica abaixo do preço sem adicional.",
+}
+
+
+def _colunas_base(base: Dict[str, Any]) -> Dict[str, Any]:
+    """Colunas escalares (0-d) de calcular_lote, com os padrões para campos ausentes."""
+    colunas: Dict[str, Any] = {
+        campo: np.array(base.get(campo, VALORES_PADRAO.get(campo)), dtype=np.float64) for campo in CAMPOS_NUMERICOS
+    }
+    colunas["forma_desconto"] = np.array(base.get("forma_desconto", VALORES_PADRAO["forma_desconto"]), dtype=str)
+    return colunas
+
+
+def resolver_campo(base: Dict[str, Any],
+                   campo: str,
+                   alvos: Sequence[float],
+                   casas_decimais: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Valor de `campo` que faz a proposta `base` custar cada um dos `alvos`.
+
+    Do custo total do projeto (ctp) em diante o cálculo é uma cadeia de passos
+    afins (margem, impostos, adicional, desconto), então cada passo é desfeito
+    em forma fechada, para todos os alvos de uma vez:
+      preco_com_impostos = ctp * (1 + margem) * (1 + impostos)
+      preco_antes_desconto = preco_com_impostos + adicional
+      valor_proposta = preco_antes_desconto * (1 - desconto / 100)  (ou - desconto, se "Valor")
+
+    Com `casas_decimais`, o valor resolvido é arredondado (como seria digitado
+    no formulário). Cada resultado traz o valor_proposta recalculado pelo
+    caminho normal com o valor resolvido, para conferência.
+    """
+    if campo not in CAMPOS_RESOLVIVEIS:
+        raise ValueError(f"Campo não resolvível: '{campo}'. Use um de: {', '.join(CAMPOS_RESOLVIVEIS)}.")
+
+    colunas = _colunas_base(base)
+    forma = str(colunas["forma_desconto"]).lower()
+    desconto_percentual = forma in ("porcentagem", "%")
+    desconto_valor = forma == "valor"
+    if campo == "valor_desconto" and not (desconto_percentual or desconto_valor):
+        raise ValueError("Para resolver valor_desconto, a forma_desconto deve ser 'Porcentagem' ou 'Valor'.")
+
+    etapas = calcular_lote(colunas)
+    alvo = np.asarray(alvos, dtype=np.float64)
+    desconto = colunas["valor_desconto"]
+    adicional = colunas["valor_adicional"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if campo == "valor_desconto":
+            if desconto_percentual:
+                valores = (1 - alvo / etapas["preco_antes_desconto"]) * 100.0
+            else:
+                valores = etapas["preco_antes_desconto"] - alvo
+        else:
+            # Desfaz o desconto atual: preço antes do desconto que leva ao alvo
+            if desconto_percentual:
+                antes_desconto = alvo / (1 - desconto / 100.0)
+            elif desconto_valor:
+                antes_desconto = alvo + desconto
+            else:
+                antes_desconto = alvo
+            if campo == "valor_adicional":
+                valores = antes_desconto - etapas["preco_com_impostos"]
+            else:
+                preco_antes_impostos = (antes_desconto - adicional) / (1 + colunas["aliquota_impostos"])
+                valores = preco_antes_impostos / etapas["ctp"] - 1
+
+    valores = np.broadcast_to(valores, alvo.shape)
+    if casas_decimais is not None:
+        valores = np.round(valores, casas_decimais)
+
+    # Conferência: o caminho direto com o valor resolvido, também vetorizado
+    conferencia = calcular_lote({**colunas, campo: valores})
+    valido = np.isfinite(valores) & np.broadcast_to(conferencia["valido"], alvo.shape)
+    valor_proposta = np.broadcast_to(conferencia["valor_proposta"], alvo.shape)
+
+    resultados: List[Dict[str, Any]] = []
+    for i, (alvo_i, valor_i) in enumerate(zip(alvo.tolist(), valores.tolist())):
+        if not valido[i]:
+            resultados.append({"alvo": alvo_i, "erro": "Sem solução: verifique custos, impostos e desconto da proposta base."})
+            continue
+        resultado = {"alvo": alvo_i, campo: valor_i, "valor_proposta": float(valor_proposta[i])}
+        if valor_i < 0:
+            resultado["aviso"] = AVISOS_NEGATIVO[campo]
+        resultados.append(resultado)
+    return resultados
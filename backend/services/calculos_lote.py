@@ -0,0 +1,174 @@
+# backend/services/calculos_lote.py
+
+import numpy as np
+from typing import Dict, List, Any, Sequence
+
+from services.calculos import VALORES_PADRAO
+
+# Campos que calcular_valor_proposta acessa com inputs[...] (sem valor padrão)
+CAMPOS_OBRIGATORIOS = ("consumo_medio_mensal", "potencia_modulos_w", "potencia_sistema_kw")
+
+# Campos numéricos do pipeline, na ordem em que viram colunas
+CAMPOS_NUMERICOS = CAMPOS_OBRIGATORIOS + tuple(
+    campo for campo in VALORES_PADRAO if campo != "forma_desconto"
+)
+
+
+def _coluna_numerica(linhas: Sequence[Dict], campo: str, erros: Dict[int, str]) -> np.ndarray:
+    """
+    Monta a coluna float64 de um campo. Linhas sem o campo obrigatório ou com valor
+    não numérico ficam com NaN e recebem uma mensagem em `erros`.
+    """
+    padrao = VALORES_PADRAO.get(campo)
+    obrigatorio = campo in CAMPOS_OBRIGATORIOS
+    try:
+        valores = [linha[campo] if obrigatorio else linha.get(campo, padrao) for linha in linhas]
+        return np.array(valores, dtype=np.float64)
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    # Caminho lento: só acontece quando alguma linha está malformada
+    coluna = np.full(len(linhas), np.nan)
+    for i, linha in enumerate(linhas):
+        try:
+            valor = linha[campo] if obrigatorio else linha.get(campo, padrao)
+            coluna[i] = float(valor)
+        except KeyError:
+            erros.setdefault(i, f"Campo obrigatório ausente: '{campo}'.")
+        except (TypeError, ValueError):
+            erros.setdefault(i, f"Valor inválido para '{campo}': {linha.get(campo)!r}.")
+    return coluna
+
+
+def montar_colunas(linhas: Sequence[Dict]) -> Dict[str, Any]:
+    """
+    Converte uma lista de inputs (o mesmo dict aceito por calcular_valor_proposta)
+    em colunas NumPy. Retorna o dicionário de colunas e, em "erros", as linhas
+    que não puderam ser convertidas.
+    """
+    erros: Dict[int, str] = {}
+    colunas: Dict[str, Any] = {
+        campo: _coluna_numerica(linhas, campo, erros) for campo in CAMPOS_NUMERICOS
+    }
+    colunas["forma_desconto"] = np.array(
+        [str(linha.get("forma_desconto", VALORES_PADRAO["forma_desconto"])) for linha in linhas],
+        dtype=str,
+    )
+    colunas["erros"] = erros
+    return colunas
+
+
+def arredondar_centavos(valores: np.ndarray) -> np.ndarray:
+    """
+    Arredonda para 2 casas com o round() do Python, elemento a elemento.
+    np.round multiplica por 100 antes de arredondar e diverge do round() nativo
+    em alguns valores terminados em 5; aqui o resultado precisa ser idêntico ao
+    caminho escalar.
+    """
+    return np.array([round(v, 2) for v in valores.tolist()], dtype=np.float64)
+
+
+def calcular_lote(colunas: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Executa, coluna a coluna, os mesmos passos de calcular_quantidade_modulos e
+    calcular_valor_proposta, na mesma ordem de operações (o resultado em float64
+    é bit a bit igual ao escalar). Retorna todas as etapas intermediárias e a
+    máscara "valido" (False onde o escalar lançaria exceção).
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # --- 1) Quantidade de módulos ---
+        geracao_diaria = colunas["consumo_medio_mensal"] / 30.0
+        geracao_modulo = (colunas["potencia_modulos_w"] / 1000.0) * colunas["indice_irrad"] * colunas["taxa_desempenho"]
+        quantidade_modulos = np.ceil(geracao_diaria / geracao_modulo)
+
+        # --- 2) Custos de Equipamentos ---
+        custo_total_modulos = quantidade_modulos * colunas["custo_unitario_modulo"]
+        custo_total_inversor = colunas["quantidade_inversor"] * colunas["custo_unitario_inversor"]
+        ce = custo_total_modulos + custo_total_inversor + colunas["custo_estrutura"] + colunas["custo_cabos"]
+
+        # --- 3) Custo de Mão de Obra ---
+        cmo = (colunas["potencia_sistema_kw"] * colunas["custo_base_por_kw"]) + colunas["ajuste_telhas"] + colunas["ajuste_padrao_entrada"]
+
+        # --- 4) e 5) Custos Indiretos e Custo Total do Projeto ---
+        ci = (ce + cmo) * colunas["percentual_indiretos"]
+        ctp = ce + cmo + ci
+
+        # --- 6) Margem e impostos ---
+        valor_margem = ctp * colunas["percentual_margem"]
+        preco_antes_impostos = ctp + valor_margem
+        valor_impostos = preco_antes_impostos * colunas["aliquota_impostos"]
+        preco_com_impostos = preco_antes_impostos + valor_impostos
+
+        # --- 7) Valor adicional e desconto ---
+        preco_antes_desconto = preco_com_impostos + colunas["valor_adicional"]
+
+        formas = np.char.lower(colunas["forma_desconto"])
+        desconto_percentual = np.isin(formas, ("porcentagem", "%"))
+        desconto_valor = formas == "valor"
+        valor_desconto = colunas["valor_desconto"]
+        preco_final = np.where(
+            desconto_percentual,
+            preco_antes_desconto * (1 - valor_desconto / 100.0),
+            np.where(desconto_valor, preco_antes_desconto - valor_desconto, preco_antes_desconto),
+        )
+
+    valido = np.isfinite(quantidade_modulos) & np.isfinite(preco_final)
+    valor_proposta = np.full(preco_final.shape, np.nan)
+    valor_proposta[valido] = arredondar_centavos(preco_final[valido])
+
+    return {
+        "quantidade_modulos": quantidade_modulos,
+        "ce": ce,
+        "cmo": cmo,
+        "ci": ci,
+        "ctp": ctp,
+        "valor_margem": valor_margem,
+        "preco_antes_impostos": preco_antes_impostos,
+        "valor_impostos": valor_impostos,
+        "preco_com_impostos": preco_com_impostos,
+        "preco_antes_desconto": preco_antes_desconto,
+        "preco_final": preco_final,
+        "valor_proposta": valor_proposta,
+        "geracao_modulo": geracao_modulo,
+        "valido": valido,
+    }
+
+
+def _mensagem_erro_calculo(geracao_modulo: float) -> str:
+    """Reproduz a mensagem que o caminho escalar devolveria para a linha."""
+    if geracao_modulo == 0:
+        return "float division by zero"
+    return "Resultado não finito: verifique consumo, potência, irradiação e taxas informados."
+
+
+def calcular_valor_proposta_lote(linhas: Sequence[Dict]) -> List[Dict[str, Any]]:
+    """
+    Versão em lote de calcular_valor_proposta. Para cada linha devolve
+    {"indice", "valor_proposta", "quantidade_modulos"} ou {"indice", "erro"};
+    uma linha com erro não interrompe o restante do lote.
+    """
+    if not linhas:
+        return []
+
+    colunas = montar_colunas(linhas)
+    erros = colunas.pop("erros")
+    resultado = calcular_lote(colunas)
+
+    valores = resultado["valor_proposta"].tolist()
+    quantidades = resultado["quantidade_modulos"].tolist()
+    validos = resultado["valido"].tolist()
+    geracoes = resultado["geracao_modulo"].tolist()
+
+    saida: List[Dict[str, Any]] = []
+    for i in range(len(linhas)):
+        if i in erros:
+            saida.append({"indice": i, "erro": erros[i]})
+        elif not validos[i]:
+            saida.append({"indice": i, "erro": _mensagem_erro_calculo(geracoes[i])})
+        else:
+            saida.append({
+                "indice": i,
+                "valor_proposta": valores[i],
+                "quantidade_modulos": int(quantidades[i]),
+            })
+    return saida
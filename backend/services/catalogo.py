@@ -0,0 +1,245 @@
+# backend/services/catalogo.py
+
+import os
+import json
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.calculos import VALORES_PADRAO, calcular_quantidade_modulos
+
+# ------------------------------------------------------------
+# Catálogo local de módulos e inversores (JSON) e seleção do kit mais barato
+# ------------------------------------------------------------
+CATALOGO_EQUIPAMENTOS_PATH = os.getenv(
+    "CATALOGO_EQUIPAMENTOS_PATH", os.path.join(os.path.dirname(__file__), "..", "catalogo_equipamentos.json")
+)
+# Máximo de inversores iguais num mesmo kit
+CATALOGO_MAX_INVERSORES = int(os.getenv("CATALOGO_MAX_INVERSORES", "10"))
+# Faixas de tensão mínima de MPPT no índice de limite inferior dos inversores
+CATALOGO_NIVEIS_TENSAO = int(os.getenv("CATALOGO_NIVEIS_TENSAO", "32"))
+
+CAMPOS_MODULO = ("sku", "potencia_w", "voc_v", "vmp_v", "preco")
+CAMPOS_INVERSOR = ("sku", "potencia_ac_kw", "potencia_max_fv_kw", "mppt", "strings_por_mppt",
+                   "tensao_max_v", "tensao_min_mppt_v", "preco")
+
+
+def _validar_itens(itens: List[Dict[str, Any]], campos: tuple, tipo: str) -> None:
+    if not itens:
+        raise ValueError(f"O catálogo não tem nenhum {tipo}.")
+    for item in itens:
+        faltando = [campo for campo in campos if campo not in item]
+        if faltando:
+            raise ValueError(f"{tipo.capitalize()} {item.get('sku', '?')}: faltando {', '.join(faltando)}.")
+        for campo in campos[1:]:
+            if not isinstance(item[campo], (int, float)) or item[campo] <= 0:
+                raise ValueError(f"{tipo.capitalize()} {item['sku']}: '{campo}' deve ser um número positivo.")
+
+
+class CatalogoEquipamentos:
+    """
+    Módulos e inversores em arrays NumPy, montados uma vez na carga, mais um
+    índice ordenado de "custo mínimo de inversores para P kWp e V volts": o
+    limite inferior de todos os módulos sai de uma única busca vetorizada.
+    """
+
+    def __init__(self, modulos: List[Dict[str, Any]], inversores: List[Dict[str, Any]], origem: str = ""):
+        _validar_itens(modulos, CAMPOS_MODULO, "módulo")
+        _validar_itens(inversores, CAMPOS_INVERSOR, "inversor")
+        self.origem = origem
+        self.modulos = modulos
+        self.inversores = inversores
+
+        self.mod_potencia_w = np.array([m["potencia_w"] for m in modulos], dtype=np.float64)
+        self.mod_voc = np.array([m["voc_v"] for m in modulos], dtype=np.float64)
+        self.mod_vmp = np.array([m["vmp_v"] for m in modulos], dtype=np.float64)
+        self.mod_preco = np.array([m["preco"] for m in modulos], dtype=np.float64)
+
+        inv = self.inversores
+        self.inv_pmax_kw = np.array([i["potencia_max_fv_kw"] for i in inv], dtype=np.float64)
+        self.inv_preco = np.array([i["preco"] for i in inv], dtype=np.float64)
+        self.inv_strings = np.array([i["mppt"] * i["strings_por_mppt"] for i in inv], dtype=np.float64)
+        self.inv_tensao_max = np.array([i["tensao_max_v"] for i in inv], dtype=np.float64)
+        self.inv_tensao_min = np.array([i["tensao_min_mppt_v"] for i in inv], dtype=np.float64)
+        self._limites: Dict[int, tuple] = {}
+        self._indice_limite_inferior(CATALOGO_MAX_INVERSORES)
+
+    @classmethod
+    def do_arquivo(cls, caminho: str = CATALOGO_EQUIPAMENTOS_PATH) -> "CatalogoEquipamentos":
+        with open(caminho, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        return cls(dados.get("modulos", []), dados.get("inversores", []), origem=os.path.abspath(caminho))
+
+    def resumo(self) -> Dict[str, Any]:
+        return {"arquivo": self.origem, "modulos": len(self.modulos), "inversores": len(self.inversores)}
+
+    def _indice_limite_inferior(self, max_inversores: int):
+        """
+        Índice do custo mínimo de inversores para um arranjo de P kWp cuja
+        tensão total (módulos × Vmp) é V: o menor q × preço entre os inversores
+        com q × pmax >= P e tensão mínima de MPPT <= V (as demais restrições de
+        string só podem encarecer). Para cada faixa de tensão mínima há uma
+        função degrau de P; as faixas ficam lado a lado num único array ordenado
+        (deslocadas de `deslocamento`), para uma só busca binária por consulta.
+        """
+        if max_inversores not in self._limites:
+            niveis = np.unique(self.inv_tensao_min)
+            if len(niveis) > CATALOGO_NIVEIS_TENSAO:
+                niveis = np.unique(np.quantile(self.inv_tensao_min, np.linspace(0, 1, CATALOGO_NIVEIS_TENSAO),
+                                               method="higher"))
+            quantidades = np.arange(1, max_inversores + 1, dtype=np.float64)[:, None]
+            capacidade_max = max_inversores * float(self.inv_pmax_kw.max())
+            deslocamento = 4 * capacidade_max
+            chaves, custos_min = [], []
+            for k in range(len(niveis)):
+                # Faixa k: consultas com niveis[k] <= V < niveis[k + 1]; aceita todo inversor que poderia operar
+                if k + 1 < len(niveis):
+                    aceitos = self.inv_tensao_min < niveis[k + 1]
+                else:
+                    aceitos = np.full(len(self.inversores), True)
+                potencias = (quantidades * self.inv_pmax_kw[aceitos]).ravel()
+                custos = (quantidades * self.inv_preco[aceitos]).ravel()
+                ordem = np.argsort(potencias, kind="stable")
+                potencias, custos = potencias[ordem], custos[ordem]
+                # Só os degraus (pontos que são o próprio mínimo do sufixo) e, no fim da faixa, infinito
+                degraus = custos <= np.minimum.accumulate(custos[::-1])[::-1]
+                chaves += [potencias[degraus] + k * deslocamento, [k * deslocamento + 2 * capacidade_max]]
+                custos_min += [custos[degraus], [np.inf]]
+            self._limites[max_inversores] = (niveis, np.concatenate(chaves), np.concatenate(custos_min),
+                                             deslocamento, capacidade_max)
+        return self._limites[max_inversores]
+
+    def _limite_inferior_inversores(self, potencias_kw: np.ndarray, tensoes_v: np.ndarray,
+                                    max_inversores: int) -> np.ndarray:
+        niveis, chaves, custos_min, deslocamento, capacidade_max = self._indice_limite_inferior(max_inversores)
+        faixas = np.searchsorted(niveis, tensoes_v, side="right") - 1
+        consultas = np.maximum(faixas, 0) * deslocamento + np.minimum(potencias_kw, 2 * capacidade_max)
+        limites = custos_min[np.searchsorted(chaves, consultas, side="left")]
+        # Abaixo da menor tensão mínima do catálogo nenhum inversor opera
+        return np.where(faixas < 0, np.inf, limites)
+
+    def _melhor_inversor(self, quantidade_modulos: int, potencia_kw: float, voc: float, vmp: float,
+                         max_inversores: int):
+        """(custo, índice, quantidade) dos inversores mais baratos que atendem o arranjo, ou None."""
+        # Strings: no máximo tensao_max/Voc módulos em série e ao menos tensao_min/Vmp para o MPPT operar
+        por_string_max = np.floor(self.inv_tensao_max / voc)
+        por_string_min = np.ceil(self.inv_tensao_min / vmp)
+        modulos_por_inversor_max = self.inv_strings * por_string_max
+        with np.errstate(divide="ignore"):
+            quantidade = np.maximum.reduce([
+                np.ones_like(self.inv_pmax_kw),
+                np.ceil(potencia_kw / self.inv_pmax_kw),
+                np.ceil(quantidade_modulos / modulos_por_inversor_max),
+            ])
+        validos = (
+            (por_string_max >= por_string_min)
+            & (quantidade <= max_inversores)
+            & (quantidade * por_string_min <= quantidade_modulos)
+        )
+        if not validos.any():
+            return None
+        custos = np.where(validos, quantidade * self.inv_preco, np.inf)
+        indice = int(custos.argmin())
+        return float(custos[indice]), indice, int(quantidade[indice])
+
+    def selecionar_kit(self,
+                       consumo_medio_mensal: float,
+                       indice_irrad: float = VALORES_PADRAO["indice_irrad"],
+                       taxa_desempenho: float = VALORES_PADRAO["taxa_desempenho"],
+                       custo_base_por_kw: float = VALORES_PADRAO["custo_base_por_kw"],
+                       max_inversores: int = CATALOGO_MAX_INVERSORES) -> Optional[Dict[str, Any]]:
+        """
+        Kit (módulo × quantidade + inversor × quantidade) de menor custo para o
+        consumo. O custo inclui a mão de obra por kWp, pois a potência do kit
+        também entra no preço da proposta. Devolve None se nenhum kit atende.
+
+        Branch and bound: os módulos são percorridos em ordem de limite inferior
+        e só os que ainda podem bater o melhor kit têm as strings avaliadas
+        contra todos os inversores.
+        """
+        if consumo_medio_mensal <= 0:
+            raise ValueError("consumo_medio_mensal deve ser maior que zero.")
+
+        # Mesma conta de calcular_quantidade_modulos, para todos os módulos de uma vez
+        geracao_diaria = consumo_medio_mensal / 30.0
+        geracao_modulo = (self.mod_potencia_w / 1000.0) * indice_irrad * taxa_desempenho
+        quantidades = np.ceil(geracao_diaria / geracao_modulo)
+        potencias_kw = quantidades * self.mod_potencia_w / 1000.0
+        custos_modulos = quantidades * self.mod_preco + potencias_kw * custo_base_por_kw
+
+        # Limite inferior do kit de cada módulo: módulos + mão de obra + inversores mais baratos possíveis
+        limites = custos_modulos + self._limite_inferior_inversores(potencias_kw, quantidades * self.mod_vmp,
+                                                                    max_inversores)
+        melhor = None
+        melhor_custo = math.inf
+        avaliados = 0
+        # O módulo de menor limite costuma dar o kit; depois dele só se ordenam os módulos
+        # que ainda podem ficar abaixo do melhor kit, em vez do catálogo inteiro
+        pendentes = [int(limites.argmin())]
+        while pendentes:
+            j = pendentes.pop()
+            if limites[j] >= melhor_custo:
+                break
+            avaliados += 1
+            inversor = self._melhor_inversor(int(quantidades[j]), float(potencias_kw[j]), float(self.mod_voc[j]),
+                                             float(self.mod_vmp[j]), max_inversores)
+            if inversor is not None and custos_modulos[j] + inversor[0] < melhor_custo:
+                melhor_custo = float(custos_modulos[j]) + inversor[0]
+                melhor = (j, inversor[1], inversor[2])
+            if avaliados == 1:
+                restantes = np.flatnonzero(limites < melhor_custo)
+                restantes = restantes[restantes != j]
+                # Ordem decrescente: pop() tira sempre o de menor limite
+                pendentes = restantes[np.argsort(-limites[restantes], kind="stable")].tolist()
+
+        if melhor is None:
+            return None
+        j, i, quantidade_inversor = melhor
+        modulo, inversor = self.modulos[j], self.inversores[i]
+        quantidade_modulos = calcular_quantidade_modulos(consumo_medio_mensal, modulo["potencia_w"],
+                                                         indice_irrad, taxa_desempenho)
+        potencia_sistema_kw = round(quantidade_modulos * modulo["potencia_w"] / 1000.0, 3)
+        return {
+            "modulo": modulo,
+            "quantidade_modulos": quantidade_modulos,
+            "inversor": inversor,
+            "quantidade_inversor": quantidade_inversor,
+            "potencia_sistema_kw": potencia_sistema_kw,
+            "custo_modulos": round(quantidade_modulos * modulo["preco"], 2),
+            "custo_inversores": round(quantidade_inversor * inversor["preco"], 2),
+            "custo_mao_de_obra_kw": round(potencia_sistema_kw * custo_base_por_kw, 2),
+            "modulos_avaliados": avaliados,
+            # Campos do PropostaInput preenchidos pelo kit
+            "inputs_proposta": {
+                "potencia_modulos_w": modulo["potencia_w"],
+                "custo_unitario_modulo": modulo["preco"],
+                "potencia_sistema_kw": potencia_sistema_kw,
+                "quantidade_inversor": quantidade_inversor,
+                "custo_unitario_inversor": inversor["preco"],
+            },
+        }
+
+
+_catalogo: Optional[CatalogoEquipamentos] = None
+_lock_catalogo = threading.Lock()
+
+
+def obter_catalogo() -> CatalogoEquipamentos:
+    """Catálogo carregado do arquivo na primeira chamada (e reaproveitado depois)."""
+    global _catalogo
+    if _catalogo is None:
+        with _lock_catalogo:
+            if _catalogo is None:
+                _catalogo = CatalogoEquipamentos.do_arquivo()
+    return _catalogo
+
+
+def recarregar_catalogo() -> CatalogoEquipamentos:
+    """Relê o arquivo (ex.: depois de atualizar preços) e troca o catálogo em uso."""
+    global _catalogo
+    novo = CatalogoEquipamentos.do_arquivo()
+    with _lock_catalogo:
+        _catalogo = novo
+    return novo
@@ -1,49 +1,20 @@
 # backend/services/contact_manager.py
 
+import httpx
+import asyncio
+import logging
 import requests
-import json
-from typing import Dict, Any
-
-# Carregue o mapeamento de IDs que geramos anteriormente
-try:
-    with open("backend/services/custom_fields_ids.json", "r", encoding="utf-8") as f:
-        CUSTOM_FIELD_IDS = json.load(f)
-except FileNotFoundError:
-    print("!!! ALERTA: Arquivo 'custom_fields_ids.json' não encontrado. As funções de custom field não funcionarão.")
-    CUSTOM_FIELD_IDS = {}
-
-# --- CONSTANTES ---
-# Substitua estes valores pelos IDs corretos da sua conta GHL
-PIPELINE_ID = "8pMqwP5PVLR5LoM87lx8"
-PIPELINE_STAGE_ID = "6a4d8f9a-1aff-4bc3-8a3e-76714b7722a7"
-
-API_BASE_URL = "https://services.leadconnectorhq.com"
-API_VERSION = "2021-07-28"
-
-def get_location_token(location_id: str) -> str:
-    """
-    Carrega o token de acesso específico para uma location.
-    Esta função é uma cópia simplificada da que usamos nos outros scripts.
-    """
-    try:
-        with open("backend/installed_locations_data.json", "r", encoding="utf-8") as f:
-            locations_data = json.load(f)
-        
-        target_location = next((loc for loc in locations_data if loc.get("_id") == location_id or loc.get("id") == location_id), None)
-        
-        if not target_location:
-            raise ValueError(f"Location com ID '{location_id}' não encontrada.")
-            
-        token_data = target_location.get("location_specific_token_data", {})
-        access_token = token_data.get("access_token")
-        
-        if not access_token:
-            raise RuntimeError(f"Token de acesso não encontrado para a Location {location_id}.")
-            
-        return access_token
-    except FileNotFoundError:
-        raise FileNotFoundError("Arquivo 'installed_locations_data.json' não encontrado. Execute 'update_all_tokens.py'.")
+from typing import Dict, Any, Union
 
+from services.custom_fields import custom_field_cache
+from services.ghl_http import ghl_http, ghl_http_async, resumo_erro_ghl
+from services.location_tokens import get_location_token
+from services.pipelines import pipeline_resolver
+from services.tracing import rastreado
+
+logger = logging.getLogger(__name__)
+
+@rastreado("contato.montar_payload")
 def build_contact_payload(data: Dict[str, Any], location_id: str) -> Dict[str, Any]:
     """Constrói o payload para a API de contatos a partir dos dados do webhook."""
     cliente_data = data.get("cliente", {})
@@ -59,8 +30,9 @@ def build_contact_payload(data: Dict[str, Any], location_id: str) -> Dict[str, A
         "customFields": []
     }
 
-    # Mapeia os dados do formulário para os IDs dos custom fields
+    # Mapeia os dados do formulário para os IDs dos custom fields desta location
     # Adicione/Remova campos conforme sua necessidade
+    custom_field_ids = custom_field_cache.mapa(location_id)
     mapping = {
         "contact.cpf_ou_cnpj": cliente_data.get("cpf"),
         "contact.consumo_medio_mensal": data.get("consumo", {}).get("consumo_medio_mensal"),
@@ -73,70 +45,108 @@ def build_contact_payload(data: Dict[str, Any], location_id: str) -> Dict[str, A
     }
 
     for key, value in mapping.items():
-        field_id = CUSTOM_FIELD_IDS.get(key)
-        if field_id and value is not None:
+        if value is None:
+            continue
+        field_id = custom_field_ids.get(key)
+        if field_id:
             payload["customFields"].append({"id": field_id, "field_value": value})
+        else:
+            logger.warning("Custom field '%s' não existe na location %s; valor não enviado.", key, location_id)
             
     # Filtra chaves com valor None para não enviar dados vazios
     return {k: v for k, v in payload.items() if v is not None}
 
+@rastreado("contato.enviar")
 def upsert_contact(location_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     """Cria ou atualiza um contato no GoHighLevel."""
     access_token = get_location_token(location_id)
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Version": API_VERSION,
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
-    url = f"{API_BASE_URL}/contacts/upsert"
-    
-    print(f"-> Enviando dados de contato para GHL: {payload}")
-    resp = requests.post(url, headers=headers, json=payload)
+    logger.debug("Enviando contato ao GHL.", extra={"location_id": location_id, "payload": payload})
+    resp = ghl_http.post("/contacts/upsert", access_token, json=payload, limite=location_id)
     resp.raise_for_status() # Lança exceção para erros HTTP
     
     contact_data = resp.json().get("contact", {})
-    print(f"<- Contato processado com sucesso! ID: {contact_data.get('id')}")
+    logger.info("Contato processado.", extra={"location_id": location_id, "contact_id": contact_data.get("id")})
     return contact_data
 
-def create_opportunity(location_id: str, contact_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    """Cria uma oportunidade para um contato."""
-    access_token = get_location_token(location_id)
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Version": API_VERSION,
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
-    url = f"{API_BASE_URL}/opportunities/"
+def _rejeitou_custom_fields(e: Union[requests.exceptions.HTTPError, httpx.HTTPStatusError], payload: Dict[str, Any]) -> bool:
+    """400/422 num upsert com custom fields: provável ID de campo desconhecido (mapa desatualizado)."""
+    return e.response is not None and e.response.status_code in (400, 422) and bool(payload.get("customFields"))
 
+@rastreado("contato.upsert")
+def upsert_contact_from_data(location_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Monta o payload e faz o upsert. Se o GHL rejeitar os custom fields, atualiza
+    o mapa de IDs da location e tenta uma única vez mais com o payload refeito.
+    """
+    payload = build_contact_payload(data, location_id)
+    try:
+        return upsert_contact(location_id, payload)
+    except requests.exceptions.HTTPError as e:
+        if not _rejeitou_custom_fields(e, payload):
+            raise
+        logger.warning("GHL rejeitou o contato (%s); atualizando os custom fields da location %s.",
+                       e.response.status_code, location_id)
+        custom_field_cache.invalidar(location_id)
+        novo_payload = build_contact_payload(data, location_id)
+        if novo_payload == payload:
+            raise
+        return upsert_contact(location_id, novo_payload)
+
+@rastreado("oportunidade.montar_payload")
+def build_opportunity_payload(contact_id: str, data: Dict[str, Any], location_id: str) -> Dict[str, Any]:
+    """Constrói o payload da oportunidade a partir dos dados do webhook."""
     negocio_data = data.get("negocio", {})
-    
-    payload = {
-        "pipelineId": PIPELINE_ID,
-        "stageId": PIPELINE_STAGE_ID,
-        "name": negocio_data.get("titulo", f"Proposta para {data.get('cliente', {}).get('nome')}"),
+    # Pipeline e stage resolvidos por nome na location (índice em cache)
+    pipeline_id, stage_id = pipeline_resolver.resolver(location_id)
+    return {
+        "pipelineId": pipeline_id,
+        "stageId": stage_id,
+        "name": negocio_data.get("titulo") or f"Proposta para {data.get('cliente', {}).get('nome')}",
         "contactId": contact_id,
         "status": "open",
         "monetaryValue": data.get("valor_proposta")
     }
-    
-    print(f"-> Criando oportunidade: {payload}")
-    resp = requests.post(url, headers=headers, json=payload)
+
+@rastreado("oportunidade.enviar")
+def _post_opportunity(location_id: str, payload: Dict[str, Any]) -> requests.Response:
+    access_token = get_location_token(location_id)
+    logger.debug("Criando oportunidade.", extra={"location_id": location_id, "payload": payload})
+    resp = ghl_http.post("/opportunities/", access_token, json=payload, limite=location_id)
     resp.raise_for_status()
+    return resp
+
+@rastreado("oportunidade.criar")
+def create_opportunity(location_id: str, contact_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cria uma oportunidade para um contato. Se o GHL rejeitar a pipeline/stage
+    (ex.: removidos ou recriados), atualiza o índice da location e tenta uma vez mais.
+    """
+    payload = build_opportunity_payload(contact_id, data, location_id)
+    try:
+        resp = _post_opportunity(location_id, payload)
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code not in (400, 404, 422):
+            raise
+        logger.warning("GHL rejeitou a oportunidade (%s); atualizando as pipelines da location %s.",
+                       e.response.status_code, location_id)
+        pipeline_resolver.invalidar(location_id)
+        novo_payload = build_opportunity_payload(contact_id, data, location_id)
+        if novo_payload == payload:
+            raise
+        resp = _post_opportunity(location_id, novo_payload)
     
     opportunity_data = resp.json()
-    print(f"<- Oportunidade criada com sucesso! ID: {opportunity_data.get('id')}")
+    logger.info("Oportunidade criada.", extra={"location_id": location_id, "opportunity_id": opportunity_data.get("id")})
     return opportunity_data
 
+@rastreado("webhook.processar")
 def process_proposal_webhook(location_id: str, data: Dict[str, Any]):
     """
     Orquestra o processo completo: upsert do contato e criação da oportunidade.
     """
     try:
         # Passo 1: Construir o payload e fazer o upsert do contato
-        contact_payload = build_contact_payload(data, location_id)
-        contact = upsert_contact(location_id, contact_payload)
+        contact = upsert_contact_from_data(location_id, data)
         
         contact_id = contact.get("id")
         if not contact_id:
@@ -145,9 +155,115 @@ def process_proposal_webhook(location_id: str, data: Dict[str, Any]):
         # Passo 2: Criar a oportunidade associada ao contato
         create_opportunity(location_id, contact_id, data)
         
-        print("\n✅ Processo de Webhook concluído com sucesso!")
+        logger.info("Processo de webhook concluído.", extra={"location_id": location_id})
         
     except requests.exceptions.HTTPError as e:
-        print(f"\n❌ ERRO HTTP: {e.response.status_code} - {e.response.text}")
-    except Exception as e:
-        print(f"\n❌ ERRO Inesperado: {e}")
\ No newline at end of file
+        logger.error("Erro HTTP do GHL no webhook: %s", resumo_erro_ghl(e.response),
+                     extra={"location_id": location_id})
+    except Exception:
+        logger.exception("Erro inesperado no webhook.", extra={"location_id": location_id})
+
+# ------------------------------------------------------------
+#  Versões assíncronas (usadas pela API, sem ocupar threads)
+# ------------------------------------------------------------
+
+async def _montar_sem_bloquear(em_cache: bool, funcao, *args):
+    """
+    Chama `funcao` direto no event loop quando o cache em memória já tem o que
+    ela precisa; só numa falta (busca síncrona no GHL/disco) vai para uma thread.
+    """
+    if em_cache:
+        return funcao(*args)
+    return await asyncio.to_thread(funcao, *args)
+
+@rastreado("contato.enviar")
+async def upsert_contact_async(location_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Versão assíncrona de upsert_contact."""
+    # Token vem do índice em memória (o SQLite só é lido quando o banco mudou)
+    access_token = get_location_token(location_id)
+    logger.debug("Enviando contato ao GHL.", extra={"location_id": location_id, "payload": payload})
+    resp = await ghl_http_async.post("/contacts/upsert", access_token, json=payload, limite=location_id)
+    resp.raise_for_status()
+
+    contact_data = resp.json().get("contact", {})
+    logger.info("Contato processado.", extra={"location_id": location_id, "contact_id": contact_data.get("id")})
+    return contact_data
+
+@rastreado("contato.upsert")
+async def upsert_contact_from_data_async(location_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Versão assíncrona de upsert_contact_from_data."""
+    # A busca dos custom fields (quando o cache não tem a location) é síncrona: só ela vai para uma thread
+    payload = await _montar_sem_bloquear(custom_field_cache.em_memoria(location_id),
+                                         build_contact_payload, data, location_id)
+    try:
+        return await upsert_contact_async(location_id, payload)
+    except httpx.HTTPStatusError as e:
+        if not _rejeitou_custom_fields(e, payload):
+            raise
+        logger.warning("GHL rejeitou o contato (%s); atualizando os custom fields da location %s.",
+                       e.response.status_code, location_id)
+        custom_field_cache.invalidar(location_id)
+        novo_payload = await _montar_sem_bloquear(custom_field_cache.em_memoria(location_id),
+                                                  build_contact_payload, data, location_id)
+        if novo_payload == payload:
+            raise
+        return await upsert_contact_async(location_id, novo_payload)
+
+@rastreado("oportunidade.enviar")
+async def _post_opportunity_async(location_id: str, payload: Dict[str, Any]) -> httpx.Response:
+    access_token = get_location_token(location_id)
+    logger.debug("Criando oportunidade.", extra={"location_id": location_id, "payload": payload})
+    resp = await ghl_http_async.post("/opportunities/", access_token, json=payload, limite=location_id)
+    resp.raise_for_status()
+    return resp
+
+@rastreado("oportunidade.criar")
+async def create_opportunity_async(location_id: str, contact_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Versão assíncrona de create_opportunity."""
+    # O índice de pipelines pode precisar de uma busca síncrona no GHL: só ela vai para uma thread
+    payload = await _montar_sem_bloquear(pipeline_resolver.em_memoria(location_id),
+                                         build_opportunity_payload, contact_id, data, location_id)
+    try:
+        resp = await _post_opportunity_async(location_id, payload)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code not in (400, 404, 422):
+            raise
+        logger.warning("GHL rejeitou a oportunidade (%s); atualizando as pipelines da location %s.",
+                       e.response.status_code, location_id)
+        pipeline_resolver.invalidar(location_id)
+        novo_payload = await _montar_sem_bloquear(pipeline_resolver.em_memoria(location_id),
+                                                  build_opportunity_payload, contact_id, data, location_id)
+        if novo_payload == payload:
+            raise
+        resp = await _post_opportunity_async(location_id, novo_payload)
+
+    opportunity_data = resp.json()
+    logger.info("Oportunidade criada.", extra={"location_id": location_id, "opportunity_id": opportunity_data.get("id")})
+    return opportunity_data
+
+@rastreado("webhook.processar")
+async def execute_proposal_webhook_async(location_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Upsert do contato + criação da oportunidade, propagando qualquer erro
+    (usado pela fila de webhooks, que decide se a tentativa será repetida).
+    """
+    contact = await upsert_contact_from_data_async(location_id, data)
+
+    contact_id = contact.get("id")
+    if not contact_id:
+        raise ValueError("Não foi possível obter o ID do contato após o upsert.")
+
+    opportunity = await create_opportunity_async(location_id, contact_id, data)
+    return {"contact_id": contact_id, "opportunity_id": opportunity.get("id")}
+
+async def process_proposal_webhook_async(location_id: str, data: Dict[str, Any]):
+    """Versão assíncrona de process_proposal_webhook."""
+    try:
+        await execute_proposal_webhook_async(location_id, data)
+        logger.info("Processo de webhook concluído.", extra={"location_id": location_id})
+
+    except httpx.HTTPStatusError as e:
+        logger.error("Erro HTTP do GHL no webhook: %s", resumo_erro_ghl(e.response),
+                     extra={"location_id": location_id})
+    except Exception:
+        logger.exception("Erro inesperado no webhook.", extra={"location_id": location_id})
@@ -0,0 +1,134 @@
+# backend/services/custom_fields.py
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from services.get_custom_fields_ids import fetch_all_custom_fields
+from services.location_tokens import get_location_token
+from services.tracing import rastreado
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Cache do mapa fieldKey -> ID dos custom fields, por location.
+# Substitui o custom_fields_ids.json gerado à mão para uma única location.
+# ------------------------------------------------------------
+CUSTOM_FIELDS_TTL       = float(os.getenv("CUSTOM_FIELDS_TTL", "21600"))   # segundos (6h)
+CUSTOM_FIELDS_CACHE_DIR = os.getenv(
+    "CUSTOM_FIELDS_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "cache_custom_fields")
+)
+
+
+class CustomFieldCache:
+    """
+    Mapa fieldKey -> ID de cada location, buscado sob demanda em
+    /locations/{id}/customFields e guardado em memória e em disco (um JSON por
+    location) por `ttl_segundos`. Se a busca falhar, usa o mapa vencido, se houver.
+    """
+
+    def __init__(self, diretorio: str = CUSTOM_FIELDS_CACHE_DIR, ttl_segundos: float = CUSTOM_FIELDS_TTL):
+        self.diretorio = diretorio
+        self.ttl_segundos = ttl_segundos
+        self._memoria: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+        # Um lock por location: requisições simultâneas fazem uma única busca no GHL
+        self._locks_busca: Dict[str, threading.Lock] = {}
+
+    def _arquivo(self, location_id: str) -> str:
+        return os.path.join(self.diretorio, f"{location_id}.json")
+
+    def _valido(self, obtido_em: float) -> bool:
+        return time.time() - obtido_em < self.ttl_segundos
+
+    def _ler_disco(self, location_id: str) -> Optional[Tuple[float, Dict[str, str]]]:
+        try:
+            with open(self._arquivo(location_id), "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            return float(dados["obtido_em"]), dict(dados["campos"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Cache em disco inválido para a location %s; será refeito.", location_id)
+            return None
+
+    def _gravar_disco(self, location_id: str, obtido_em: float, campos: Dict[str, str]) -> None:
+        # Grava num arquivo temporário e renomeia: leitores nunca veem um JSON pela metade
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._arquivo(location_id)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"obtido_em": obtido_em, "campos": campos}, f, indent=4, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    def _buscar(self, location_id: str) -> Dict[str, str]:
+        logger.info("Buscando custom fields da location %s no GHL...", location_id)
+        campos = fetch_all_custom_fields(location_id, get_location_token(location_id))
+        mapa = {c["fieldKey"]: c["id"] for c in campos if c.get("fieldKey") and c.get("id")}
+        obtido_em = time.time()
+        self._memoria[location_id] = (obtido_em, mapa)
+        try:
+            self._gravar_disco(location_id, obtido_em, mapa)
+        except OSError as e:
+            logger.warning("Não foi possível gravar o cache em disco: %s", e)
+        logger.info("%s custom fields mapeados para a location %s.", len(mapa), location_id)
+        return mapa
+
+    def em_memoria(self, location_id: str) -> bool:
+        """True se o mapa da location está em memória e válido (mapa() não fará I/O)."""
+        item = self._memoria.get(location_id)
+        return bool(item and self._valido(item[0]))
+
+    @rastreado("custom_fields.mapa")
+    def mapa(self, location_id: str) -> Dict[str, str]:
+        """Mapa fieldKey -> ID da location (memória, depois disco, depois GHL)."""
+        item = self._memoria.get(location_id)
+        if item and self._valido(item[0]):
+            return item[1]
+
+        with self._lock:
+            lock_busca = self._locks_busca.setdefault(location_id, threading.Lock())
+        with lock_busca:
+            # Outra thread pode ter buscado enquanto esperávamos
+            item = self._memoria.get(location_id)
+            if item and self._valido(item[0]):
+                return item[1]
+            disco = self._ler_disco(location_id)
+            if disco and self._valido(disco[0]):
+                self._memoria[location_id] = disco
+                return disco[1]
+            try:
+                return self._buscar(location_id)
+            except Exception as e:
+                vencido = item or disco
+                if vencido is None:
+                    raise
+                logger.warning("Falha ao atualizar a location %s (%s); usando o mapa anterior.", location_id, e)
+                return vencido[1]
+
+    def atualizar(self, location_id: str) -> Dict[str, str]:
+        """Busca o mapa da location no GHL agora, sem fallback: falhas propagam."""
+        with self._lock:
+            lock_busca = self._locks_busca.setdefault(location_id, threading.Lock())
+        with lock_busca:
+            return self._buscar(location_id)
+
+    def invalidar(self, location_id: str) -> None:
+        """
+        Marca o mapa da location como vencido (memória e disco): a próxima
+        consulta busca no GHL, mas o mapa anterior continua como reserva até
+        uma busca dar certo.
+        """
+        item = self._memoria.get(location_id) or self._ler_disco(location_id)
+        if item is None:
+            return
+        self._memoria[location_id] = (0.0, item[1])
+        try:
+            self._gravar_disco(location_id, 0.0, item[1])
+        except OSError as e:
+            logger.warning("Não foi possível marcar o cache em disco como vencido: %s", e)
+
+custom_field_cache = CustomFieldCache()
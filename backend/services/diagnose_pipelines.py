@@ -1,65 +1,44 @@
 # backend/services/diagnose_pipelines.py (VERSÃO CORRIGIDA)
 
-import json
 import os
+import sys
+import logging
 import requests
 from typing import Dict
 
-# --- CONFIGURAÇÃO ---
-LOCATION_ID = "vH3FikNOO9r4YkbIIiub"
-
-# --- Funções Auxiliares ---
-
-def get_location_token() -> str:
-    """Carrega o token de acesso específico para a location configurada."""
-    locations_file = os.path.join(os.path.dirname(__file__), "..", "installed_locations_data.json")
-    if not os.path.exists(locations_file):
-        raise FileNotFoundError(f"Arquivo de dados não encontrado: {locations_file}. Execute 'update_all_tokens.py' primeiro.")
-
-    with open(locations_file, "r", encoding="utf-8") as f:
-        locations_data = json.load(f)
+# Adiciona o diretório 'backend' ao sys.path para importar o pacote 'services'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    target_location = next((loc for loc in locations_data if loc.get("_id") == LOCATION_ID or loc.get("id") == LOCATION_ID), None)
+from services.ghl_http import ghl_http
+from services.location_tokens import get_location_token
+from services.logging_config import configurar_logging
 
-    if not target_location:
-        raise ValueError(f"Location com ID '{LOCATION_ID}' não encontrada no arquivo de dados.")
+logger = logging.getLogger(__name__)
 
-    token_data = target_location.get("location_specific_token_data", {})
-    access_token = token_data.get("access_token")
-
-    if not access_token:
-        raise RuntimeError(f"Token de acesso não encontrado para a Location {LOCATION_ID}.")
+# --- CONFIGURAÇÃO ---
+LOCATION_ID = "vH3FikNOO9r4YkbIIiub"
 
-    return access_token
+# --- Funções Auxiliares ---
 
 def fetch_pipelines_data(access_token: str, location_id: str) -> list: # <-- ALTERADO: recebe location_id
     """Busca os dados de todas as pipelines e seus stages via API."""
-    base_url = "https://services.leadconnectorhq.com"
-    url = f"{base_url}/opportunities/pipelines"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Version": "2021-07-28",
-        "Accept": "application/json"
-    }
-    
     # Parâmetro de consulta exigido pela API
     params = {
         "locationId": location_id  # <-- ALTERADO: adiciona o parâmetro
     }
     
-    print("Buscando dados das pipelines na API...")
+    logger.info("Buscando dados das pipelines da location %s na API...", location_id)
     try:
         # Adiciona `params=params` à requisição
-        resp = requests.get(url, headers=headers, params=params, timeout=30) # <-- ALTERADO
+        resp = ghl_http.get("/opportunities/pipelines", access_token, params=params, limite=location_id)
         resp.raise_for_status()
         data = resp.json()
         return data.get("pipelines", [])
     except requests.exceptions.RequestException as e:
-        print(f"!!! ERRO ao chamar a API: {e}")
-        # Tenta imprimir mais detalhes do erro, se disponíveis
-        if e.response is not None:
-            print(f"Detalhes: {e.response.text}")
-        return []
+        # Inclui a resposta do GHL no log, se disponível
+        logger.error("Erro ao buscar as pipelines da location %s: %s", location_id, e,
+                     extra={"detalhes": e.response.text if e.response is not None else None})
+        raise
 
 def display_pipelines_info(pipelines: list):
     """Exibe as informações de pipelines e stages de forma organizada."""
@@ -92,12 +71,13 @@ def display_pipelines_info(pipelines: list):
 def main():
     """Função principal para orquestrar a busca e exibição."""
     try:
-        token = get_location_token()
+        token = get_location_token(LOCATION_ID)
         # Passa o LOCATION_ID para a função de fetch
         pipelines = fetch_pipelines_data(token, LOCATION_ID) # <-- ALTERADO
         display_pipelines_info(pipelines)
-    except (FileNotFoundError, ValueError, RuntimeError) as e:
+    except (FileNotFoundError, ValueError, RuntimeError, requests.exceptions.RequestException) as e:
         print(f"ERRO: {e}")
 
 if __name__ == "__main__":
+    configurar_logging(formato="texto")
     main()
\ No newline at end of file
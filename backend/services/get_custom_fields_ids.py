@@ -2,11 +2,20 @@
 
 import json
 import os
+import sys
+import logging
 import requests
 
+# Adiciona o diretório 'backend' ao sys.path para importar o pacote 'services'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ghl_http import ghl_http
+from services.logging_config import configurar_logging
+
+logger = logging.getLogger(__name__)
+
 # --- CONFIGURAÇÃO ---
 LOCATION_ID = "vH3FikNOO9r4YkbIIiub"
-LOCATIONS_DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "installed_locations_data.json")
 
 # ---------------------------------------------------------------------------
 # LISTA DE CHAVES CORRIGIDA com base na saída do script de diagnóstico
@@ -43,40 +52,18 @@ CUSTOM_FIELD_KEYS = [
 ]
 # ---------------------------------------------------------------------------
 
-def load_location_token(file_path: str, location_id: str) -> str:
-    """Carrega o 'access_token' específico para uma location do arquivo JSON."""
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Arquivo de dados de locations não encontrado: {file_path}. Execute o script 'update_all_tokens.py' primeiro.")
-    with open(file_path, "r", encoding="utf-8") as f:
-        locations_data = json.load(f)
-    target_location = next((loc for loc in locations_data if loc.get("_id") == location_id or loc.get("id") == location_id), None)
-    if not target_location:
-        raise ValueError(f"Location com ID '{location_id}' não encontrada em {file_path}.")
-    token_data = target_location.get("location_specific_token_data")
-    if not token_data or "access_token" not in token_data:
-        raise RuntimeError(f"Não foi possível encontrar 'access_token' para a Location {location_id}.")
-    return token_data["access_token"]
-
 def fetch_all_custom_fields(location_id: str, access_token: str) -> list:
     """Chama a API GET para listar todos os Custom Fields da Location."""
-    base_url = "https://services.leadconnectorhq.com"
-    endpoint = f"/locations/{location_id}/customFields"
-    url = base_url + endpoint
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Version": "2021-07-28",
-        "Accept": "application/json"
-    }
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = ghl_http.get(f"/locations/{location_id}/customFields", access_token, limite=location_id)
         resp.raise_for_status()
         data = resp.json()
         return data.get("customFields", [])
     except requests.exceptions.HTTPError as http_err:
-        print(f"!!! [HTTP ERROR] {http_err} -> Status: {resp.status_code}, Resposta: {resp.text}")
+        logger.error("Erro HTTP ao buscar custom fields: %s (status %s, resposta: %s)", http_err, resp.status_code, resp.text)
         raise
     except Exception as e:
-        print(f"!!! Erro inesperado ao buscar custom fields: {e}")
+        logger.error("Erro inesperado ao buscar custom fields: %s", e)
         raise
 
 def map_keys_to_ids(all_fields: list, keys_to_find: list) -> dict:
@@ -91,27 +78,30 @@ def map_keys_to_ids(all_fields: list, keys_to_find: list) -> dict:
     return result_mapping
 
 def main():
-    """Função principal para orquestrar o processo."""
+    """
+    Diagnóstico: atualiza o cache de custom fields da location (o mesmo usado
+    pelos webhooks) e mostra o ID de cada chave de CUSTOM_FIELD_KEYS.
+    Uso: python get_custom_fields_ids.py [LOCATION_ID]
+    """
+    from services.custom_fields import custom_field_cache
+
+    location_id = sys.argv[1] if len(sys.argv) > 1 else LOCATION_ID
     print(">>> Iniciando busca por IDs de Custom Fields (com chaves corrigidas)...")
     try:
-        access_token = load_location_token(LOCATIONS_DATA_FILE, LOCATION_ID)
-        print(f"[INFO] Token de acesso para a Location '{LOCATION_ID}' carregado com sucesso.")
-        print("[INFO] Buscando todos os Custom Fields via API...")
-        all_fields = fetch_all_custom_fields(LOCATION_ID, access_token)
-        print(f"[INFO] {len(all_fields)} campos encontrados no total.")
+        print(f"[INFO] Atualizando o cache de Custom Fields da Location '{location_id}' via API...")
+        id_map = custom_field_cache.atualizar(location_id)
+        print(f"[INFO] {len(id_map)} campos encontrados no total.")
         print("[INFO] Mapeando as keys especificadas para seus IDs...")
+        all_fields = [{"fieldKey": key, "id": field_id} for key, field_id in id_map.items()]
         final_mapping = map_keys_to_ids(all_fields, CUSTOM_FIELD_KEYS)
         print("\n✅ [RESULTADO] Mapeamento de 'key' para 'fieldId':\n")
         print(json.dumps(final_mapping, indent=2, ensure_ascii=False))
-        output_dir = os.path.dirname(__file__)
-        output_file = os.path.join(output_dir, "custom_fields_ids.json")
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(final_mapping, f, indent=4, ensure_ascii=False)
-        print(f"\n✅ Arquivo de mapeamento foi salvo em: {output_file}")
+        print(f"\n✅ Cache salvo em: {custom_field_cache.diretorio}")
     except (FileNotFoundError, ValueError, RuntimeError, requests.exceptions.RequestException) as e:
         print(f"\n❌ ERRO: Ocorreu um problema. {e}")
         print("   Por favor, verifique suas configurações e se o token é válido.")
         exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    configurar_logging(formato="texto")
+    main()
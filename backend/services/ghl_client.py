@@ -1,51 +1,61 @@
 # backend/services/ghl_client.py
 
 import os
-import json
 import time
+import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 from dotenv import load_dotenv
 
+from services.ghl_http import ghl_http, resumo_erro_ghl
+from services.token_db import token_db
+
+logger = logging.getLogger(__name__)
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 1) Carregar o .env para que REFRESH_CLIENT_ID, REFRESH_CLIENT_SECRET, etc.
 #    sejam populadas em os.environ antes de usarmos os.getenv(...) abaixo.
 # ─────────────────────────────────────────────────────────────────────────────
 load_dotenv()   # <<== Carrega automaticamente as variáveis definidas em backend/.env
 
-# ------------------------------------------------------------
-# Carrega as configurações base da API GoHighLevel
-# ------------------------------------------------------------
-API_BASE_URL = "https://services.leadconnectorhq.com"
-API_VERSION = "2021-07-28"  # Versão usada nas chamadas
-
-# Arquivos JSON de tokens e “installed locations”
-AGENCY_TOKEN_FILE    = os.path.join(os.path.dirname(__file__), "..", "gohighlevel_token.json")
-LOCATIONS_DATA_FILE  = os.path.join(os.path.dirname(__file__), "..", "installed_locations_data.json")
-
 # Variáveis obrigatórias vindas do .env (agora já carregado acima)
 AGENCY_COMPANY_ID     = os.getenv("AGENCY_COMPANY_ID", "").strip()
 APP_ID                = os.getenv("APP_ID", "").strip()
 REFRESH_CLIENT_ID     = os.getenv("REFRESH_CLIENT_ID", "").strip()
 REFRESH_CLIENT_SECRET = os.getenv("REFRESH_CLIENT_SECRET", "").strip()
 
+# Máximo de tokens de location solicitados em paralelo (mantenha <= GHL_POOL_SIZE)
+GHL_TOKEN_CONCORRENCIA = int(os.getenv("GHL_TOKEN_CONCORRENCIA", "8"))
 
-def _load_json(path: str) -> Optional[dict]:
-    """Tenta ler um JSON de disco; devolve None se arquivo não existir ou for inválido."""
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return None
-    except json.JSONDecodeError:
-        print(f"!!! [GHL] JSON inválido em: {path}")
-        return None
+# Chave do rate limiter para as chamadas feitas com o token da agência
+LIMITE_AGENCIA = f"agencia:{AGENCY_COMPANY_ID or 'padrao'}"
+
+
+def _marcar_refresh(token_data: dict) -> dict:
+    """Anota no token o momento em que foi obtido (usado para calcular a expiração)."""
+    timestamp = int(time.time())
+    token_data["refreshed_at_unix_timestamp"] = timestamp
+    token_data["refreshed_at_readable"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+    return token_data
+
+
+def load_agency_token() -> Optional[dict]:
+    """Token atual da agência no banco de tokens (ou None)."""
+    return token_db.get_agency_token()
 
 
-def _save_json(path: str, data: dict) -> None:
-    """Salva um dicionário como JSON em disco."""
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+def _agency_access_token() -> Optional[str]:
+    """access_token da agência, ou None (com o erro já registrado no log)."""
+    token_json = load_agency_token()
+    if not token_json:
+        logger.error("Não há token da agência no banco. Rode 'importar_tokens_json.py' ou o fluxo OAuth.")
+        return None
+    access_token = token_json.get("access_token")
+    if not access_token:
+        logger.error("'access_token' não encontrado no token da agência.")
+        return None
+    return access_token
 
 
 # ------------------------------------------------------------
@@ -53,15 +63,15 @@ def _save_json(path: str, data: dict) -> None:
 # ------------------------------------------------------------
 def refresh_agency_token() -> bool:
     """
-    Usa o refresh_token armazenado em gohighlevel_token.json para obter novo access_token.
-    Se bem-sucedido, sobrescreve o arquivo gohighlevel_token.json e retorna True.
+    Usa o refresh_token armazenado no banco de tokens para obter novo access_token.
+    Se bem-sucedido, grava o novo token no banco e retorna True.
     """
-    print(">>> [GHL] Iniciando refresh do token da agência...")
+    logger.info("Iniciando refresh do token da agência...")
 
-    # Carrega o JSON atual (já deve existir com refresh_token válido)
-    token_data = _load_json(AGENCY_TOKEN_FILE)
+    # Token atual (já deve existir com refresh_token válido)
+    token_data = load_agency_token()
     if not token_data:
-        print(f"!!! [GHL] ERRO: Arquivo '{AGENCY_TOKEN_FILE}' não encontrado ou inválido.")
+        logger.error("Não há token da agência no banco de tokens.")
         return False
 
     refresh_token = token_data.get("refresh_token")
@@ -69,10 +79,9 @@ def refresh_agency_token() -> bool:
     company_id    = token_data.get("companyId")     # já deve ser igual a AGENCY_COMPANY_ID
 
     if not refresh_token or not user_type or not company_id:
-        print("!!! [GHL] ERRO: faltando 'refresh_token', 'userType' ou 'companyId' no JSON existente.")
+        logger.error("Faltando 'refresh_token', 'userType' ou 'companyId' no token armazenado.")
         return False
 
-    url = f"{API_BASE_URL}/oauth/token"
     payload = {
         "grant_type": "refresh_token",
         "client_id": REFRESH_CLIENT_ID,
@@ -80,32 +89,26 @@ def refresh_agency_token() -> bool:
         "refresh_token": refresh_token,
         "user_type": user_type
     }
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Accept": "application/json"
-    }
 
     try:
-        resp = requests.post(url, data=payload, headers=headers, timeout=30)
+        resp = ghl_http.post("/oauth/token", data=payload, versao=False, limite=LIMITE_AGENCIA)
         resp.raise_for_status()
         novo = resp.json()
 
         # Garante que companyId e userType não sejam removidos
         novo["companyId"] = novo.get("companyId", company_id)
         novo["userType"]  = novo.get("userType", user_type)
-        timestamp = int(time.time())
-        novo["refreshed_at_unix_timestamp"] = timestamp
-        novo["refreshed_at_readable"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+        _marcar_refresh(novo)
 
-        _save_json(AGENCY_TOKEN_FILE, novo)
-        print(">>> [GHL] Novo token da agência recebido com sucesso.")
+        token_db.salvar_agency_token(novo)
+        logger.info("Novo token da agência recebido com sucesso.")
         return True
 
     except requests.exceptions.HTTPError as http_err:
-        print(f"!!! [GHL][HTTP ERROR] {http_err} → Status: {resp.status_code}, Resposta: {resp.text}")
+        logger.error("Erro HTTP do GHL: %s (%s)", http_err, resumo_erro_ghl(resp))
         return False
     except Exception as e:
-        print(f"!!! [GHL] Erro inesperado no refresh_agency_token: {e}")
+        logger.exception("Erro inesperado no refresh_agency_token: %s", e)
         return False
 
 
@@ -115,30 +118,18 @@ def refresh_agency_token() -> bool:
 def get_installed_locations() -> bool:
     """
     Faz GET em /oauth/installedLocations?isInstalled=true&companyId=...&appId=...
-    e salva a lista de locations em installed_locations_data.json.
+    e sincroniza a lista de locations no banco de tokens (tokens já obtidos são preservados).
     """
-    print("\n>>> [GHL] Buscando installed locations...")
+    logger.info("Buscando installed locations...")
 
-    token_json = _load_json(AGENCY_TOKEN_FILE)
-    if not token_json:
-        print(f"!!! [GHL] ERRO: Não há gohighlevel_token.json válido em: {AGENCY_TOKEN_FILE}")
-        return False
-
-    access_token = token_json.get("access_token")
+    access_token = _agency_access_token()
     if not access_token:
-        print("!!! [GHL] ERRO: 'access_token' não encontrado no gohighlevel_token.json.")
         return False
 
     if not AGENCY_COMPANY_ID or not APP_ID:
-        print("!!! [GHL] ERRO: variáveis AGENCY_COMPANY_ID ou APP_ID não definidas no .env.")
+        logger.error("Variáveis AGENCY_COMPANY_ID ou APP_ID não definidas no .env.")
         return False
 
-    url = f"{API_BASE_URL}/oauth/installedLocations"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Version": API_VERSION,
-        "Accept": "application/json"
-    }
     params = {
         "isInstalled": "true",
         "companyId": AGENCY_COMPANY_ID,
@@ -146,7 +137,7 @@ def get_installed_locations() -> bool:
     }
 
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
+        resp = ghl_http.get("/oauth/installedLocations", access_token, params=params, limite=LIMITE_AGENCIA)
         resp.raise_for_status()
         data = resp.json()
 
@@ -156,99 +147,114 @@ def get_installed_locations() -> bool:
         elif isinstance(data, list):
             lista = data
         else:
-            print("!!! [GHL] AVISO: Resposta inesperada de installedLocations; salvando raw.")
-            lista = data
+            logger.error("Resposta inesperada de installedLocations: %s", data)
+            return False
 
-        # Salva no disco
-        to_save = {"locations": lista} if isinstance(data, dict) else lista
-        _save_json(LOCATIONS_DATA_FILE, to_save)
-        print(f">>> [GHL] Encontradas {len(lista)} installedLocations e salvas em '{LOCATIONS_DATA_FILE}'.")
+        total = token_db.sincronizar_locations(lista)
+        logger.info("Encontradas %s installedLocations; %s salvas no banco de tokens.", len(lista), total)
         return True
 
     except requests.exceptions.HTTPError as http_err:
-        print(f"!!! [GHL][HTTP ERROR] {http_err} → Status: {resp.status_code}, Resposta: {resp.text}")
+        logger.error("Erro HTTP do GHL: %s (%s)", http_err, resumo_erro_ghl(resp))
         return False
     except Exception as e:
-        print(f"!!! [GHL] Erro inesperado em get_installed_locations: {e}")
+        logger.exception("Erro inesperado em get_installed_locations: %s", e)
         return False
 
 
 # ------------------------------------------------------------
 # 3) GET LOCATION TOKEN PARA CADA LOCATION
 # ------------------------------------------------------------
-def manage_location_tokens() -> bool:
+def _solicitar_token_location(location_id: str, access_token: str) -> dict:
     """
-    Para cada entry em installed_locations_data.json (lista ou dicionário),
-    faz POST em /oauth/locationToken e anexa em cada objeto JSON o
-    campo "location_specific_token_data", depois salva de volta no mesmo arquivo.
+    Faz POST em /oauth/locationToken para uma location e devolve o resultado:
+    o token (com a marca de refresh) ou um registro de erro.
     """
-    print("\n>>> [GHL] Iniciando gerenciamento de tokens de LOCATION...")
 
-    token_json = _load_json(AGENCY_TOKEN_FILE)
-    if not token_json:
-        print(f"!!! [GHL] ERRO: Não há gohighlevel_token.json válido em: {AGENCY_TOKEN_FILE}")
-        return False
+    logger.info("Solicitando token para a location %s.", location_id)
+    payload = {
+        "companyId": AGENCY_COMPANY_ID,
+        "locationId": location_id
+    }
 
-    access_token = token_json.get("access_token")
+    try:
+        resp = ghl_http.post("/oauth/locationToken", access_token, data=payload, timeout=20, limite=LIMITE_AGENCIA)
+        resp.raise_for_status()
+        logger.info("Token da location %s obtido com sucesso.", location_id)
+        return _marcar_refresh(resp.json())
+    except requests.exceptions.HTTPError as http_err:
+        # Só status e 'message': o corpo inteiro não vai para o log nem para o banco de tokens
+        detalhe = resumo_erro_ghl(resp)
+        logger.error("Erro HTTP ao obter o token da location %s: %s (%s)", location_id, http_err, detalhe)
+        return {
+            "error": str(http_err),
+            "status_code": resp.status_code,
+            "details": detalhe
+        }
+    except Exception as e:
+        logger.exception("Erro inesperado para a location %s: %s", location_id, e)
+        return {"error": str(e)}
+
+
+def manage_location_tokens(max_concorrencia: int = GHL_TOKEN_CONCORRENCIA) -> bool:
+    """
+    Para cada location do banco de tokens, faz POST em /oauth/locationToken
+    e grava o novo token na linha da location assim que a resposta chega: uma
+    transação pequena por location, sem reescrever as demais. Se a requisição
+    de uma location falhar, o token anterior (ainda pode ser válido) é mantido.
+    As requisições rodam em paralelo, com no máximo `max_concorrencia` simultâneas.
+    Retorna False se alguma location ficou sem token novo.
+    """
+    logger.info("Iniciando gerenciamento de tokens de LOCATION...")
+
+    access_token = _agency_access_token()
     if not access_token:
-        print("!!! [GHL] ERRO: 'access_token' não encontrado no gohighlevel_token.json.")
         return False
 
-    raw = _load_json(LOCATIONS_DATA_FILE)
-    if raw is None:
-        print(f"!!! [GHL] ERRO: '{LOCATIONS_DATA_FILE}' inexistente ou inválido.")
+    location_ids = [loc.get("_id") or loc.get("id") for loc in token_db.listar_locations()]
+    location_ids = [location_id for location_id in location_ids if location_id]
+    if not location_ids:
+        logger.error("Nenhuma location no banco de tokens. Rode get_installed_locations() antes.")
         return False
 
-    if isinstance(raw, dict) and "locations" in raw:
-        lista = raw["locations"]
-    elif isinstance(raw, list):
-        lista = raw
-    else:
-        print(f"!!! [GHL] ERRO: Conteúdo inesperado em '{LOCATIONS_DATA_FILE}'.")
+    # Cada location é independente: solicita os tokens em paralelo, com limite
+    with ThreadPoolExecutor(max_workers=max(1, max_concorrencia)) as executor:
+        futuros = {
+            executor.submit(_solicitar_token_location, location_id, access_token): location_id
+            for location_id in location_ids
+        }
+        falhas = []
+        for futuro in as_completed(futuros):
+            token_data = futuro.result()
+            if "access_token" not in token_data:
+                falhas.append(futuros[futuro])
+                continue
+            token_db.salvar_token_location(futuros[futuro], token_data)
+
+    if falhas:
+        logger.error("%s de %s location(s) sem token novo (tokens anteriores mantidos): %s",
+                     len(falhas), len(location_ids), ", ".join(sorted(falhas)))
         return False
+    logger.info("%s tokens de location processados e salvos no banco de tokens.", len(location_ids))
+    return True
 
-    url = f"{API_BASE_URL}/oauth/locationToken"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Version": API_VERSION,
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Accept": "application/json"
-    }
 
-    for loc in lista:
-        location_id = loc.get("_id") or loc.get("id")
-        if not location_id:
-            loc["location_specific_token_data"] = {"error": "Missing location ID"}
-            continue
+def refresh_location_token(location_id: str) -> bool:
+    """
+    Renova o token de uma única location e grava só a linha dela no banco.
+    Retorna True se o novo token foi obtido.
+    """
+    access_token = (load_agency_token() or {}).get("access_token")
+    if not access_token:
+        logger.error("'access_token' da agência não encontrado; não é possível renovar a location.")
+        return False
 
-        print(f"\n--- [GHL] Solicitando token para Location ID: {location_id} ---")
-        payload = {
-            "companyId": AGENCY_COMPANY_ID,
-            "locationId": location_id
-        }
+    if token_db.get_location(location_id) is None:
+        logger.error("Location %s não encontrada no banco de tokens.", location_id)
+        return False
 
-        try:
-            resp = requests.post(url, data=payload, headers=headers, timeout=20)
-            resp.raise_for_status()
-            loc["location_specific_token_data"] = resp.json()
-            print(f"    <- [GHL] Token para Location {location_id} obtido com sucesso.")
-        except requests.exceptions.HTTPError as http_err:
-            detalhe = None
-            try:
-                detalhe = resp.json()
-            except:
-                detalhe = resp.text
-            loc["location_specific_token_data"] = {
-                "error": str(http_err),
-                "status_code": resp.status_code,
-                "details": detalhe
-            }
-            print(f"    !!! [GHL][HTTP ERROR] {http_err} → Status: {resp.status_code}, Resposta: {detalhe}")
-        except Exception as e:
-            loc["location_specific_token_data"] = {"error": str(e)}
-            print(f"    !!! [GHL] Erro inesperado para Location {location_id}: {e}")
-
-    # Salva tudo de volta
-    _save_json(LOCATIONS_DATA_FILE, lista)
-    print(f"\n>>> [GHL] Todos os tokens de location foram processados e salvos em '{LOCATIONS_DATA_FILE}'.")
-    return True
+    token_data = _solicitar_token_location(location_id, access_token)
+    if "access_token" not in token_data:
+        # Mantém o token anterior (ainda pode ser válido) em vez de sobrescrevê-lo com o erro
+        return False
+    return token_db.salvar_token_location(location_id, token_data)
@@ -0,0 +1,222 @@
+# backend/services/ghl_http.py
+
+import os
+import time
+import httpx
+import requests
+from typing import Any, Dict, Optional, Tuple, Union
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from services.metrics import endpoint_ghl, observar_ghl
+from services.rate_limiter import rate_limiter
+from services.tracing import rastrear
+
+# Garante que as variáveis GHL_* do backend/.env estejam disponíveis mesmo
+# quando este módulo é importado antes de quem normalmente carrega o .env
+load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
+
+# ------------------------------------------------------------
+# Configuração do cliente HTTP compartilhado da API GoHighLevel
+# ------------------------------------------------------------
+API_BASE_URL = os.getenv("GHL_API_BASE_URL", "https://services.leadconnectorhq.com").rstrip("/")
+API_VERSION = "2021-07-28"  # Versão usada nas chamadas
+
+# Conexões mantidas abertas (keep-alive) por host e timeouts padrão (segundos)
+GHL_POOL_SIZE       = int(os.getenv("GHL_POOL_SIZE", "10"))
+GHL_CONNECT_TIMEOUT = float(os.getenv("GHL_CONNECT_TIMEOUT", "5"))
+GHL_READ_TIMEOUT    = float(os.getenv("GHL_READ_TIMEOUT", "30"))
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def montar_headers(access_token: Optional[str] = None, versao: Optional[str] = API_VERSION) -> Dict[str, str]:
+    """Cabeçalhos padrão de uma chamada (token e versão são opcionais)."""
+    headers: Dict[str, str] = {"Accept": "application/json"}
+    if versao:
+        headers["Version"] = versao
+    if access_token:
+        headers["Authorization"] = f"Bearer {access_token}"
+    return headers
+
+
+def resumo_erro_ghl(resp: Union[requests.Response, httpx.Response]) -> str:
+    """
+    Status e campo 'message' de uma resposta de erro do GHL, para logs e para a
+    fila. O corpo inteiro não é usado: ele ecoa os dados do contato enviado.
+    """
+    try:
+        mensagem = resp.json().get("message")
+    except (ValueError, AttributeError):
+        mensagem = None
+    if isinstance(mensagem, list):
+        mensagem = "; ".join(str(m) for m in mensagem)
+    return f"HTTP {resp.status_code}: {str(mensagem)[:300]}" if mensagem else f"HTTP {resp.status_code}"
+
+
+class GHLHttpClient:
+    """
+    Cliente único para a API GoHighLevel: uma requests.Session com pool de
+    conexões keep-alive, timeouts padrão e os cabeçalhos 'Version' e
+    'Authorization' montados em um só lugar.
+    """
+
+    def __init__(self,
+                 base_url: str = API_BASE_URL,
+                 versao: str = API_VERSION,
+                 pool_size: int = GHL_POOL_SIZE,
+                 timeout: Timeout = (GHL_CONNECT_TIMEOUT, GHL_READ_TIMEOUT)):
+        self.base_url = base_url
+        self.versao = versao
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def headers(self, access_token: Optional[str] = None, versao: bool = True) -> Dict[str, str]:
+        return montar_headers(access_token, self.versao if versao else None)
+
+    def request(self,
+                method: str,
+                path: str,
+                access_token: Optional[str] = None,
+                *,
+                versao: bool = True,
+                timeout: Optional[Timeout] = None,
+                headers: Optional[Dict[str, str]] = None,
+                limite: Optional[str] = None,
+                **kwargs: Any) -> requests.Response:
+        """
+        Executa a chamada em `base_url + path` reaproveitando uma conexão do pool.
+        Com `limite` (normalmente o location ID), a chamada passa pelo rate limiter
+        dessa chave e um 429 é repetido após o Retry-After, em vez de falhar.
+        Não chama raise_for_status(): cada chamador trata o status como preferir.
+        """
+        todos_headers = self.headers(access_token, versao)
+        if headers:
+            todos_headers.update(headers)
+        tentativa = 0
+        while True:
+            if limite:
+                rate_limiter.aguardar(limite)
+            with rastrear("ghl.http", metodo=method, endpoint=endpoint_ghl(path), tentativa=tentativa) as span:
+                inicio = time.perf_counter()
+                try:
+                    resp = self.session.request(
+                        method,
+                        f"{self.base_url}{path}",
+                        headers=todos_headers,
+                        timeout=timeout if timeout is not None else self.timeout,
+                        **kwargs,
+                    )
+                except requests.exceptions.RequestException:
+                    observar_ghl(method, path, None, time.perf_counter() - inicio)
+                    raise
+                observar_ghl(method, path, resp.status_code, time.perf_counter() - inicio)
+                span.definir(status=resp.status_code)
+            if not limite:
+                return resp
+            espera = rate_limiter.registrar_resposta(limite, resp.status_code, resp.headers, tentativa)
+            if espera is None or tentativa >= rate_limiter.max_retries_429:
+                return resp
+            tentativa += 1
+
+    def get(self, path: str, access_token: Optional[str] = None, **kwargs: Any) -> requests.Response:
+        return self.request("GET", path, access_token, **kwargs)
+
+    def post(self, path: str, access_token: Optional[str] = None, **kwargs: Any) -> requests.Response:
+        return self.request("POST", path, access_token, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class GHLAsyncHttpClient:
+    """
+    Equivalente assíncrono do GHLHttpClient, sobre httpx.AsyncClient.
+    O cliente é criado na primeira chamada (já dentro do event loop) e deve ser
+    fechado com aclose() no shutdown da aplicação.
+    """
+
+    def __init__(self,
+                 base_url: str = API_BASE_URL,
+                 versao: str = API_VERSION,
+                 pool_size: int = GHL_POOL_SIZE,
+                 timeout: Timeout = (GHL_CONNECT_TIMEOUT, GHL_READ_TIMEOUT)):
+        self.base_url = base_url
+        self.versao = versao
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def _para_httpx_timeout(timeout: Timeout) -> httpx.Timeout:
+        if isinstance(timeout, tuple):
+            conexao, leitura = timeout
+            return httpx.Timeout(leitura, connect=conexao)
+        return httpx.Timeout(timeout)
+
+    def _cliente(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self._para_httpx_timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+        return self._client
+
+    async def request(self,
+                      method: str,
+                      path: str,
+                      access_token: Optional[str] = None,
+                      *,
+                      versao: bool = True,
+                      timeout: Optional[Timeout] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      limite: Optional[str] = None,
+                      **kwargs: Any) -> httpx.Response:
+        """Mesmo contrato de GHLHttpClient.request, sem bloquear o event loop."""
+        todos_headers = montar_headers(access_token, self.versao if versao else None)
+        if headers:
+            todos_headers.update(headers)
+        if timeout is not None:
+            kwargs["timeout"] = self._para_httpx_timeout(timeout)
+        tentativa = 0
+        while True:
+            if limite:
+                await rate_limiter.aguardar_async(limite)
+            with rastrear("ghl.http", metodo=method, endpoint=endpoint_ghl(path), tentativa=tentativa) as span:
+                inicio = time.perf_counter()
+                try:
+                    resp = await self._cliente().request(method, path, headers=todos_headers, **kwargs)
+                except httpx.HTTPError:
+                    observar_ghl(method, path, None, time.perf_counter() - inicio)
+                    raise
+                observar_ghl(method, path, resp.status_code, time.perf_counter() - inicio)
+                span.definir(status=resp.status_code)
+            if not limite:
+                return resp
+            espera = rate_limiter.registrar_resposta(limite, resp.status_code, resp.headers, tentativa)
+            if espera is None or tentativa >= rate_limiter.max_retries_429:
+                return resp
+            tentativa += 1
+
+    async def get(self, path: str, access_token: Optional[str] = None, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", path, access_token, **kwargs)
+
+    async def post(self, path: str, access_token: Optional[str] = None, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", path, access_token, **kwargs)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Instâncias compartilhadas por todos os módulos
+ghl_http = GHLHttpClient()
+ghl_http_async = GHLAsyncHttpClient()
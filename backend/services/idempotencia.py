@@ -0,0 +1,67 @@
+# backend/services/idempotencia.py
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from services.webhook_queue import WebhookQueue
+
+# Por quanto tempo lembrar cada chave (o GHL e o formulário repetem em minutos)
+IDEMPOTENCIA_TTL     = float(os.getenv("IDEMPOTENCIA_TTL", "86400"))   # segundos
+# Máximo de chaves guardadas; as mais antigas saem primeiro (0 = sem limite)
+IDEMPOTENCIA_MAX     = int(os.getenv("IDEMPOTENCIA_MAX", "100000"))
+
+# Campos do payload que identificam uma proposta
+CAMPOS_CHAVE = ("cliente", "negocio", "valor_proposta")
+
+
+def chave_idempotencia(location_id: str, payload: Dict[str, Any], cabecalho: Optional[str] = None) -> str:
+    """
+    Chave do webhook: o cabeçalho Idempotency-Key, se enviado, ou um hash da
+    location com cliente/negocio/valor_proposta em JSON canônico (chaves ordenadas).
+    """
+    if cabecalho and cabecalho.strip():
+        base = f"{location_id}|cabecalho|{cabecalho.strip()}"
+    else:
+        conteudo = {campo: payload.get(campo) for campo in CAMPOS_CHAVE}
+        base = f"{location_id}|conteudo|{json.dumps(conteudo, sort_keys=True, ensure_ascii=False, separators=(',', ':'))}"
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+class RegistroIdempotencia:
+    """
+    Lembra, por até `ttl_segundos` e no máximo `max_chaves` chaves (as mais
+    antigas saem primeiro), qual job da fila atendeu cada chave.
+    Uma repetição devolve o job original em vez de enfileirar outro; jobs que
+    foram para FALHOU (ou já removidos da fila) liberam a chave para nova tentativa.
+    As chaves ficam no mesmo SQLite da fila (tabela webhook_idempotencia), então
+    valem entre reinícios e entre todos os processos da API que usam a fila.
+    """
+
+    def __init__(self, fila: WebhookQueue, ttl_segundos: float = IDEMPOTENCIA_TTL,
+                 max_chaves: int = IDEMPOTENCIA_MAX):
+        self.fila = fila
+        self.ttl_segundos = ttl_segundos
+        self.max_chaves = max_chaves
+        # Contador deste processo (métrica); o registro em si é compartilhado
+        self.duplicados = 0
+
+    def enfileirar_ou_obter(self, chave: str, location_id: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Devolve (job, duplicado). Se a chave já tem um job válido, devolve esse
+        job; senão enfileira o payload e associa o novo job à chave.
+        """
+        job, duplicado = self.fila.enfileirar_com_chave(chave, location_id, payload, self.ttl_segundos,
+                                                        self.max_chaves)
+        if duplicado:
+            self.duplicados += 1
+        return job, duplicado
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "chaves": self.fila.contar_chaves(),
+            "max_chaves": self.max_chaves,
+            "ttl_segundos": self.ttl_segundos,
+            "duplicados_suprimidos": self.duplicados,
+        }
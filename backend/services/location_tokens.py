@@ -0,0 +1,64 @@
+# backend/services/location_tokens.py
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from services.token_db import CAMPO_TOKEN, TokenDB, token_db
+from services.tracing import rastreado
+
+
+class LocationTokenStore:
+    """
+    Índice em memória das locations, por ID, na frente do TokenDB. Cada
+    location é lida do SQLite na primeira consulta e depois respondida da
+    memória. O índice é descartado sempre que TokenDB.versao() muda (qualquer
+    escrita confirmada, por este ou outro processo), então tokens renovados
+    pelo agendador ou por update_all_tokens.py aparecem na consulta seguinte.
+    """
+
+    def __init__(self, db: TokenDB = token_db):
+        self.db = db
+        self._indice: Dict[str, Dict[str, Any]] = {}
+        self._versao: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _indice_atual(self) -> Dict[str, Dict[str, Any]]:
+        versao = self.db.versao()
+        if versao != self._versao:
+            with self._lock:
+                if versao != self._versao:
+                    self._indice = {}
+                    self._versao = versao
+        return self._indice
+
+    def get_location(self, location_id: str) -> Dict[str, Any]:
+        """Devolve o registro completo da location ou lança ValueError se não existir."""
+        indice = self._indice_atual()
+        location = indice.get(location_id)
+        if location is None:
+            location = self.db.get_location(location_id)
+            if not location:
+                raise ValueError(f"Location com ID '{location_id}' não encontrada. Execute 'update_all_tokens.py'.")
+            indice[location_id] = location
+        return location
+
+    @rastreado("token.ler")
+    def get_token(self, location_id: str) -> str:
+        """Devolve o access_token específico da location."""
+        token_data = self.get_location(location_id).get(CAMPO_TOKEN) or {}
+        access_token = token_data.get("access_token")
+        if not access_token:
+            raise RuntimeError(f"Token de acesso não encontrado para a Location {location_id}.")
+        return access_token
+
+    def listar(self) -> List[Dict[str, Any]]:
+        """Lista os registros de todas as locations conhecidas."""
+        return self.db.listar_locations()
+
+
+location_token_store = LocationTokenStore()
+
+
+def get_location_token(location_id: str) -> str:
+    """Atalho para location_token_store.get_token, usado pelos demais módulos."""
+    return location_token_store.get_token(location_id)
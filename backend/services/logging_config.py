@@ -0,0 +1,206 @@
+# backend/services/logging_config.py
+
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+import contextvars
+from typing import Any, Dict, Optional
+
+# ------------------------------------------------------------
+# Configuração de logs (via .env)
+# ------------------------------------------------------------
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+# Níveis por módulo: "services.ghl_http=WARNING,services.contact_manager=DEBUG"
+LOG_NIVEIS = os.getenv("LOG_NIVEIS", "")
+# Fração de registros DEBUG/INFO mantidos por módulo: "services.webhook_queue=0.1"
+LOG_AMOSTRAGEM = os.getenv("LOG_AMOSTRAGEM", "")
+LOG_FORMATO = os.getenv("LOG_FORMATO", "json")           # "json" ou "texto"
+LOG_FILA_TAMANHO = int(os.getenv("LOG_FILA_TAMANHO", "10000"))
+
+# Bibliotecas que registram cada requisição em INFO; LOG_NIVEIS pode sobrescrever
+NIVEIS_PADRAO = {"httpx": "WARNING", "httpcore": "WARNING", "urllib3": "WARNING"}
+
+# Chaves cujo valor nunca vai para o log (comparação sem diferenciar maiúsculas)
+CAMPOS_SENSIVEIS = {
+    "nome", "name", "firstname", "lastname", "telefone", "phone", "email", "cpf", "cpf_ou_cnpj",
+    "address1", "endereco", "field_value", "access_token", "refresh_token", "authorization", "client_secret", "senha", "password",
+}
+REDIGIDO = "***"
+
+# Atributos que todo LogRecord já tem; o resto veio de `extra=` e vai para o JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "id_correlacao"}
+
+# ID da requisição (middleware do main) ou do job (worker da fila) em execução
+id_correlacao: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("id_correlacao", default=None)
+
+
+def redigir(valor: Any) -> Any:
+    """Cópia de `valor` com os campos sensíveis (em qualquer nível de dicts/listas) substituídos."""
+    if isinstance(valor, dict):
+        return {
+            chave: REDIGIDO if str(chave).lower() in CAMPOS_SENSIVEIS else redigir(item)
+            for chave, item in valor.items()
+        }
+    if isinstance(valor, (list, tuple)):
+        return [redigir(item) for item in valor]
+    return valor
+
+
+def _ler_mapa(texto: str) -> Dict[str, str]:
+    mapa = {}
+    for parte in texto.split(","):
+        if "=" in parte:
+            chave, valor = parte.split("=", 1)
+            mapa[chave.strip()] = valor.strip()
+    return mapa
+
+
+class FiltroCorrelacao(logging.Filter):
+    """Anota o ID de correlação no registro, na thread/tarefa que gerou o log."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.id_correlacao = id_correlacao.get()
+        return True
+
+
+class FiltroAmostragem(logging.Filter):
+    """
+    Mantém só uma fração dos registros DEBUG/INFO dos módulos configurados.
+    WARNING ou acima passa sempre.
+    """
+
+    def __init__(self, fracoes: Dict[str, float]):
+        super().__init__()
+        self.fracoes = fracoes
+
+    def _fracao(self, nome: str) -> float:
+        # O prefixo mais específico vence: "services.ghl_http" antes de "services"
+        while nome:
+            if nome in self.fracoes:
+                return self.fracoes[nome]
+            nome = nome.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        fracao = self._fracao(record.name)
+        return fracao >= 1.0 or random.random() < fracao
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, com os campos de `extra=` já redigidos."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "nivel": record.levelname,
+            "modulo": record.name,
+            "mensagem": record.getMessage(),
+        }
+        if getattr(record, "id_correlacao", None):
+            registro["id_correlacao"] = record.id_correlacao
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith("_"):
+                registro[chave] = REDIGIDO if chave.lower() in CAMPOS_SENSIVEIS else redigir(valor)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            registro["excecao"] = record.exc_text
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class FormatadorTexto(logging.Formatter):
+    """Formato legível para os scripts de linha de comando."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S")
+
+
+class HandlerFilaNaoBloqueante(logging.handlers.QueueHandler):
+    """
+    Enfileira o registro sem esperar: com a fila cheia o registro é descartado
+    (e contado) em vez de travar a requisição.
+    """
+
+    def __init__(self, fila: queue.Queue):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve mensagem e traceback aqui (os argumentos podem mudar depois),
+        # mas mantém os campos de `extra=` para o formatador da thread de escrita
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler_fila: Optional[HandlerFilaNaoBloqueante] = None
+
+
+def configurar_logging(formato: Optional[str] = None, nivel: Optional[str] = None) -> None:
+    """
+    Liga o pipeline de logs: os módulos registram num QueueHandler (só um
+    put_nowait no caminho da requisição) e uma thread separada formata e
+    escreve em stdout. Chamadas repetidas são ignoradas.
+    """
+    global _listener, _handler_fila
+    if _listener is not None:
+        return
+
+    formato = (formato or LOG_FORMATO).lower()
+    base = FormatadorJSON() if formato == "json" else FormatadorTexto()
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(base)
+
+    fila: queue.Queue = queue.Queue(maxsize=LOG_FILA_TAMANHO)
+    _handler_fila = HandlerFilaNaoBloqueante(fila)
+    _handler_fila.addFilter(FiltroCorrelacao())
+    fracoes = {modulo: float(fracao) for modulo, fracao in _ler_mapa(LOG_AMOSTRAGEM).items()}
+    if fracoes:
+        _handler_fila.addFilter(FiltroAmostragem(fracoes))
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_handler_fila)
+    raiz.setLevel((nivel or LOG_NIVEL).upper())
+    for modulo, nivel_modulo in {**NIVEIS_PADRAO, **_ler_mapa(LOG_NIVEIS)}.items():
+        logging.getLogger(modulo).setLevel(nivel_modulo.upper())
+
+    _listener = logging.handlers.QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(encerrar_logging)
+
+
+def encerrar_logging() -> None:
+    """Esvazia a fila de logs e para a thread de escrita."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    if _handler_fila is not None and _handler_fila.descartados:
+        sys.stderr.write(f"!!! [LOGS] {_handler_fila.descartados} registro(s) descartado(s) com a fila cheia.\n")
+
+
+def registros_descartados() -> int:
+    return _handler_fila.descartados if _handler_fila is not None else 0
@@ -0,0 +1,213 @@
+# backend/services/lote_stream.py
+
+import os
+import csv
+import io
+import json
+import logging
+import itertools
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from services.calculos_lote import calcular_valor_proposta_lote
+from services.modelos import PropostaInput, formatar_erro_validacao, validar_premissas_linha
+from services.simulacao import CAMPOS_RESUMO, simular_propostas
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Precificação de arquivos grandes (CSV ou NDJSON) linha a linha: as linhas
+# são lidas sob demanda, precificadas em blocos de tamanho fixo pelo motor
+# vetorizado e devolvidas assim que cada bloco termina. A memória usada
+# depende do tamanho do bloco, não do arquivo.
+# ------------------------------------------------------------
+LOTE_STREAM_BLOCO = int(os.getenv("LOTE_STREAM_BLOCO", "1000"))
+
+FORMATOS = ("csv", "ndjson")
+TIPOS_CONTEUDO = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+# Colunas acrescentadas a cada linha da saída
+COLUNAS_RESULTADO = ("linha", "valor_proposta", "quantidade_modulos", "erro")
+# Colunas da simulação de longo prazo, quando pedida
+COLUNAS_SIMULACAO = CAMPOS_RESUMO
+
+# (número da linha no arquivo, campos lidos, erro de leitura)
+Registro = Tuple[int, Dict[str, Any], Optional[str]]
+
+
+def detectar_formato(tipo_conteudo: Optional[str] = None, nome_arquivo: Optional[str] = None) -> Optional[str]:
+    """Formato pelo Content-Type ou pela extensão do arquivo (None se não reconhecido)."""
+    tipo = (tipo_conteudo or "").lower()
+    if "csv" in tipo:
+        return "csv"
+    if "ndjson" in tipo or "jsonl" in tipo or "json-lines" in tipo:
+        return "ndjson"
+    extensao = os.path.splitext(nome_arquivo or "")[1].lower()
+    if extensao == ".csv":
+        return "csv"
+    if extensao in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return None
+
+
+def ler_csv(linhas: Iterable[str]) -> Iterator[Registro]:
+    """
+    Lê um CSV com cabeçalho (separador ',' ou ';', detectado no cabeçalho).
+    Linhas totalmente vazias são ignoradas.
+    """
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    separador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+    leitor = csv.DictReader(itertools.chain([cabecalho], linhas), delimiter=separador)
+    for linha in leitor:
+        # Colunas a mais (sem cabeçalho) ficam na chave None: descartadas
+        campos = {chave.strip(): (valor or "").strip() for chave, valor in linha.items() if chave is not None}
+        if not any(campos.values()):
+            continue
+        yield leitor.line_num, campos, None
+
+
+def ler_ndjson(linhas: Iterable[str]) -> Iterator[Registro]:
+    """Lê um objeto JSON por linha; linhas em branco são ignoradas."""
+    for numero, texto in enumerate(linhas, start=1):
+        texto = texto.strip()
+        if not texto:
+            continue
+        try:
+            campos = json.loads(texto)
+        except json.JSONDecodeError as e:
+            yield numero, {}, f"JSON inválido: {e.msg} (coluna {e.colno})."
+            continue
+        if not isinstance(campos, dict):
+            yield numero, {}, "Cada linha deve ser um objeto JSON."
+            continue
+        yield numero, campos, None
+
+
+def ler_registros(linhas: Iterable[str], formato: str) -> Iterator[Registro]:
+    if formato == "csv":
+        return ler_csv(linhas)
+    if formato == "ndjson":
+        return ler_ndjson(linhas)
+    raise ValueError(f"Formato desconhecido: '{formato}'. Use um de: {', '.join(FORMATOS)}.")
+
+
+def _precificar_bloco(bloco: List[Registro], simulacao: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Valida e precifica um bloco, devolvendo cada linha original com as colunas
+    de resultado. Com `simulacao` (premissas, podendo ser {}), as linhas
+    precificadas ganham também as colunas de COLUNAS_SIMULACAO.
+    """
+    saida: List[Dict[str, Any]] = []
+    validas: List[Dict[str, Any]] = []
+    posicoes: List[int] = []
+    for numero, campos, erro in bloco:
+        linha = {**campos, "linha": numero, "valor_proposta": None, "quantidade_modulos": None, "erro": erro}
+        if simulacao is not None:
+            linha.update(dict.fromkeys(COLUNAS_SIMULACAO))
+        saida.append(linha)
+        if erro is not None:
+            continue
+        # Célula vazia ou null = campo não informado (vale o padrão do PropostaInput)
+        informados = {chave: valor for chave, valor in campos.items() if valor not in ("", None)}
+        try:
+            validas.append(PropostaInput(**informados).dict())
+            posicoes.append(len(saida) - 1)
+        except ValidationError as e:
+            linha["erro"] = formatar_erro_validacao(e)
+
+    simular: List[Dict[str, Any]] = []
+    simuladas: List[Dict[str, Any]] = []
+    for posicao, proposta, resultado in zip(posicoes, validas, calcular_valor_proposta_lote(validas)):
+        linha = saida[posicao]
+        if "erro" in resultado:
+            linha["erro"] = resultado["erro"]
+            continue
+        linha["valor_proposta"] = resultado["valor_proposta"]
+        linha["quantidade_modulos"] = resultado["quantidade_modulos"]
+        if simulacao is not None:
+            try:
+                premissas = validar_premissas_linha(linha)
+            except ValidationError as e:
+                linha.update(valor_proposta=None, quantidade_modulos=None, erro=formatar_erro_validacao(e))
+                continue
+            simular.append({**proposta, **premissas, "valor_proposta": resultado["valor_proposta"]})
+            simuladas.append(linha)
+
+    if simular:
+        for linha, resultado in zip(simuladas, simular_propostas(simular, simulacao)):
+            if "erro" in resultado:
+                # Linha com erro não leva preço: o cliente distingue sucesso só por "erro"
+                linha.update(valor_proposta=None, quantidade_modulos=None, erro=resultado["erro"])
+            else:
+                linha.update({c: resultado[c] for c in COLUNAS_SIMULACAO})
+    return saida
+
+
+def precificar_em_blocos(registros: Iterable[Registro],
+                         tamanho_bloco: int = LOTE_STREAM_BLOCO,
+                         simulacao: Optional[Dict[str, float]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Consome os registros em blocos de `tamanho_bloco` e devolve cada bloco precificado."""
+    registros = iter(registros)
+    while True:
+        bloco = list(itertools.islice(registros, max(1, tamanho_bloco)))
+        if not bloco:
+            return
+        yield _precificar_bloco(bloco, simulacao)
+
+
+def escrever_ndjson(blocos: Iterable[List[Dict[str, Any]]]) -> Iterator[str]:
+    """Um texto por bloco, com uma linha JSON por proposta."""
+    for bloco in blocos:
+        yield "".join(json.dumps(linha, ensure_ascii=False) + "\n" for linha in bloco)
+
+
+def escrever_csv(blocos: Iterable[List[Dict[str, Any]]]) -> Iterator[str]:
+    """
+    Um texto por bloco. O cabeçalho segue as colunas de entrada da primeira
+    linha (a ordem do arquivo), seguidas sempre das colunas de resultado (e das
+    de simulação, se pedida). O cabeçalho não muda no meio do arquivo: colunas
+    que só aparecem em linhas posteriores (comum em NDJSON convertido para CSV)
+    não cabem nele e geram um aviso no log, uma vez por coluna.
+    """
+    colunas: Optional[List[str]] = None
+    avisadas = set()
+    for bloco in blocos:
+        if not bloco:
+            continue
+        buffer = io.StringIO()
+        if colunas is None:
+            resultado = list(COLUNAS_RESULTADO)
+            if any(c in bloco[0] for c in COLUNAS_SIMULACAO):
+                resultado += COLUNAS_SIMULACAO
+            colunas = [c for c in bloco[0] if c not in resultado] + resultado
+            escritor = csv.DictWriter(buffer, fieldnames=colunas, extrasaction="ignore")
+            escritor.writeheader()
+        else:
+            escritor = csv.DictWriter(buffer, fieldnames=colunas, extrasaction="ignore")
+        conhecidas = set(colunas)
+        for linha in bloco:
+            for coluna in linha.keys() - conhecidas - avisadas:
+                avisadas.add(coluna)
+                logger.warning("Coluna '%s' (linha %s) não está no cabeçalho do CSV de saída; valores omitidos. "
+                               "Use saída NDJSON para mantê-la.", coluna, linha.get("linha"))
+        escritor.writerows(bloco)
+        yield buffer.getvalue()
+
+
+def precificar_stream(linhas: Iterable[str],
+                      formato: str,
+                      formato_saida: Optional[str] = None,
+                      tamanho_bloco: int = LOTE_STREAM_BLOCO,
+                      simulacao: Optional[Dict[str, float]] = None) -> Iterator[str]:
+    """Pipeline completo: texto de entrada -> blocos precificados -> texto de saída (mesmo formato por padrão)."""
+    blocos = precificar_em_blocos(ler_registros(linhas, formato), tamanho_bloco, simulacao)
+    formato_saida = formato_saida or formato
+    if formato_saida == "csv":
+        return escrever_csv(blocos)
+    if formato_saida == "ndjson":
+        return escrever_ndjson(blocos)
+    raise ValueError(f"Formato de saída desconhecido: '{formato_saida}'. Use um de: {', '.join(FORMATOS)}.")
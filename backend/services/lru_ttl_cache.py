@@ -0,0 +1,90 @@
+# backend/services/lru_ttl_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Sentinela para diferenciar "chave ausente" de um valor None armazenado
+AUSENTE = object()
+
+
+class LRUTTLCache:
+    """
+    Cache em memória com limite de tamanho (LRU) e expiração opcional por tempo (TTL).
+    Seguro para uso entre threads e com contadores de acertos, falhas e remoções.
+    """
+
+    def __init__(self,
+                 tamanho_maximo: int = 1024,
+                 ttl_segundos: Optional[float] = None,
+                 relogio: Callable[[], float] = time.monotonic):
+        if tamanho_maximo < 1:
+            raise ValueError("tamanho_maximo deve ser pelo menos 1.")
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos if ttl_segundos and ttl_segundos > 0 else None
+        self._relogio = relogio
+        self._itens: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._despejos = 0
+        self._expiracoes = 0
+        self._invalidacoes = 0
+
+    def get(self, chave: Hashable, padrao: Any = AUSENTE) -> Any:
+        """Devolve o valor da chave (marcando-a como usada) ou `padrao`."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self._falhas += 1
+                return padrao
+            expira_em, valor = item
+            if expira_em and expira_em <= self._relogio():
+                del self._itens[chave]
+                self._expiracoes += 1
+                self._falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self._acertos += 1
+            return valor
+
+    def set(self, chave: Hashable, valor: Any) -> None:
+        """Armazena o valor, removendo o item menos usado se o limite for atingido."""
+        expira_em = self._relogio() + self.ttl_segundos if self.ttl_segundos else 0.0
+        with self._lock:
+            self._itens[chave] = (expira_em, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self._despejos += 1
+
+    def invalidar(self, chave: Hashable = AUSENTE) -> int:
+        """Remove uma chave (ou todas, se nenhuma for informada). Retorna quantas saíram."""
+        with self._lock:
+            if chave is AUSENTE:
+                removidos = len(self._itens)
+                self._itens.clear()
+            else:
+                removidos = 1 if self._itens.pop(chave, None) is not None else 0
+            self._invalidacoes += removidos
+            return removidos
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Contadores de uso do cache, prontos para serem expostos pela API."""
+        with self._lock:
+            consultas = self._acertos + self._falhas
+            return {
+                "tamanho": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self._acertos,
+                "falhas": self._falhas,
+                "despejos": self._despejos,
+                "expiracoes": self._expiracoes,
+                "invalidacoes": self._invalidacoes,
+                "taxa_acerto": round(self._acertos / consultas, 4) if consultas else 0.0,
+            }
@@ -0,0 +1,177 @@
+# backend/services/metrics.py
+
+import math
+import logging
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Métricas no formato texto do Prometheus (0.0.4), sem dependências externas.
+# Contadores e histogramas são atualizados no caminho da requisição; valores
+# que já existem em outros módulos (fila, tokens, caches) são lidos por
+# coletores só no momento do scrape.
+# ------------------------------------------------------------
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Rotulos = Tuple[Tuple[str, str], ...]
+# (nome, tipo, ajuda, rótulos, valor) devolvido pelos coletores
+Amostra = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(rotulos: Iterable[Tuple[str, str]]) -> str:
+    partes = [f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos]
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _formatar_valor(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor: float = 1.0, **rotulos: str) -> None:
+        chave = tuple((nome, str(rotulos[nome])) for nome in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for chave, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_formatar_rotulos(chave)} {_formatar_valor(valor)}")
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (), buckets: Sequence[float] = BUCKETS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(sorted(buckets))
+        # rótulos -> [contagem por bucket (não acumulada) + overflow, soma, total]
+        self._series: Dict[Rotulos, List] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos: str) -> None:
+        chave = tuple((nome, str(rotulos[nome])) for nome in self.rotulos)
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            for chave, (contagens, soma, total) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, contagem in zip(self.buckets + (math.inf,), contagens):
+                    acumulado += contagem
+                    rotulos = chave + (("le", _formatar_valor(limite)),)
+                    linhas.append(f"{self.nome}_bucket{_formatar_rotulos(rotulos)} {acumulado}")
+                linhas.append(f"{self.nome}_sum{_formatar_rotulos(chave)} {_formatar_valor(soma)}")
+                linhas.append(f"{self.nome}_count{_formatar_rotulos(chave)} {total}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Guarda as métricas da aplicação e gera o texto servido em /metrics."""
+
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._coletores: List[Callable[[], Iterable[Amostra]]] = []
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            existente = self._metricas.get(metrica.nome)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nome] = metrica
+            return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                   buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, rotulos, buckets))
+
+    def registrar_coletor(self, coletor: Callable[[], Iterable[Amostra]]) -> None:
+        """Função chamada a cada scrape; devolve amostras (nome, tipo, ajuda, rótulos, valor)."""
+        self._coletores.append(coletor)
+
+    def _exportar_coletores(self) -> List[str]:
+        linhas: List[str] = []
+        agrupadas: Dict[str, List[Amostra]] = {}
+        for coletor in self._coletores:
+            try:
+                for amostra in coletor():
+                    agrupadas.setdefault(amostra[0], []).append(amostra)
+            except Exception as e:
+                logger.warning("Coletor %s falhou: %s", getattr(coletor, "__name__", coletor), e)
+        for nome, amostras in agrupadas.items():
+            _, tipo, ajuda, _, _ = amostras[0]
+            linhas.extend([f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"])
+            for _, _, _, rotulos, valor in amostras:
+                linhas.append(f"{nome}{_formatar_rotulos(sorted(rotulos.items()))} {_formatar_valor(valor)}")
+        return linhas
+
+    def exportar(self) -> str:
+        linhas: List[str] = []
+        for metrica in list(self._metricas.values()):
+            linhas.extend(metrica.exportar())
+        linhas.extend(self._exportar_coletores())
+        return "\n".join(linhas) + "\n"
+
+
+metricas = RegistroMetricas()
+
+# --- Métricas compartilhadas ---
+
+http_duracao = metricas.histograma(
+    "precificacao_http_requisicao_duracao_segundos",
+    "Duração das requisições HTTP recebidas pela API, por rota e status.",
+    ("metodo", "rota", "status"),
+)
+
+ghl_duracao = metricas.histograma(
+    "precificacao_ghl_requisicao_duracao_segundos",
+    "Duração de cada chamada à API GoHighLevel (inclui tentativas após 429), por endpoint e status.",
+    ("metodo", "endpoint", "status"),
+)
+
+
+def endpoint_ghl(caminho: str) -> str:
+    """Normaliza o caminho chamado no GHL para um rótulo de baixa cardinalidade."""
+    partes = caminho.split("?", 1)[0].split("/")
+    # /locations/{id}/... é o único caminho usado com ID no meio
+    if len(partes) > 2 and partes[1] == "locations":
+        partes[2] = "{id}"
+    return "/".join(partes)
+
+
+def observar_ghl(metodo: str, caminho: str, status: Optional[int], duracao: float) -> None:
+    ghl_duracao.observar(duracao, metodo=metodo, endpoint=endpoint_ghl(caminho),
+                         status=str(status) if status is not None else "erro_conexao")
@@ -0,0 +1,56 @@
+# backend/services/modelos.py
+
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+# ------------------------------------------------------------
+# Modelos compartilhados entre a API (main.py) e os scripts que
+# validam propostas sem subir o servidor (ex.: precificar_arquivo.py)
+# ------------------------------------------------------------
+
+class PropostaInput(BaseModel):
+    consumo_medio_mensal: float = Field(..., example=400.0)
+    potencia_modulos_w: float = Field(..., example=585.0)
+    potencia_sistema_kw: float = Field(..., example=4.68)
+    custo_unitario_modulo: float = Field(1000.0, example=1200.0)
+    quantidade_inversor: int = Field(1, example=1)
+    custo_unitario_inversor: float = Field(3000.0, example=3500.0)
+    custo_estrutura: float = Field(500.0, example=600.0)
+    custo_cabos: float = Field(200.0, example=250.0)
+    custo_base_por_kw: float = Field(400.0, example=400.0)
+    ajuste_telhas: float = Field(0.0, example=100.0)
+    ajuste_padrao_entrada: float = Field(0.0, example=120.0)
+    percentual_indiretos: float = Field(0.05, example=0.05)
+    percentual_margem: float = Field(0.20, example=0.20)
+    aliquota_impostos: float = Field(0.15, example=0.15)
+    valor_adicional: float = Field(0.0, example=100.0)
+    forma_desconto: str = Field("Sem Desconto", example="Porcentagem")
+    valor_desconto: float = Field(0.0, example=5.0)
+    indice_irrad: float = Field(3.79, example=4.0)
+    taxa_desempenho: float = Field(0.8, example=0.85)
+
+
+class ParametrosSimulacao(BaseModel):
+    # Premissas da simulação de longo prazo; campos ausentes usam PARAMETROS_SIMULACAO
+    tarifa_kwh: Optional[float] = Field(None, ge=0, example=0.95)
+    reajuste_tarifa_anual: Optional[float] = Field(None, gt=-1, example=0.06)
+    degradacao_anual: Optional[float] = Field(None, ge=0, lt=1, example=0.005)
+    taxa_simultaneidade: Optional[float] = Field(None, ge=0, le=1, example=0.30)
+    fator_credito_injetada: Optional[float] = Field(None, ge=0, le=1, example=0.85)
+    taxa_desconto_anual: Optional[float] = Field(None, gt=-1, example=0.10)
+
+
+def validar_premissas_linha(campos: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Premissas de simulação informadas em uma linha de lote (célula vazia ou null
+    = não informada), com os mesmos limites de ParametrosSimulacao. Levanta
+    ValidationError se alguma estiver fora deles.
+    """
+    informadas = {campo: campos[campo] for campo in ParametrosSimulacao.__fields__ if campos.get(campo) not in ("", None)}
+    return ParametrosSimulacao(**informadas).dict(exclude_none=True)
+
+
+def formatar_erro_validacao(e: ValidationError) -> str:
+    """Resume os erros do Pydantic em uma linha: 'campo: mensagem; ...'."""
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
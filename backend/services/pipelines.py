@@ -0,0 +1,166 @@
+# backend/services/pipelines.py
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from services.diagnose_pipelines import fetch_pipelines_data
+from services.location_tokens import get_location_token
+from services.tracing import rastreado
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Pipeline/stage onde as oportunidades são criadas. Com os nomes definidos no
+# .env, os IDs são resolvidos por location; sem eles, valem os IDs abaixo
+# (que só existem na location original).
+# ------------------------------------------------------------
+GHL_PIPELINE_NOME = os.getenv("GHL_PIPELINE_NOME", "").strip()
+GHL_STAGE_NOME    = os.getenv("GHL_STAGE_NOME", "").strip()
+GHL_PIPELINE_ID   = os.getenv("GHL_PIPELINE_ID", "8pMqwP5PVLR5LoM87lx8").strip()
+GHL_STAGE_ID      = os.getenv("GHL_STAGE_ID", "6a4d8f9a-1aff-4bc3-8a3e-76714b7722a7").strip()
+PIPELINES_TTL     = float(os.getenv("PIPELINES_TTL", "3600"))   # segundos
+
+
+class ConfiguracaoPipelineInvalida(ValueError):
+    """Pipeline ou stage configurados não existem na location (só muda ajustando o .env)."""
+
+
+def _normalizar(nome: Optional[str]) -> str:
+    return " ".join((nome or "").split()).casefold()
+
+
+def montar_indice(pipelines: list) -> Dict[str, Any]:
+    """
+    Índice das pipelines de uma location: por nome normalizado (sem
+    diferenciar maiúsculas/espaços) e por ID, cada uma com seus stages.
+    """
+    por_nome: Dict[str, Dict[str, Any]] = {}
+    por_id: Dict[str, Dict[str, Any]] = {}
+    for pipeline in pipelines:
+        if not pipeline.get("id"):
+            continue
+        stages = [s for s in pipeline.get("stages", []) if s.get("id")]
+        item = {
+            "id": pipeline["id"],
+            "nome": pipeline.get("name"),
+            "stages_por_nome": {_normalizar(s.get("name")): s["id"] for s in stages},
+            "stage_ids": [s["id"] for s in stages],
+        }
+        por_nome.setdefault(_normalizar(pipeline.get("name")), item)
+        por_id[pipeline["id"]] = item
+    return {"por_nome": por_nome, "por_id": por_id}
+
+
+class PipelineResolver:
+    """
+    Resolve (pipeline_id, stage_id) de cada location a partir de um índice de
+    /opportunities/pipelines mantido em memória por `ttl_segundos`. Renomear
+    pipeline ou stage no GHL só exige ajustar GHL_PIPELINE_NOME / GHL_STAGE_NOME.
+    """
+
+    def __init__(self,
+                 pipeline_nome: str = GHL_PIPELINE_NOME,
+                 stage_nome: str = GHL_STAGE_NOME,
+                 pipeline_id_padrao: str = GHL_PIPELINE_ID,
+                 stage_id_padrao: str = GHL_STAGE_ID,
+                 ttl_segundos: float = PIPELINES_TTL):
+        self.pipeline_nome = pipeline_nome
+        self.stage_nome = stage_nome
+        self.pipeline_id_padrao = pipeline_id_padrao
+        self.stage_id_padrao = stage_id_padrao
+        self.ttl_segundos = ttl_segundos
+        self._indices: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._locks_busca: Dict[str, threading.Lock] = {}
+
+    def _valido(self, obtido_em: float) -> bool:
+        return time.time() - obtido_em < self.ttl_segundos
+
+    def em_memoria(self, location_id: str) -> bool:
+        """True se o índice da location está em memória e válido (resolver() não fará I/O)."""
+        item = self._indices.get(location_id)
+        return bool(item and self._valido(item[0]))
+
+    def indice(self, location_id: str) -> Dict[str, Any]:
+        """Índice de pipelines da location (memória ou, se vencido, GHL)."""
+        item = self._indices.get(location_id)
+        if item and self._valido(item[0]):
+            return item[1]
+
+        with self._lock:
+            lock_busca = self._locks_busca.setdefault(location_id, threading.Lock())
+        with lock_busca:
+            item = self._indices.get(location_id)
+            if item and self._valido(item[0]):
+                return item[1]
+            try:
+                pipelines = fetch_pipelines_data(get_location_token(location_id), location_id)
+            except Exception as e:
+                if item is None:
+                    raise
+                logger.warning("Falha ao atualizar a location %s (%s); usando o índice anterior.", location_id, e)
+                return item[1]
+            indice = montar_indice(pipelines)
+            self._indices[location_id] = (time.time(), indice)
+            logger.info("%s pipeline(s) indexada(s) para a location %s.", len(indice["por_id"]), location_id)
+            return indice
+
+    @rastreado("pipelines.resolver")
+    def resolver(self, location_id: str) -> Tuple[str, str]:
+        """
+        (pipeline_id, stage_id) da location. Lança ConfiguracaoPipelineInvalida
+        se a pipeline ou o stage configurados não existirem nela. Sem nomes configurados, se as
+        pipelines não puderem ser buscadas (e não houver índice anterior), usa
+        GHL_PIPELINE_ID / GHL_STAGE_ID sem validá-los.
+        """
+        try:
+            indice = self.indice(location_id)
+        except Exception as e:
+            if self.pipeline_nome or self.stage_nome:
+                raise
+            logger.warning("Pipelines da location %s indisponíveis (%s); usando GHL_PIPELINE_ID e GHL_STAGE_ID.",
+                           location_id, e)
+            return self.pipeline_id_padrao, self.stage_id_padrao
+        if self.pipeline_nome:
+            pipeline = indice["por_nome"].get(_normalizar(self.pipeline_nome))
+            if pipeline is None:
+                nomes = ", ".join(p["nome"] or p["id"] for p in indice["por_id"].values()) or "nenhuma"
+                raise ConfiguracaoPipelineInvalida(f"Pipeline '{self.pipeline_nome}' não encontrada na location {location_id} (existentes: {nomes}).")
+        else:
+            pipeline = indice["por_id"].get(self.pipeline_id_padrao)
+            if pipeline is None:
+                raise ConfiguracaoPipelineInvalida(
+                    f"Pipeline {self.pipeline_id_padrao} não existe na location {location_id}; "
+                    "defina GHL_PIPELINE_NOME e GHL_STAGE_NOME no .env."
+                )
+
+        if self.stage_nome:
+            stage_id = pipeline["stages_por_nome"].get(_normalizar(self.stage_nome))
+            if stage_id is None:
+                raise ConfiguracaoPipelineInvalida(f"Stage '{self.stage_nome}' não encontrado na pipeline '{pipeline['nome']}' da location {location_id}.")
+        elif self.stage_id_padrao in pipeline["stage_ids"]:
+            stage_id = self.stage_id_padrao
+        else:
+            raise ConfiguracaoPipelineInvalida(
+                f"Stage {self.stage_id_padrao} não existe na pipeline '{pipeline['nome']}' da location {location_id}; "
+                "defina GHL_STAGE_NOME (ou corrija GHL_STAGE_ID) no .env."
+            )
+        return pipeline["id"], stage_id
+
+    def invalidar(self, location_id: Optional[str] = None) -> None:
+        """
+        Marca o índice de uma location (ou de todas) como vencido: a próxima
+        consulta busca no GHL, mas o índice anterior continua como reserva se a
+        busca falhar.
+        """
+        ids = list(self._indices) if location_id is None else [location_id]
+        for location in ids:
+            item = self._indices.get(location)
+            if item is not None:
+                self._indices[location] = (0.0, item[1])
+
+
+pipeline_resolver = PipelineResolver()
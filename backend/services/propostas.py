@@ -0,0 +1,63 @@
+# backend/services/propostas.py
+
+from typing import Any, Dict
+
+# Campos que o formulário envia em % e o cálculo espera como fração
+CAMPOS_PERCENTUAIS = ("taxa_desempenho", "taxa_simultaneidade", "percentual_indiretos", "percentual_margem",
+                      "aliquota_impostos")
+
+
+def montar_inputs_calculo(formulario: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte o formulário completo (cliente/negocio/consumo/equipamentos/comercial)
+    nos inputs planos de calcular_valor_proposta, com os percentuais em fração.
+    """
+    consumo = formulario["consumo"]
+    equipamentos = formulario["equipamentos"]
+    comercial = formulario["comercial"]
+    inputs = {
+        "consumo_medio_mensal": consumo["consumo_medio_mensal"],
+        "indice_irrad": consumo["indice_irrad"],
+        "taxa_desempenho": consumo["taxa_desempenho"],
+        # Não entra no preço; usada pela simulação de longo prazo (services/simulacao.py)
+        "taxa_simultaneidade": consumo.get("taxa_simultaneidade", 0.0),
+        "potencia_modulos_w": equipamentos["potencia_modulos_w"],
+        "potencia_sistema_kw": equipamentos["potencia_sistema_kw"],
+        "custo_unitario_modulo": equipamentos["custo_unitario_modulo"],
+        "quantidade_inversor": equipamentos["quantidade_inversor"],
+        "custo_unitario_inversor": equipamentos["custo_unitario_inversor"],
+        "custo_estrutura": equipamentos["custo_estrutura"],
+        "custo_cabos": equipamentos["custo_cabos"],
+        "ajuste_telhas": equipamentos["ajuste_telhas"],
+        "ajuste_padrao_entrada": equipamentos["ajuste_padrao_entrada"],
+        "custo_base_por_kw": comercial["custo_base_por_kw"],
+        "percentual_indiretos": comercial["percentual_indiretos"],
+        "percentual_margem": comercial["percentual_margem"],
+        "aliquota_impostos": comercial["aliquota_impostos"],
+        "valor_adicional": comercial["valor_adicional"],
+        "forma_desconto": comercial["forma_desconto"],
+        "valor_desconto": comercial["valor_desconto"],
+    }
+    for campo in CAMPOS_PERCENTUAIS:
+        inputs[campo] = inputs[campo] / 100.0
+    return inputs
+
+
+def montar_payload_webhook(formulario: Dict[str, Any], detalhamento: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Payload no formato que o frontend enviava ao webhook (percentuais em %),
+    com valor_proposta e quantidade_modulos calculados pelo servidor.
+    """
+    quantidade_modulos = detalhamento["quantidade_modulos"]
+    return {
+        "deal_id": "",
+        "contact_id": "",
+        "valor_proposta": detalhamento["valor_proposta"],
+        "quantidade_modulos": quantidade_modulos,
+        "cliente": dict(formulario["cliente"]),
+        "negocio": dict(formulario["negocio"]),
+        "consumo": dict(formulario["consumo"]),
+        "equipamentos": {**formulario["equipamentos"], "quantidade_modulos": quantidade_modulos},
+        "comercial": dict(formulario["comercial"]),
+        "observacoes_gerais": formulario.get("observacoes_gerais") or "",
+    }
@@ -0,0 +1,171 @@
+# backend/services/rate_limiter.py
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Limites iniciais (o GHL documenta 100 requisições a cada 10s por location);
+# são corrigidos pelos cabeçalhos X-RateLimit-* das respostas.
+# ------------------------------------------------------------
+GHL_RATE_LIMIT_MAX        = int(os.getenv("GHL_RATE_LIMIT_MAX", "100"))
+GHL_RATE_LIMIT_INTERVALO  = float(os.getenv("GHL_RATE_LIMIT_INTERVALO", "10"))   # segundos
+GHL_RATE_LIMIT_RETRIES    = int(os.getenv("GHL_RATE_LIMIT_RETRIES", "3"))        # novas tentativas após 429
+GHL_RATE_LIMIT_ESPERA_429 = float(os.getenv("GHL_RATE_LIMIT_ESPERA_429", "2"))   # s, quando não há Retry-After
+
+
+def _parse_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Retry-After pode vir em segundos ou como data HTTP."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _inteiro(headers: Mapping[str, str], nome: str) -> Optional[int]:
+    try:
+        return int(float(headers[nome]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket com reserva: cada chamada consome um token na hora e recebe o
+    tempo que deve esperar (o saldo pode ficar negativo). Assim as chamadas
+    ficam em fila na ordem de chegada em vez de falhar, e o mesmo bucket
+    atende código síncrono (time.sleep) e assíncrono (asyncio.sleep).
+    """
+
+    def __init__(self, capacidade: float, intervalo: float, relogio: Callable[[], float] = time.monotonic):
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self.capacidade = float(capacidade)
+        self.taxa = capacidade / intervalo          # tokens por segundo
+        self.tokens = float(capacidade)
+        self.atualizado_em = relogio()
+        self.bloqueado_ate = 0.0
+        self.reservas = 0
+        self.esperas = 0
+        self.respostas_429 = 0
+
+    def _reabastecer(self, agora: float) -> None:
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+
+    def reservar(self) -> float:
+        """Consome um token e devolve quantos segundos o chamador deve aguardar."""
+        with self._lock:
+            agora = self._relogio()
+            self._reabastecer(agora)
+            self.tokens -= 1
+            self.reservas += 1
+            espera = 0.0 if self.tokens >= 0 else -self.tokens / self.taxa
+            espera = max(espera, self.bloqueado_ate - agora)
+            if espera > 0:
+                self.esperas += 1
+            return espera
+
+    def ajustar(self, maximo: Optional[int], intervalo_ms: Optional[int], restantes: Optional[int]) -> None:
+        """Aplica os limites informados pelo servidor."""
+        with self._lock:
+            self._reabastecer(self._relogio())
+            if maximo and intervalo_ms:
+                self.capacidade = float(maximo)
+                self.taxa = maximo / (intervalo_ms / 1000.0)
+            if restantes is not None:
+                self.tokens = min(self.tokens, float(restantes))
+
+    def bloquear(self, segundos: float) -> None:
+        """Suspende novas chamadas por `segundos` (ex.: após um 429)."""
+        with self._lock:
+            agora = self._relogio()
+            self.bloqueado_ate = max(self.bloqueado_ate, agora + segundos)
+            self.tokens = min(self.tokens, 0.0)
+            self.respostas_429 += 1
+
+    def estado(self) -> Dict[str, Any]:
+        with self._lock:
+            self._reabastecer(self._relogio())
+            return {
+                "tokens": round(self.tokens, 2),
+                "capacidade": self.capacidade,
+                "taxa_por_segundo": round(self.taxa, 3),
+                "bloqueado_por_s": round(max(0.0, self.bloqueado_ate - self._relogio()), 2),
+                "reservas": self.reservas,
+                "esperas": self.esperas,
+                "respostas_429": self.respostas_429,
+            }
+
+
+class RateLimiterRegistry:
+    """Um TokenBucket por chave (location ID, ou a agência para chamadas OAuth)."""
+
+    def __init__(self,
+                 maximo: int = GHL_RATE_LIMIT_MAX,
+                 intervalo: float = GHL_RATE_LIMIT_INTERVALO,
+                 max_retries_429: int = GHL_RATE_LIMIT_RETRIES,
+                 espera_429: float = GHL_RATE_LIMIT_ESPERA_429):
+        self.maximo = maximo
+        self.intervalo = intervalo
+        self.max_retries_429 = max_retries_429
+        self.espera_429 = espera_429
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, chave: str) -> TokenBucket:
+        bucket = self._buckets.get(chave)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(chave, TokenBucket(self.maximo, self.intervalo))
+        return bucket
+
+    def aguardar(self, chave: str) -> None:
+        """Bloqueia a thread até haver capacidade para `chave`."""
+        espera = self.bucket(chave).reservar()
+        if espera > 0:
+            time.sleep(espera)
+
+    async def aguardar_async(self, chave: str) -> None:
+        """Como aguardar(), sem bloquear o event loop."""
+        espera = self.bucket(chave).reservar()
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+    def registrar_resposta(self, chave: str, status_code: int, headers: Mapping[str, str], tentativa: int = 0) -> Optional[float]:
+        """
+        Atualiza o bucket a partir dos cabeçalhos X-RateLimit-*. Para um 429,
+        bloqueia a chave e devolve quantos segundos esperar antes de repetir.
+        """
+        bucket = self.bucket(chave)
+        bucket.ajustar(
+            _inteiro(headers, "X-RateLimit-Max"),
+            _inteiro(headers, "X-RateLimit-Interval-Milliseconds"),
+            _inteiro(headers, "X-RateLimit-Remaining"),
+        )
+        if status_code != 429:
+            return None
+        espera = _parse_retry_after(headers.get("Retry-After"))
+        if espera is None:
+            espera = self.espera_429 * (2 ** tentativa)
+        bucket.bloquear(espera)
+        logger.warning("429 para '%s': aguardando %.1fs antes de continuar.", chave, espera)
+        return espera
+
+    def estatisticas(self) -> Dict[str, Dict[str, Any]]:
+        return {chave: bucket.estado() for chave, bucket in list(self._buckets.items())}
+
+
+rate_limiter = RateLimiterRegistry()
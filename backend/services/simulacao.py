@@ -0,0 +1,221 @@
+# backend/services/simulacao.py
+
+import os
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+from services.calculos_lote import calcular_lote, montar_colunas, _mensagem_erro_calculo
+
+# ------------------------------------------------------------
+# Simulação financeira de longo prazo (geração, economia, payback, TIR, VPL)
+# mês a mês, para uma ou milhares de propostas de uma vez: cada grandeza é uma
+# matriz (propostas × meses) calculada por broadcast, sem laço por mês.
+# ------------------------------------------------------------
+SIMULACAO_ANOS = int(os.getenv("SIMULACAO_ANOS", "25"))
+# Propostas simuladas por vez (limita a memória das matrizes propostas × meses)
+SIMULACAO_BLOCO = int(os.getenv("SIMULACAO_BLOCO", "2000"))
+
+# Premissas padrão; cada proposta pode sobrescrever qualquer uma com um campo de mesmo nome
+PARAMETROS_SIMULACAO = {
+    "tarifa_kwh": float(os.getenv("SIMULACAO_TARIFA_KWH", "0.95")),
+    "reajuste_tarifa_anual": float(os.getenv("SIMULACAO_REAJUSTE_TARIFA", "0.06")),
+    "degradacao_anual": float(os.getenv("SIMULACAO_DEGRADACAO_ANUAL", "0.005")),
+    # Fração da geração consumida no momento (economia pela tarifa cheia)
+    "taxa_simultaneidade": float(os.getenv("SIMULACAO_TAXA_SIMULTANEIDADE", "0.30")),
+    # Fração da tarifa abatida por kWh injetado na rede (descontado o fio B)
+    "fator_credito_injetada": float(os.getenv("SIMULACAO_FATOR_CREDITO", "0.85")),
+    "taxa_desconto_anual": float(os.getenv("SIMULACAO_TAXA_DESCONTO", "0.10")),
+}
+
+# Resumo de uma linha acrescentado aos lotes (/calcular/lote, /calcular/stream)
+CAMPOS_RESUMO = ("payback_meses", "tir_anual", "vpl", "economia_primeiro_ano", "economia_total")
+
+TIR_ITERACOES = 50
+TIR_TOLERANCIA = 1e-10
+
+
+def _premissas_linha(linha: Dict[str, Any], premissas: Dict[str, float]) -> Dict[str, float]:
+    """Premissas de uma proposta (as do lote, sobrescritas pelas da linha), já como float."""
+    valores = {}
+    for campo, padrao in premissas.items():
+        bruto = linha.get(campo)
+        try:
+            valor = float(padrao if bruto is None else bruto)
+        except (TypeError, ValueError):
+            valor = np.nan
+        if not np.isfinite(valor):
+            raise ValueError(f"Premissa de simulação inválida para '{campo}': {bruto!r}.")
+        valores[campo] = valor
+    return valores
+
+
+def _tir_mensal(fluxos: np.ndarray) -> np.ndarray:
+    """
+    TIR mensal de cada linha de `fluxos` (investimento no mês 0, economias depois),
+    por Newton vetorizado a partir de 0. Só é chamada para fluxos que se pagam
+    (soma >= 0) com investimento positivo: o VPL é convexo e decrescente na taxa
+    e positivo em 0, então a iteração converge pela esquerda sem passar da raiz.
+    Linhas que não convergirem em TIR_ITERACOES voltam NaN.
+    """
+    meses = np.arange(fluxos.shape[1], dtype=np.float64)
+    taxa = np.zeros(fluxos.shape[0])
+    passo = np.full(fluxos.shape[0], np.inf)
+    for _ in range(TIR_ITERACOES):
+        desconto = np.exp(-meses * np.log1p(taxa)[:, None])
+        vpl = (fluxos * desconto).sum(axis=1)
+        derivada = -(meses * fluxos * desconto).sum(axis=1) / (1 + taxa)
+        passo = vpl / derivada
+        taxa = taxa - passo
+        if np.all(np.abs(passo) < TIR_TOLERANCIA):
+            break
+    convergiu = np.isfinite(taxa) & (np.abs(passo) < TIR_TOLERANCIA)
+    return np.where(convergiu, taxa, np.nan)
+
+
+def _simular_bloco(resultado: Dict[str, np.ndarray], colunas: Dict[str, Any], parametros: Dict[str, np.ndarray],
+                   anos: int) -> Dict[str, np.ndarray]:
+    """Séries mensais e indicadores de um bloco de propostas já precificadas."""
+    meses = anos * 12
+    ano = (np.arange(meses) // 12)[None, :]
+
+    # Geração nas mesmas premissas do dimensionamento (kWh/dia × 30), caindo com a degradação
+    potencia_instalada_kw = resultado["quantidade_modulos"] * colunas["potencia_modulos_w"] / 1000.0
+    geracao_base = potencia_instalada_kw * colunas["indice_irrad"] * colunas["taxa_desempenho"] * 30.0
+    geracao = geracao_base[:, None] * (1 - parametros["degradacao_anual"][:, None]) ** ano
+
+    # Autoconsumo vale a tarifa cheia; o excedente injetado gera crédito até cobrir o consumo
+    consumo = colunas["consumo_medio_mensal"][:, None]
+    autoconsumo = np.minimum(geracao * parametros["taxa_simultaneidade"][:, None], consumo)
+    compensada = np.minimum(geracao - autoconsumo, consumo - autoconsumo)
+    tarifa = parametros["tarifa_kwh"][:, None] * (1 + parametros["reajuste_tarifa_anual"][:, None]) ** ano
+    economia = (autoconsumo + compensada * parametros["fator_credito_injetada"][:, None]) * tarifa
+
+    investimento = resultado["valor_proposta"]
+    acumulado = np.cumsum(economia, axis=1) - investimento[:, None]
+
+    # Payback: primeiro mês com saldo >= 0, interpolando dentro do mês
+    pago = acumulado >= 0
+    se_paga = pago.any(axis=1)
+    mes = pago.argmax(axis=1)
+    linhas = np.arange(len(investimento))
+    saldo_anterior = np.where(mes > 0, acumulado[linhas, mes - 1], -investimento)
+    payback_meses = np.where(se_paga, mes + (-saldo_anterior) / economia[linhas, mes], np.nan)
+
+    fluxos = np.concatenate([-investimento[:, None], economia], axis=1)
+    # Sem investimento (<= 0) o VPL não tem raiz: a TIR não existe
+    com_tir = se_paga & (investimento > 0)
+    tir_anual = np.full(len(investimento), np.nan)
+    if com_tir.any():
+        tir_anual[com_tir] = (1 + _tir_mensal(fluxos[com_tir])) ** 12 - 1
+
+    taxa_mensal = (1 + parametros["taxa_desconto_anual"]) ** (1 / 12) - 1
+    desconto = (1 + taxa_mensal[:, None]) ** -np.arange(meses + 1)[None, :]
+    vpl = (fluxos * desconto).sum(axis=1)
+
+    return {
+        "potencia_instalada_kw": potencia_instalada_kw,
+        "geracao": geracao,
+        "economia": economia,
+        "acumulado": acumulado,
+        "payback_meses": payback_meses,
+        "tir_anual": tir_anual,
+        "vpl": vpl,
+    }
+
+
+def _valor_ou_none(valor: float, casas: int) -> Optional[float]:
+    return round(valor, casas) if np.isfinite(valor) else None
+
+
+def simular_propostas(linhas: Sequence[Dict[str, Any]],
+                      parametros: Optional[Dict[str, float]] = None,
+                      anos: int = SIMULACAO_ANOS,
+                      mensal: bool = False) -> List[Dict[str, Any]]:
+    """
+    Simula `anos` de geração e economia de cada proposta (o mesmo dict de
+    calcular_valor_proposta, mais as premissas de PARAMETROS_SIMULACAO que
+    mudarem por proposta). O investimento é o valor_proposta da linha, se
+    informado, ou o calculado pelo motor em lote.
+
+    Devolve, por proposta, os indicadores (payback, TIR, VPL, totais) e as
+    séries anuais; com `mensal`, também as séries mês a mês. Linhas inválidas
+    voltam com "erro" sem impedir as demais.
+    """
+    if not linhas:
+        return []
+    if anos < 1:
+        raise ValueError("A simulação precisa de ao menos 1 ano.")
+    premissas = {**PARAMETROS_SIMULACAO, **(parametros or {})}
+
+    saida: List[Dict[str, Any]] = []
+    for inicio in range(0, len(linhas), max(1, SIMULACAO_BLOCO)):
+        bloco = linhas[inicio:inicio + max(1, SIMULACAO_BLOCO)]
+        colunas = montar_colunas(bloco)
+        erros = colunas.pop("erros")
+        # Premissas e investimento lidos linha a linha: um valor inválido só invalida a própria linha
+        valores = []
+        investimento = np.full(len(bloco), np.nan)
+        for i, linha in enumerate(bloco):
+            try:
+                valores.append(_premissas_linha(linha, premissas))
+            except ValueError as e:
+                erros.setdefault(i, str(e))
+                valores.append(dict.fromkeys(premissas, np.nan))
+            if linha.get("valor_proposta") is not None:
+                try:
+                    investimento[i] = float(linha["valor_proposta"])
+                except (TypeError, ValueError):
+                    erros.setdefault(i, f"Valor inválido para 'valor_proposta': {linha['valor_proposta']!r}.")
+        por_proposta = {campo: np.array([v[campo] for v in valores], dtype=np.float64) for campo in premissas}
+
+        resultado = calcular_lote(colunas)
+        resultado["valor_proposta"] = np.where(np.isnan(investimento), resultado["valor_proposta"], investimento)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            simulacao = _simular_bloco(resultado, colunas, por_proposta, anos)
+
+        anuais = {
+            "geracao_kwh": simulacao["geracao"].reshape(len(bloco), anos, 12).sum(axis=2),
+            "economia": simulacao["economia"].reshape(len(bloco), anos, 12).sum(axis=2),
+            "saldo_acumulado": simulacao["acumulado"][:, 11::12],
+        }
+        validos = resultado["valido"] & np.isfinite(resultado["valor_proposta"])
+        for i in range(len(bloco)):
+            indice = inicio + i
+            if i in erros:
+                saida.append({"indice": indice, "erro": erros[i]})
+                continue
+            if not validos[i]:
+                saida.append({"indice": indice, "erro": _mensagem_erro_calculo(float(resultado["geracao_modulo"][i]))})
+                continue
+            payback = float(simulacao["payback_meses"][i])
+            item = {
+                "indice": indice,
+                "investimento": round(float(resultado["valor_proposta"][i]), 2),
+                "quantidade_modulos": int(resultado["quantidade_modulos"][i]),
+                "potencia_instalada_kw": round(float(simulacao["potencia_instalada_kw"][i]), 3),
+                "geracao_total_kwh": round(float(anuais["geracao_kwh"][i].sum()), 1),
+                "economia_primeiro_ano": round(float(anuais["economia"][i, 0]), 2),
+                "economia_total": round(float(anuais["economia"][i].sum()), 2),
+                "payback_meses": _valor_ou_none(payback, 1),
+                "payback_anos": _valor_ou_none(payback / 12, 2),
+                "tir_anual": _valor_ou_none(float(simulacao["tir_anual"][i]), 6),
+                "vpl": _valor_ou_none(float(simulacao["vpl"][i]), 2),
+                "anual": {
+                    "geracao_kwh": np.round(anuais["geracao_kwh"][i], 1).tolist(),
+                    "economia": np.round(anuais["economia"][i], 2).tolist(),
+                    "saldo_acumulado": np.round(anuais["saldo_acumulado"][i], 2).tolist(),
+                },
+            }
+            if mensal:
+                item["mensal"] = {
+                    "geracao_kwh": np.round(simulacao["geracao"][i], 1).tolist(),
+                    "economia": np.round(simulacao["economia"][i], 2).tolist(),
+                    "saldo_acumulado": np.round(simulacao["acumulado"][i], 2).tolist(),
+                }
+            saida.append(item)
+    return saida
+
+
+def resumir_simulacao(simulacao: Dict[str, Any]) -> Dict[str, Any]:
+    """Só os indicadores de CAMPOS_RESUMO (sem as séries), para respostas em lote."""
+    return {campo: simulacao.get(campo) for campo in CAMPOS_RESUMO}
@@ -0,0 +1,234 @@
+# backend/services/token_db.py
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Banco SQLite com o token da agência e uma linha por location.
+# Substitui gohighlevel_token.json e installed_locations_data.json.
+# ------------------------------------------------------------
+TOKENS_DB_PATH = os.getenv("TOKENS_DB_PATH", os.path.join(os.path.dirname(__file__), "..", "tokens.db"))
+
+# Arquivos JSON antigos (usados só pelo importador)
+AGENCY_TOKEN_FILE   = os.path.join(os.path.dirname(__file__), "..", "gohighlevel_token.json")
+LOCATIONS_DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "installed_locations_data.json")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agency_token (
+    id            INTEGER PRIMARY KEY CHECK (id = 1),
+    dados         TEXT    NOT NULL,
+    atualizado_em REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS locations (
+    location_id   TEXT PRIMARY KEY,
+    dados         TEXT NOT NULL,   -- registro de /oauth/installedLocations (sem o token)
+    token_data    TEXT,            -- antigo campo "location_specific_token_data"
+    atualizado_em REAL NOT NULL
+);
+-- Processo que renova os tokens (refresh tokens do GHL são de uso único: só um pode renovar)
+CREATE TABLE IF NOT EXISTS refresh_lider (
+    id        INTEGER PRIMARY KEY CHECK (id = 1),
+    dono      TEXT    NOT NULL,
+    expira_em REAL    NOT NULL
+);
+"""
+
+CAMPO_TOKEN = "location_specific_token_data"
+
+
+def _id_da_location(loc: Dict[str, Any]) -> Optional[str]:
+    return loc.get("_id") or loc.get("id")
+
+
+class TokenDB:
+    """
+    Armazena os tokens em SQLite (WAL): leituras concorrentes de vários
+    workers da API e escritas pequenas e transacionais, uma location por vez.
+    """
+
+    def __init__(self, caminho: str = TOKENS_DB_PATH):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._conexao().executescript(_SCHEMA)
+        # Conexão só de leitura da versão: nunca escreve, então seu PRAGMA
+        # data_version muda a cada commit de qualquer outra conexão (deste ou de
+        # outro processo). Compartilhada entre threads, protegida pelo lock.
+        self._sentinela = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock_sentinela = threading.Lock()
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def versao(self) -> int:
+        """
+        Muda sempre que alguma escrita é confirmada no banco, por qualquer
+        processo. Lida da memória compartilhada do WAL, sem consultar tabelas:
+        serve para validar caches em memória a cada consulta.
+        """
+        with self._lock_sentinela:
+            return self._sentinela.execute("PRAGMA data_version").fetchone()[0]
+
+    # --- Token da agência ---
+
+    def get_agency_token(self) -> Optional[Dict[str, Any]]:
+        linha = self._conexao().execute("SELECT dados FROM agency_token WHERE id = 1").fetchone()
+        return json.loads(linha["dados"]) if linha else None
+
+    def salvar_agency_token(self, dados: Dict[str, Any]) -> None:
+        self._conexao().execute(
+            "INSERT INTO agency_token (id, dados, atualizado_em) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET dados = excluded.dados, atualizado_em = excluded.atualizado_em",
+            (json.dumps(dados, ensure_ascii=False), time.time()),
+        )
+
+    # --- Liderança do refresh ---
+
+    def adquirir_lideranca(self, dono: str, duracao: float) -> bool:
+        """
+        Assume (ou renova) a liderança do refresh por `duracao` segundos. Só
+        consegue se ninguém a tiver, se ela já for de `dono` ou se a do atual
+        líder tiver vencido (processo encerrado sem liberar).
+        """
+        conn = self._conexao()
+        agora = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conn.execute("SELECT dono, expira_em FROM refresh_lider WHERE id = 1").fetchone()
+            if linha and linha["dono"] != dono and linha["expira_em"] > agora:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT INTO refresh_lider (id, dono, expira_em) VALUES (1, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em",
+                (dono, agora + duracao),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def liberar_lideranca(self, dono: str) -> None:
+        self._conexao().execute("DELETE FROM refresh_lider WHERE id = 1 AND dono = ?", (dono,))
+
+    # --- Locations ---
+
+    @staticmethod
+    def _linha_para_location(linha: sqlite3.Row) -> Dict[str, Any]:
+        """Remonta o registro no mesmo formato do antigo installed_locations_data.json."""
+        loc = json.loads(linha["dados"])
+        if linha["token_data"]:
+            loc[CAMPO_TOKEN] = json.loads(linha["token_data"])
+        return loc
+
+    def sincronizar_locations(self, lista: List[Dict[str, Any]]) -> int:
+        """
+        Grava a lista de installed locations numa única transação: insere/atualiza
+        os dados de cada uma (preservando o token já salvo) e remove as que
+        não estão mais instaladas. Devolve quantas locations ficaram no banco.
+        """
+        agora = time.time()
+        registros = []
+        for loc in lista:
+            location_id = _id_da_location(loc)
+            if location_id:
+                dados = {k: v for k, v in loc.items() if k != CAMPO_TOKEN}
+                registros.append((location_id, json.dumps(dados, ensure_ascii=False), agora))
+
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO locations (location_id, dados, atualizado_em) VALUES (?, ?, ?) "
+                "ON CONFLICT(location_id) DO UPDATE SET dados = excluded.dados, atualizado_em = excluded.atualizado_em",
+                registros,
+            )
+            ids = [r[0] for r in registros]
+            if ids:
+                conn.execute(f"DELETE FROM locations WHERE location_id NOT IN ({','.join('?' * len(ids))})", ids)
+            else:
+                conn.execute("DELETE FROM locations")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(registros)
+
+    def salvar_token_location(self, location_id: str, token_data: Dict[str, Any]) -> bool:
+        """Atualiza só o token de uma location. Devolve False se a location não existir."""
+        cur = self._conexao().execute(
+            "UPDATE locations SET token_data = ?, atualizado_em = ? WHERE location_id = ?",
+            (json.dumps(token_data, ensure_ascii=False), time.time(), location_id),
+        )
+        return cur.rowcount > 0
+
+    def get_location(self, location_id: str) -> Optional[Dict[str, Any]]:
+        linha = self._conexao().execute(
+            "SELECT dados, token_data FROM locations WHERE location_id = ?", (location_id,)
+        ).fetchone()
+        return self._linha_para_location(linha) if linha else None
+
+    def listar_locations(self) -> List[Dict[str, Any]]:
+        linhas = self._conexao().execute(
+            "SELECT dados, token_data FROM locations ORDER BY location_id"
+        ).fetchall()
+        return [self._linha_para_location(linha) for linha in linhas]
+
+    def vazio(self) -> bool:
+        conn = self._conexao()
+        return (conn.execute("SELECT 1 FROM agency_token LIMIT 1").fetchone() is None
+                and conn.execute("SELECT 1 FROM locations LIMIT 1").fetchone() is None)
+
+    # --- Importação dos JSON antigos ---
+
+    def importar_json(self,
+                      agency_token_file: str = AGENCY_TOKEN_FILE,
+                      locations_data_file: str = LOCATIONS_DATA_FILE) -> Tuple[bool, int]:
+        """
+        Importa gohighlevel_token.json e installed_locations_data.json (nos dois
+        formatos: lista ou {"locations": [...]}). Devolve (agência importada?, nº de locations).
+        """
+        agencia_importada = False
+        if os.path.exists(agency_token_file):
+            with open(agency_token_file, "r", encoding="utf-8") as f:
+                self.salvar_agency_token(json.load(f))
+            agencia_importada = True
+
+        total_locations = 0
+        if os.path.exists(locations_data_file):
+            with open(locations_data_file, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            lista = raw.get("locations", []) if isinstance(raw, dict) else raw
+            total_locations = self.sincronizar_locations(lista)
+            for loc in lista:
+                location_id = _id_da_location(loc)
+                if location_id and loc.get(CAMPO_TOKEN):
+                    self.salvar_token_location(location_id, loc[CAMPO_TOKEN])
+        return agencia_importada, total_locations
+
+
+def _abrir_token_db() -> TokenDB:
+    """Abre o banco e, na primeira execução (banco vazio), importa os JSON antigos."""
+    db = TokenDB()
+    if db.vazio() and (os.path.exists(AGENCY_TOKEN_FILE) or os.path.exists(LOCATIONS_DATA_FILE)):
+        agencia, total = db.importar_json()
+        logger.info("Banco de tokens criado a partir dos JSON antigos (agência: %s, locations: %s).",
+                    "sim" if agencia else "não", total)
+    return db
+
+
+token_db = _abrir_token_db()
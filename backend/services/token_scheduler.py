@@ -0,0 +1,193 @@
+# backend/services/token_scheduler.py
+
+import os
+import time
+import uuid
+import random
+import socket
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from services.ghl_client import load_agency_token, refresh_agency_token, refresh_location_token
+from services.location_tokens import location_token_store
+from services.token_db import TokenDB, token_db
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Configuração do agendador (variáveis opcionais no .env)
+# ------------------------------------------------------------
+TOKEN_REFRESH_ATIVO       = os.getenv("TOKEN_REFRESH_ATIVO", "true").lower() in ("1", "true", "sim", "yes")
+TOKEN_REFRESH_MARGEM      = float(os.getenv("TOKEN_REFRESH_MARGEM", "1800"))   # s antes de expirar
+TOKEN_REFRESH_JITTER      = float(os.getenv("TOKEN_REFRESH_JITTER", "600"))    # janela para espalhar os refreshes
+TOKEN_REFRESH_ESPERA_MAX  = float(os.getenv("TOKEN_REFRESH_ESPERA_MAX", "60")) # s máximos entre verificações
+TOKEN_REFRESH_RETRY_BASE  = float(os.getenv("TOKEN_REFRESH_RETRY_BASE", "30")) # s após a 1ª falha (dobra a cada falha)
+TOKEN_REFRESH_LIDERANCA   = float(os.getenv("TOKEN_REFRESH_LIDERANCA", "180")) # validade da liderança do refresh
+
+AGENCIA = "agencia"
+LOCATION = "location"
+
+
+def _expiracao(token_data: Optional[dict]) -> Optional[float]:
+    """Momento (unix) em que o token expira, se o registro tiver essa informação."""
+    if not token_data:
+        return None
+    emitido_em = token_data.get("refreshed_at_unix_timestamp")
+    expira_em_s = token_data.get("expires_in")
+    if emitido_em is None or expira_em_s is None:
+        return None
+    return float(emitido_em) + float(expira_em_s)
+
+
+class TokenRefreshScheduler:
+    """
+    Renova o token da agência e os tokens de location antes que expirem.
+    Cada token é renovado `margem` segundos antes da expiração, menos um
+    deslocamento determinístico de até `jitter` segundos, para que tokens
+    emitidos juntos não sejam renovados todos no mesmo instante.
+
+    Com vários processos da API, só o líder (liderança com prazo no banco de
+    tokens) renova: o refresh_token da agência é de uso único, e dois
+    processos renovando juntos invalidariam a cadeia. Os demais só acompanham
+    e assumem se o líder parar de renovar a liderança.
+    """
+
+    def __init__(self,
+                 margem: float = TOKEN_REFRESH_MARGEM,
+                 jitter: float = TOKEN_REFRESH_JITTER,
+                 espera_max: float = TOKEN_REFRESH_ESPERA_MAX,
+                 retry_base: float = TOKEN_REFRESH_RETRY_BASE,
+                 lideranca: float = TOKEN_REFRESH_LIDERANCA,
+                 db: TokenDB = token_db):
+        self.margem = margem
+        self.jitter = jitter
+        self.espera_max = espera_max
+        self.retry_base = retry_base
+        # A liderança precisa durar mais que o maior intervalo entre renovações dela
+        self.lideranca = max(lideranca, 2 * espera_max)
+        self.db = db
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lider = False
+        self._falhas: Dict[str, Dict[str, Any]] = {}
+        self._vistos_em: Dict[str, float] = {}
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def _deslocamento(self, chave: str, expira_em: Optional[float]) -> float:
+        # Mesmo token -> mesmo deslocamento, então a agenda não "pula" entre verificações
+        return random.Random(f"{chave}:{expira_em}").uniform(0, self.jitter)
+
+    def _agendar(self, tipo: str, token_id: str, token_data: Optional[dict], agora: float) -> Dict[str, Any]:
+        chave = f"{tipo}:{token_id}"
+        expira_em = _expiracao(token_data)
+        deslocamento = self._deslocamento(chave, expira_em)
+        if expira_em is None:
+            # Sem data de emissão (registro antigo ou com erro): renova logo, espalhando na janela de jitter
+            proximo = self._vistos_em.setdefault(chave, agora) + deslocamento
+        else:
+            proximo = expira_em - self.margem - deslocamento
+
+        falha = self._falhas.get(chave)
+        if falha:
+            proximo = max(proximo, falha["tentar_novamente_em"])
+
+        return {
+            "tipo": tipo,
+            "id": token_id,
+            "expira_em": expira_em,
+            "proximo_refresh_em": proximo,
+            "falhas_consecutivas": falha["quantidade"] if falha else 0,
+            "ultimo_erro": falha["erro"] if falha else None,
+        }
+
+    def agenda(self) -> List[Dict[str, Any]]:
+        """Próximo refresh planejado de cada token (agência primeiro)."""
+        agora = time.time()
+        itens = []
+        agencia = load_agency_token()
+        if agencia:
+            itens.append(self._agendar(AGENCIA, agencia.get("companyId") or AGENCIA, agencia, agora))
+        for loc in location_token_store.listar():
+            location_id = loc.get("_id") or loc.get("id")
+            if location_id:
+                itens.append(self._agendar(LOCATION, location_id, loc.get("location_specific_token_data"), agora))
+        return itens
+
+    def _registrar_resultado(self, item: Dict[str, Any], sucesso: bool) -> None:
+        chave = f"{item['tipo']}:{item['id']}"
+        agora = time.time()
+        if sucesso:
+            self._falhas.pop(chave, None)
+            # Se o novo registro ainda vier sem expiração, só tenta de novo depois de `margem`
+            self._vistos_em[chave] = agora + self.margem
+            return
+        quantidade = self._falhas.get(chave, {}).get("quantidade", 0) + 1
+        espera = min(self.margem / 2, self.retry_base * (2 ** (quantidade - 1)))
+        self._falhas[chave] = {
+            "quantidade": quantidade,
+            "tentar_novamente_em": agora + espera,
+            "erro": "Falha ao renovar o token; veja os logs do GHL.",
+        }
+
+    async def _renovar(self, item: Dict[str, Any]) -> None:
+        logger.info("Renovando token de %s %s...", item["tipo"], item["id"])
+        if item["tipo"] == AGENCIA:
+            sucesso = await asyncio.to_thread(refresh_agency_token)
+        else:
+            sucesso = await asyncio.to_thread(refresh_location_token, item["id"])
+        self._registrar_resultado(item, sucesso)
+
+    async def _garantir_lideranca(self) -> bool:
+        lider = await asyncio.to_thread(self.db.adquirir_lideranca, self.dono, self.lideranca)
+        if lider != self.lider:
+            logger.info("Este processo %s a renovação de tokens.", "assumiu" if lider else "deixou")
+        self.lider = lider
+        return lider
+
+    async def executar_pendentes(self) -> float:
+        """Renova os tokens vencidos na agenda e devolve quantos segundos esperar até a próxima verificação."""
+        if not await self._garantir_lideranca():
+            return self.espera_max
+        agenda = self.agenda()
+        agora = time.time()
+        # Agência primeiro: os tokens de location são emitidos com o token da agência
+        for item in agenda:
+            if item["proximo_refresh_em"] <= agora:
+                # Cada refresh pode demorar: confirma a liderança antes de cada um
+                if not await self._garantir_lideranca():
+                    return self.espera_max
+                await self._renovar(item)
+        agenda = self.agenda()
+        if not agenda:
+            return self.espera_max
+        proximo = min(item["proximo_refresh_em"] for item in agenda)
+        return max(1.0, min(self.espera_max, proximo - time.time()))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                espera = await self.executar_pendentes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Erro inesperado no agendador de tokens: %s", e)
+                espera = self.espera_max
+            await asyncio.sleep(espera)
+
+    def iniciar(self) -> None:
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._loop())
+            logger.info("Agendador iniciado (margem %.0fs, jitter %.0fs).", self.margem, self.jitter)
+
+    async def parar(self) -> None:
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        if self.lider:
+            # Libera já, para outro processo assumir sem esperar a liderança vencer
+            await asyncio.to_thread(self.db.liberar_lideranca, self.dono)
+            self.lider = False
+
+
+token_scheduler = TokenRefreshScheduler()
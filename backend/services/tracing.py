@@ -0,0 +1,224 @@
+# backend/services/tracing.py
+
+import os
+import json
+import time
+import queue
+import uuid
+import atexit
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from services.logging_config import id_correlacao
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Configuração do tracing (via .env)
+# ------------------------------------------------------------
+TRACING_ATIVO = os.getenv("TRACING_ATIVO", "true").lower() in ("1", "true", "sim", "yes")
+TRACING_BUFFER = int(os.getenv("TRACING_BUFFER", "5000"))          # spans mantidos em memória
+TRACING_ARQUIVO = os.getenv("TRACING_ARQUIVO", "")                 # JSONL opcional (um span por linha)
+
+# Span em execução na tarefa/thread atual (pai dos spans abertos dentro dele)
+_span_atual: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span_atual", default=None)
+
+
+class Span:
+    """Uma etapa cronometrada. O trace_id é o ID de correlação dos logs, quando existe."""
+
+    __slots__ = ("nome", "trace_id", "span_id", "pai_id", "inicio", "_inicio_relogio", "duracao_ms",
+                 "atributos", "status", "erro")
+
+    def __init__(self, nome: str, pai: Optional["Span"], atributos: Dict[str, Any]):
+        self.nome = nome
+        self.trace_id = pai.trace_id if pai is not None else (id_correlacao.get() or uuid.uuid4().hex[:16])
+        self.span_id = uuid.uuid4().hex[:16]
+        self.pai_id = pai.span_id if pai is not None else None
+        self.inicio = time.time()
+        self._inicio_relogio = time.perf_counter()
+        self.duracao_ms: Optional[float] = None
+        self.atributos = atributos
+        self.status = "ok"
+        self.erro: Optional[str] = None
+
+    def definir(self, **atributos: Any) -> None:
+        self.atributos.update(atributos)
+
+    def encerrar(self) -> None:
+        self.duracao_ms = round((time.perf_counter() - self._inicio_relogio) * 1000, 3)
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {
+            "nome": self.nome,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "pai_id": self.pai_id,
+            "inicio": self.inicio,
+            "duracao_ms": self.duracao_ms,
+            "status": self.status,
+            "erro": self.erro,
+            "atributos": self.atributos,
+        }
+
+
+class _SpanInativo:
+    """Devolvido com TRACING_ATIVO=false: aceita atributos e não registra nada."""
+
+    def definir(self, **atributos: Any) -> None:
+        pass
+
+
+class ExportadorArquivo:
+    """Grava os spans em JSONL numa thread separada; com a fila cheia o span é descartado."""
+
+    def __init__(self, caminho: str, tamanho_fila: int = 10000):
+        self.caminho = caminho
+        self.descartados = 0
+        self._fila: queue.Queue = queue.Queue(maxsize=tamanho_fila)
+        self._thread = threading.Thread(target=self._escrever, name="exportador-spans", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+
+    def exportar(self, span: Dict[str, Any]) -> None:
+        try:
+            self._fila.put_nowait(span)
+        except queue.Full:
+            self.descartados += 1
+
+    def _escrever(self) -> None:
+        while True:
+            span = self._fila.get()
+            if span is None:
+                return
+            lote = [span]
+            # Escreve em lote o que já estiver na fila (um write por rajada)
+            while len(lote) < 500:
+                try:
+                    proximo = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    self._gravar(lote)
+                    return
+                lote.append(proximo)
+            self._gravar(lote)
+
+    def _gravar(self, lote: List[Dict[str, Any]]) -> None:
+        try:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(s, ensure_ascii=False, default=str) + "\n" for s in lote))
+        except OSError as e:
+            logger.warning("Não foi possível gravar spans em '%s': %s", self.caminho, e)
+
+    def encerrar(self) -> None:
+        if self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join(timeout=5)
+
+
+class Rastreador:
+    """
+    Guarda os spans encerrados num buffer circular (consultado em /debug/traces)
+    e, se configurado, os repassa ao exportador de arquivo.
+    """
+
+    def __init__(self, ativo: bool = TRACING_ATIVO, tamanho: int = TRACING_BUFFER, arquivo: str = TRACING_ARQUIVO):
+        self.ativo = ativo
+        self._buffer: deque = deque(maxlen=tamanho)
+        self._exportador = ExportadorArquivo(arquivo) if ativo and arquivo else None
+
+    @contextmanager
+    def span(self, nome: str, **atributos: Any) -> Iterator[Any]:
+        """Abre um span filho do span atual (ou a raiz de um novo trace)."""
+        if not self.ativo:
+            yield _SpanInativo()
+            return
+        span = Span(nome, _span_atual.get(), atributos)
+        token = _span_atual.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "erro"
+            span.erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _span_atual.reset(token)
+            span.encerrar()
+            # deque.append é atômico: sem lock no caminho da requisição
+            self._buffer.append(span)
+            if self._exportador is not None:
+                self._exportador.exportar(span.para_dict())
+
+    def consultar(self,
+                  trace_id: Optional[str] = None,
+                  nome: Optional[str] = None,
+                  min_duracao_ms: float = 0.0,
+                  limite: int = 50) -> List[Dict[str, Any]]:
+        """
+        Traces mais recentes primeiro, cada um com seus spans em ordem de início.
+        `nome` e `min_duracao_ms` filtram pelo span raiz do trace.
+        """
+        spans = list(self._buffer)
+        por_trace: Dict[str, List[Span]] = {}
+        for span in spans:
+            if trace_id is None or span.trace_id == trace_id:
+                por_trace.setdefault(span.trace_id, []).append(span)
+
+        traces = []
+        for tid, lista in por_trace.items():
+            raiz = next((s for s in lista if s.pai_id is None), None)
+            if raiz is None:
+                # A raiz ainda não terminou (ou já saiu do buffer): usa o span mais antigo
+                raiz = min(lista, key=lambda s: s.inicio)
+            if nome is not None and raiz.nome != nome:
+                continue
+            if (raiz.duracao_ms or 0.0) < min_duracao_ms:
+                continue
+            traces.append({
+                "trace_id": tid,
+                "raiz": raiz.nome,
+                "inicio": raiz.inicio,
+                "duracao_ms": raiz.duracao_ms,
+                "status": "erro" if any(s.status == "erro" for s in lista) else "ok",
+                "spans": [s.para_dict() for s in sorted(lista, key=lambda s: s.inicio)],
+            })
+        traces.sort(key=lambda t: t["inicio"], reverse=True)
+        return traces[:limite]
+
+    def limpar(self) -> None:
+        self._buffer.clear()
+
+
+rastreador = Rastreador()
+
+
+def rastrear(nome: str, **atributos: Any):
+    """Atalho para rastreador.span(...): `with rastrear("etapa", location_id=...) as span:`."""
+    return rastreador.span(nome, **atributos)
+
+
+def rastreado(nome: str) -> Callable:
+    """Decorator que envolve a função (síncrona ou async) num span com o nome dado."""
+
+    def decorar(funcao: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def envolver_async(*args, **kwargs):
+                with rastreador.span(nome):
+                    return await funcao(*args, **kwargs)
+            return envolver_async
+
+        @functools.wraps(funcao)
+        def envolver(*args, **kwargs):
+            with rastreador.span(nome):
+                return funcao(*args, **kwargs)
+        return envolver
+
+    return decorar
@@ -0,0 +1,538 @@
+# backend/services/webhook_queue.py
+
+import os
+import json
+import time
+import random
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import requests
+
+from services.ghl_http import resumo_erro_ghl
+from services.logging_config import id_correlacao
+from services.metrics import metricas
+from services.pipelines import ConfiguracaoPipelineInvalida
+from services.tracing import rastrear
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Configuração da fila (todas as variáveis são opcionais no .env)
+# ------------------------------------------------------------
+FILA_DB_PATH         = os.getenv("FILA_DB_PATH", os.path.join(os.path.dirname(__file__), "..", "fila_webhooks.db"))
+FILA_WORKERS         = int(os.getenv("FILA_WORKERS", "4"))
+FILA_MAX_TENTATIVAS  = int(os.getenv("FILA_MAX_TENTATIVAS", "5"))
+FILA_BACKOFF_BASE    = float(os.getenv("FILA_BACKOFF_BASE", "2"))      # segundos
+FILA_BACKOFF_MAX     = float(os.getenv("FILA_BACKOFF_MAX", "300"))     # segundos
+FILA_INTERVALO_POLL  = float(os.getenv("FILA_INTERVALO_POLL", "1"))    # segundos
+# Intervalo mínimo entre renovações forçadas (após 401) do token de uma mesma location
+FILA_RENOVACAO_TOKEN_INTERVALO = float(os.getenv("FILA_RENOVACAO_TOKEN_INTERVALO", "60"))  # segundos
+# Validade da reserva de um job; o worker a renova enquanto processa. Reserva vencida = dono morreu
+FILA_RESERVA_SEGUNDOS = float(os.getenv("FILA_RESERVA_SEGUNDOS", "120"))
+
+# Estados de um job
+PENDENTE    = "pendente"
+PROCESSANDO = "processando"
+CONCLUIDO   = "concluido"
+FALHOU      = "falhou"      # dead-letter: só volta à fila via reprocessar()
+
+job_duracao = metricas.histograma(
+    "precificacao_fila_job_duracao_segundos",
+    "Duração de cada tentativa de processamento de um job da fila, por resultado.",
+    ("resultado",),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    location_id   TEXT    NOT NULL,
+    payload       TEXT    NOT NULL,
+    status        TEXT    NOT NULL DEFAULT 'pendente',
+    tentativas    INTEGER NOT NULL DEFAULT 0,
+    proximo_em    REAL    NOT NULL,
+    ultimo_erro   TEXT,
+    resultado     TEXT,
+    criado_em     REAL    NOT NULL,
+    atualizado_em REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_jobs_status_proximo ON webhook_jobs (status, proximo_em);
+CREATE TABLE IF NOT EXISTS webhook_idempotencia (
+    chave     TEXT    PRIMARY KEY,
+    job_id    INTEGER NOT NULL,
+    criado_em REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_idempotencia_criado ON webhook_idempotencia (criado_em);
+"""
+
+# Colunas acrescentadas depois da primeira versão (bancos antigos ganham via ALTER TABLE)
+_COLUNAS_NOVAS = {
+    "reservado_por": "TEXT",
+    "reserva_expira_em": "REAL",
+}
+
+
+class WebhookQueue:
+    """
+    Fila durável de webhooks em SQLite (modo WAL). Cada payload recebido vira
+    uma linha; workers reservam jobs com BEGIN IMMEDIATE, então vários
+    processos da API podem consumir a mesma fila sem processar um job duas vezes.
+    Cada reserva registra o dono (processo) e vale por `reserva_segundos`,
+    renovada enquanto o job roda: só reservas vencidas voltam à fila, então um
+    processo que reinicia não toma jobs que outro processo vivo está tratando.
+    """
+
+    def __init__(self,
+                 caminho: str = FILA_DB_PATH,
+                 max_tentativas: int = FILA_MAX_TENTATIVAS,
+                 backoff_base: float = FILA_BACKOFF_BASE,
+                 backoff_max: float = FILA_BACKOFF_MAX,
+                 reserva_segundos: float = FILA_RESERVA_SEGUNDOS):
+        self.caminho = caminho
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.reserva_segundos = reserva_segundos
+        # Identifica este processo como dono das reservas que fizer
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        conn = self._conexao()
+        conn.executescript(_SCHEMA)
+        existentes = {linha["name"] for linha in conn.execute("PRAGMA table_info(webhook_jobs)")}
+        for coluna, tipo in _COLUNAS_NOVAS.items():
+            if coluna not in existentes:
+                conn.execute(f"ALTER TABLE webhook_jobs ADD COLUMN {coluna} {tipo}")
+
+    def _conexao(self) -> sqlite3.Connection:
+        """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _linha_para_dict(linha: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(linha)
+        job["payload"] = json.loads(job["payload"])
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        return job
+
+    def enfileirar(self, location_id: str, payload: Dict[str, Any]) -> int:
+        """Grava o payload como job pendente e devolve o ID do job."""
+        agora = time.time()
+        cur = self._conexao().execute(
+            "INSERT INTO webhook_jobs (location_id, payload, status, proximo_em, criado_em, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (location_id, json.dumps(payload, ensure_ascii=False), PENDENTE, agora, agora, agora),
+        )
+        return cur.lastrowid
+
+    def enfileirar_com_chave(self, chave: str, location_id: str, payload: Dict[str, Any],
+                             ttl_segundos: float, max_chaves: int = 0) -> Tuple[Dict[str, Any], bool]:
+        """
+        Enfileira o payload uma única vez por chave de idempotência. Devolve
+        (job, duplicado): se a chave, registrada há menos de `ttl_segundos`,
+        aponta para um job que ainda existe e não foi para FALHOU, devolve esse
+        job; senão grava um job novo e associa a chave a ele. Consulta e gravação
+        ficam na mesma transação (BEGIN IMMEDIATE), então repetições simultâneas,
+        em qualquer processo, resultam em um só job. Com `max_chaves` > 0, as
+        chaves mais antigas além desse total são apagadas na mesma transação.
+        """
+        agora = time.time()
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM webhook_idempotencia WHERE criado_em < ?", (agora - ttl_segundos,))
+            linha = conn.execute(
+                "SELECT j.* FROM webhook_idempotencia i JOIN webhook_jobs j ON j.id = i.job_id WHERE i.chave = ?",
+                (chave,),
+            ).fetchone()
+            if linha is not None and linha["status"] != FALHOU:
+                conn.execute("COMMIT")
+                return self._linha_para_dict(linha), True
+            job_id = self.enfileirar(location_id, payload)
+            conn.execute(
+                "INSERT OR REPLACE INTO webhook_idempotencia (chave, job_id, criado_em) VALUES (?, ?, ?)",
+                (chave, job_id, agora),
+            )
+            if max_chaves > 0:
+                self._limitar_chaves(conn, max_chaves)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.obter(job_id), False
+
+    @staticmethod
+    def _limitar_chaves(conn: sqlite3.Connection, max_chaves: int) -> None:
+        """
+        Mantém no máximo `max_chaves` chaves, apagando as mais antigas. Cada
+        gravação (inclusive INSERT OR REPLACE) recebe um rowid maior que os
+        existentes, então as `max_chaves` mais novas são as de rowid acima de
+        MAX(rowid) - max_chaves: MIN/MAX e o DELETE usam só a chave primária,
+        sem percorrer a tabela a cada enfileiramento.
+        """
+        menor, maior = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM webhook_idempotencia").fetchone()
+        if maior is not None and maior - menor + 1 > max_chaves:
+            conn.execute("DELETE FROM webhook_idempotencia WHERE rowid <= ?", (maior - max_chaves,))
+
+    def contar_chaves(self) -> int:
+        return self._conexao().execute("SELECT COUNT(*) FROM webhook_idempotencia").fetchone()[0]
+
+    def _descartar_reservas_esgotadas(self, conn: sqlite3.Connection, agora: float) -> int:
+        """
+        Move para FALHOU os jobs 'processando' com a reserva vencida que já
+        usaram todas as tentativas: um payload que derruba ou trava o worker
+        não volta à fila para sempre. Roda dentro da transação de quem chama.
+        """
+        return conn.execute(
+            "UPDATE webhook_jobs SET status = ?, proximo_em = ?, "
+            "ultimo_erro = COALESCE(ultimo_erro, 'Reserva vencida sem conclusão; tentativas esgotadas'), "
+            "reservado_por = NULL, reserva_expira_em = NULL, atualizado_em = ? "
+            "WHERE status = ? AND COALESCE(reserva_expira_em, 0) < ? AND tentativas >= ?",
+            (FALHOU, agora, agora, PROCESSANDO, agora, self.max_tentativas),
+        ).rowcount
+
+    def reservar(self) -> Optional[Dict[str, Any]]:
+        """
+        Marca o próximo job pronto como 'processando' (reservado por este
+        processo) e o devolve, ou None. Jobs 'processando' com a reserva vencida
+        (dono encerrado sem concluir) também contam como prontos, desde que ainda
+        tenham tentativas; os esgotados vão para FALHOU.
+        """
+        conn = self._conexao()
+        agora = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._descartar_reservas_esgotadas(conn, agora)
+            linha = conn.execute(
+                "SELECT * FROM webhook_jobs WHERE status = ? AND proximo_em <= ? "
+                "ORDER BY proximo_em, id LIMIT 1",
+                (PENDENTE, agora),
+            ).fetchone()
+            if linha is None:
+                linha = conn.execute(
+                    "SELECT * FROM webhook_jobs WHERE status = ? AND COALESCE(reserva_expira_em, 0) < ? "
+                    "ORDER BY id LIMIT 1",
+                    (PROCESSANDO, agora),
+                ).fetchone()
+            if linha is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE webhook_jobs SET status = ?, tentativas = tentativas + 1, reservado_por = ?, "
+                "reserva_expira_em = ?, atualizado_em = ? WHERE id = ?",
+                (PROCESSANDO, self.dono, agora + self.reserva_segundos, agora, linha["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = self._linha_para_dict(linha)
+        job["status"] = PROCESSANDO
+        job["tentativas"] += 1
+        job["reservado_por"] = self.dono
+        return job
+
+    def renovar_reserva(self, job_id: int) -> bool:
+        """Estende a reserva de um job deste processo; False se ela já não é nossa."""
+        agora = time.time()
+        return self._conexao().execute(
+            "UPDATE webhook_jobs SET reserva_expira_em = ? WHERE id = ? AND status = ? AND reservado_por = ?",
+            (agora + self.reserva_segundos, job_id, PROCESSANDO, self.dono),
+        ).rowcount == 1
+
+    def liberar(self, job_id: int) -> bool:
+        """Devolve à fila, sem contar tentativa, um job reservado por este processo (ex.: encerramento)."""
+        agora = time.time()
+        return self._conexao().execute(
+            "UPDATE webhook_jobs SET status = ?, tentativas = MAX(tentativas - 1, 0), proximo_em = ?, "
+            "reservado_por = NULL, reserva_expira_em = NULL, atualizado_em = ? "
+            "WHERE id = ? AND status = ? AND reservado_por = ?",
+            (PENDENTE, agora, agora, job_id, PROCESSANDO, self.dono),
+        ).rowcount == 1
+
+    def concluir(self, job_id: int, resultado: Optional[Dict[str, Any]] = None) -> bool:
+        """Marca como concluído um job reservado por este processo; False se a reserva já não é nossa."""
+        return self._conexao().execute(
+            "UPDATE webhook_jobs SET status = ?, resultado = ?, ultimo_erro = NULL, reservado_por = NULL, "
+            "reserva_expira_em = NULL, atualizado_em = ? WHERE id = ? AND status = ? AND reservado_por = ?",
+            (CONCLUIDO, json.dumps(resultado, ensure_ascii=False) if resultado is not None else None, time.time(),
+             job_id, PROCESSANDO, self.dono),
+        ).rowcount == 1
+
+    def falhar(self, job_id: int, erro: str, definitivo: bool = False) -> Optional[str]:
+        """
+        Registra a falha de uma tentativa de um job reservado por este processo.
+        Reagenda com backoff exponencial (com jitter) ou move para FALHOU ao
+        esgotar as tentativas. Devolve o novo status, ou None se a reserva já
+        não é nossa (outro processo assumiu o job e decide o destino dele).
+        """
+        conn = self._conexao()
+        linha = conn.execute("SELECT tentativas FROM webhook_jobs WHERE id = ?", (job_id,)).fetchone()
+        tentativas = linha["tentativas"] if linha else self.max_tentativas
+        agora = time.time()
+        if definitivo or tentativas >= self.max_tentativas:
+            status, proximo_em = FALHOU, agora
+        else:
+            atraso = min(self.backoff_max, self.backoff_base * (2 ** (tentativas - 1)))
+            status, proximo_em = PENDENTE, agora + atraso * random.uniform(0.8, 1.2)
+        atualizados = conn.execute(
+            "UPDATE webhook_jobs SET status = ?, proximo_em = ?, ultimo_erro = ?, reservado_por = NULL, "
+            "reserva_expira_em = NULL, atualizado_em = ? WHERE id = ? AND status = ? AND reservado_por = ?",
+            (status, proximo_em, erro, agora, job_id, PROCESSANDO, self.dono),
+        ).rowcount
+        return status if atualizados == 1 else None
+
+    def recuperar_em_andamento(self) -> int:
+        """
+        Devolve à fila os jobs 'processando' cuja reserva venceu (dono encerrado
+        sem concluir), ou os move para FALHOU se já esgotaram as tentativas.
+        Reservas válidas de outros processos ficam intactas.
+        """
+        conn = self._conexao()
+        agora = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._descartar_reservas_esgotadas(conn, agora)
+            recuperados = conn.execute(
+                "UPDATE webhook_jobs SET status = ?, proximo_em = ?, reservado_por = NULL, reserva_expira_em = NULL, "
+                "atualizado_em = ? WHERE status = ? AND COALESCE(reserva_expira_em, 0) < ?",
+                (PENDENTE, agora, agora, PROCESSANDO, agora),
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return recuperados
+
+    def reprocessar(self, job_ids: Optional[List[int]] = None) -> int:
+        """Recoloca jobs FALHOU na fila, zerando as tentativas (todos, se job_ids for None)."""
+        agora = time.time()
+        sql = "UPDATE webhook_jobs SET status = ?, tentativas = 0, proximo_em = ?, atualizado_em = ? WHERE status = ?"
+        params: List[Any] = [PENDENTE, agora, agora, FALHOU]
+        if job_ids is not None:
+            if not job_ids:
+                return 0
+            sql += f" AND id IN ({','.join('?' * len(job_ids))})"
+            params.extend(job_ids)
+        return self._conexao().execute(sql, params).rowcount
+
+    def obter(self, job_id: int) -> Optional[Dict[str, Any]]:
+        linha = self._conexao().execute("SELECT * FROM webhook_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._linha_para_dict(linha) if linha else None
+
+    def listar(self, status: Optional[str] = None, limite: int = 50) -> List[Dict[str, Any]]:
+        """Jobs mais recentes primeiro, opcionalmente filtrados por status."""
+        if status:
+            linhas = self._conexao().execute(
+                "SELECT * FROM webhook_jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limite)
+            ).fetchall()
+        else:
+            linhas = self._conexao().execute(
+                "SELECT * FROM webhook_jobs ORDER BY id DESC LIMIT ?", (limite,)
+            ).fetchall()
+        return [self._linha_para_dict(linha) for linha in linhas]
+
+    def contar_por_status(self) -> Dict[str, int]:
+        linhas = self._conexao().execute(
+            "SELECT status, COUNT(*) AS total FROM webhook_jobs GROUP BY status"
+        ).fetchall()
+        contagem = {PENDENTE: 0, PROCESSANDO: 0, CONCLUIDO: 0, FALHOU: 0}
+        contagem.update({linha["status"]: linha["total"] for linha in linhas})
+        return contagem
+
+    def limpar_concluidos(self, mais_antigos_que_segundos: float) -> int:
+        """Apaga jobs concluídos há mais tempo que o limite informado."""
+        limite = time.time() - mais_antigos_que_segundos
+        return self._conexao().execute(
+            "DELETE FROM webhook_jobs WHERE status = ? AND atualizado_em < ?", (CONCLUIDO, limite)
+        ).rowcount
+
+
+def status_http(e: Exception) -> Optional[int]:
+    """Status HTTP de um erro do GHL (httpx ou requests), ou None se não for erro HTTP."""
+    response = getattr(e, "response", None)
+    if isinstance(e, (httpx.HTTPStatusError, requests.exceptions.HTTPError)) and response is not None:
+        return response.status_code
+    return None
+
+
+def erro_definitivo(e: Exception) -> bool:
+    """
+    Erros 4xx do GHL não mudam com novas tentativas, exceto 408/429 e 401: token
+    de location expirado ou trocado é resolvido renovando o token e repetindo.
+    Pipeline/stage inexistentes na location também não: dependem de mudar o .env.
+    """
+    if isinstance(e, ConfiguracaoPipelineInvalida):
+        return True
+    status = status_http(e)
+    return status is not None and 400 <= status < 500 and status not in (401, 408, 429)
+
+
+def descrever_erro(e: Exception) -> str:
+    response = getattr(e, "response", None)
+    if response is not None:
+        return resumo_erro_ghl(response)
+    return f"{type(e).__name__}: {e}"
+
+
+class WebhookWorkerPool:
+    """
+    Pool de workers asyncio que drena a WebhookQueue. Cada worker reserva um job,
+    executa `processar(location_id, payload)` e registra sucesso ou falha.
+    Num 401, `renovar_token(location_id)` (se informado) renova o token da
+    location antes da próxima tentativa, no máximo uma vez por intervalo.
+    """
+
+    def __init__(self,
+                 fila: WebhookQueue,
+                 processar: Callable[[str, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]],
+                 quantidade: int = FILA_WORKERS,
+                 intervalo_poll: float = FILA_INTERVALO_POLL,
+                 renovar_token: Optional[Callable[[str], bool]] = None):
+        self.fila = fila
+        self.processar = processar
+        self.quantidade = quantidade
+        self.intervalo_poll = intervalo_poll
+        self.renovar_token = renovar_token
+        self._renovado_em: Dict[str, float] = {}
+        self._lock_renovacao = asyncio.Lock()
+        self._tarefas: List[asyncio.Task] = []
+        self._novo_job: Optional[asyncio.Event] = None
+
+    def iniciar(self) -> None:
+        self._novo_job = asyncio.Event()
+        recuperados = self.fila.recuperar_em_andamento()
+        if recuperados:
+            logger.info("%s job(s) interrompido(s) devolvido(s) à fila.", recuperados)
+        self._tarefas = [asyncio.create_task(self._worker(i)) for i in range(self.quantidade)]
+        logger.info("%s worker(s) iniciado(s) em '%s'.", self.quantidade, self.fila.caminho)
+
+    async def parar(self) -> None:
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    def notificar(self) -> None:
+        """Acorda os workers ociosos (chamado logo após enfileirar)."""
+        if self._novo_job is not None:
+            self._novo_job.set()
+
+    async def _aguardar_trabalho(self) -> None:
+        try:
+            await asyncio.wait_for(self._novo_job.wait(), timeout=self.intervalo_poll)
+        except asyncio.TimeoutError:
+            pass
+        self._novo_job.clear()
+
+    async def _worker(self, numero: int) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.fila.reservar)
+            except sqlite3.Error as e:
+                logger.error("Worker %s: erro ao reservar job: %s", numero, e)
+                job = None
+            if job is None:
+                await self._aguardar_trabalho()
+                continue
+            await self._executar(job)
+
+    async def _executar(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        # Os logs do processamento (contact_manager, ghl_http...) saem com o ID do job
+        token_correlacao = id_correlacao.set(f"job-{job_id}")
+        renovacao = asyncio.create_task(self._manter_reserva(job_id))
+        try:
+            with rastrear("fila.job", job_id=job_id, location_id=job["location_id"], tentativa=job["tentativas"]) as span:
+                span.definir(status_job=await self._processar_job(job))
+        finally:
+            renovacao.cancel()
+            id_correlacao.reset(token_correlacao)
+
+    async def _manter_reserva(self, job_id: int) -> None:
+        """Renova a reserva do job a cada terço da validade enquanto ele é processado."""
+        while True:
+            await asyncio.sleep(self.fila.reserva_segundos / 3)
+            try:
+                if not await asyncio.to_thread(self.fila.renovar_reserva, job_id):
+                    logger.warning("Job %s: a reserva deixou de ser deste processo.", job_id)
+                    return
+            except sqlite3.Error as e:
+                logger.error("Job %s: erro ao renovar a reserva: %s", job_id, e)
+
+    async def _renovar_token_location(self, location_id: str) -> None:
+        """Renova o token da location após um 401, uma vez por intervalo (vários jobs podem falhar juntos)."""
+        if self.renovar_token is None:
+            return
+        async with self._lock_renovacao:
+            agora = time.time()
+            if agora - self._renovado_em.get(location_id, 0.0) < FILA_RENOVACAO_TOKEN_INTERVALO:
+                return
+            self._renovado_em[location_id] = agora
+            logger.warning("401 do GHL: renovando o token da location antes de tentar de novo.",
+                           extra={"location_id": location_id})
+            try:
+                renovado = await asyncio.to_thread(self.renovar_token, location_id)
+            except Exception as e:
+                logger.error("Erro ao renovar o token da location após 401: %s", e, extra={"location_id": location_id})
+                return
+            if not renovado:
+                logger.error("Não foi possível renovar o token da location após 401.", extra={"location_id": location_id})
+
+    async def _processar_job(self, job: Dict[str, Any]) -> str:
+        """Processa o job e devolve o novo status dele na fila."""
+        job_id = job["id"]
+        logger.info("Processando job %s (tentativa %s).", job_id, job["tentativas"],
+                    extra={"location_id": job["location_id"]})
+        inicio = time.perf_counter()
+        try:
+            resultado = await self.processar(job["location_id"], job["payload"])
+        except asyncio.CancelledError:
+            # Encerramento da API: devolve o job à fila agora, em vez de esperar a reserva vencer.
+            # Se parar() cancelar de novo durante a espera, a reserva vencida devolve o job do mesmo jeito
+            try:
+                await asyncio.to_thread(self.fila.liberar, job_id)
+            except sqlite3.Error as e:
+                logger.error("Job %s: erro ao liberar a reserva: %s", job_id, e)
+            raise
+        except Exception as e:
+            job_duracao.observar(time.perf_counter() - inicio, resultado="erro")
+            if status_http(e) == 401:
+                await self._renovar_token_location(job["location_id"])
+            try:
+                status = await asyncio.to_thread(self.fila.falhar, job_id, descrever_erro(e), erro_definitivo(e))
+            except sqlite3.Error as erro_fila:
+                # A reserva vence e o job volta à fila; o worker segue vivo
+                logger.error("Job %s falhou (%s) e não foi possível registrar a falha: %s",
+                             job_id, descrever_erro(e), erro_fila)
+                return PROCESSANDO
+            if status is None:
+                logger.warning("Job %s falhou (%s), mas a reserva já é de outro processo; falha não registrada.",
+                               job_id, descrever_erro(e))
+                return PROCESSANDO
+            logger.warning("Job %s falhou (%s); novo status: %s.", job_id, descrever_erro(e), status)
+            return status
+        job_duracao.observar(time.perf_counter() - inicio, resultado="sucesso")
+        try:
+            concluido = await asyncio.to_thread(self.fila.concluir, job_id, resultado)
+        except sqlite3.Error as e:
+            # A reserva vence e o job volta à fila (será reprocessado); o worker segue vivo
+            logger.error("Job %s processado, mas não foi possível registrar a conclusão: %s", job_id, e)
+            return PROCESSANDO
+        if not concluido:
+            logger.warning("Job %s processado, mas a reserva já é de outro processo; conclusão não registrada.", job_id)
+            return PROCESSANDO
+        logger.info("Job %s concluído.", job_id)
+        return CONCLUIDO
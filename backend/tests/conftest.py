@@ -0,0 +1,15 @@
+# backend/tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+# Bancos e caches dos módulos são abertos na importação: aponta todos para um
+# diretório temporário antes de qualquer import de 'services'
+_DIRETORIO_TESTES = tempfile.mkdtemp(prefix="testes_precificacao_")
+os.environ.setdefault("TOKENS_DB_PATH", os.path.join(_DIRETORIO_TESTES, "tokens.db"))
+os.environ.setdefault("FILA_DB_PATH", os.path.join(_DIRETORIO_TESTES, "fila.db"))
+os.environ.setdefault("CUSTOM_FIELDS_CACHE_DIR", os.path.join(_DIRETORIO_TESTES, "custom_fields"))
+
+# Adiciona o diretório 'backend' ao sys.path para importar o pacote 'services'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
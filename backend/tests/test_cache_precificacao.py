@@ -0,0 +1,18 @@
+# backend/tests/test_cache_precificacao.py
+
+from services.cache_precificacao import chave_canonica
+
+BASE = {"consumo_medio_mensal": 500.0, "potencia_modulos_w": 550, "potencia_sistema_kw": 5.5}
+
+
+def test_padroes_e_campos_extras_nao_mudam_a_chave():
+    assert chave_canonica(BASE) == chave_canonica({**BASE, "percentual_margem": 0.20, "cliente": "x"})
+
+
+def test_forma_de_desconto_normalizada():
+    assert chave_canonica({**BASE, "forma_desconto": "%"}) == chave_canonica({**BASE, "forma_desconto": "Porcentagem"})
+    assert chave_canonica({**BASE, "forma_desconto": "qualquer"}) == chave_canonica(BASE)
+
+
+def test_diferenca_minima_gera_outra_chave():
+    assert chave_canonica(BASE) != chave_canonica({**BASE, "consumo_medio_mensal": 500.0000001})
@@ -0,0 +1,47 @@
+# backend/tests/test_calculos_inverso.py
+
+import pytest
+
+from services.calculos import calcular_valor_proposta
+from services.calculos_inverso import resolver_campo
+
+BASE = {
+    "consumo_medio_mensal": 650.0,
+    "potencia_modulos_w": 550,
+    "potencia_sistema_kw": 6.6,
+    "valor_adicional": 300.0,
+}
+ALVOS = [25000.0, 31234.56, 40000.0]
+
+
+@pytest.mark.parametrize("campo, extras", [
+    ("percentual_margem", {}),
+    ("percentual_margem", {"forma_desconto": "Porcentagem", "valor_desconto": 5.0}),
+    ("valor_adicional", {"forma_desconto": "Valor", "valor_desconto": 1000.0}),
+    ("valor_desconto", {"forma_desconto": "Porcentagem"}),
+    ("valor_desconto", {"forma_desconto": "Valor"}),
+])
+def test_ida_e_volta(campo, extras):
+    base = {**BASE, **extras}
+    for resultado in resolver_campo(base, campo, ALVOS):
+        assert "erro" not in resultado
+        # O valor resolvido, aplicado pelo caminho normal, devolve o alvo (a menos dos centavos)
+        recalculado = calcular_valor_proposta({**base, campo: resultado[campo]})
+        assert recalculado == pytest.approx(resultado["alvo"], abs=0.01)
+        assert resultado["valor_proposta"] == recalculado
+
+
+def test_aviso_quando_o_valor_resolvido_e_negativo():
+    (resultado,) = resolver_campo(BASE, "percentual_margem", [1000.0])
+    assert resultado["percentual_margem"] < 0
+    assert "aviso" in resultado
+
+
+def test_campo_nao_resolvivel():
+    with pytest.raises(ValueError):
+        resolver_campo(BASE, "custo_cabos", ALVOS)
+
+
+def test_desconto_exige_forma_de_desconto():
+    with pytest.raises(ValueError):
+        resolver_campo(BASE, "valor_desconto", ALVOS)
@@ -0,0 +1,64 @@
+# backend/tests/test_calculos_lote.py
+
+import random
+
+import pytest
+
+from services.calculos import calcular_detalhamento_proposta
+from services.calculos_lote import calcular_valor_proposta_lote
+
+FORMAS_DESCONTO = ("Sem Desconto", "Porcentagem", "%", "Valor", "valor")
+
+
+def _propostas_aleatorias(quantidade: int, semente: int = 42):
+    gerador = random.Random(semente)
+    propostas = []
+    for _ in range(quantidade):
+        proposta = {
+            "consumo_medio_mensal": gerador.uniform(50, 5000),
+            "potencia_modulos_w": gerador.choice([330, 450, 550, 585, 610]),
+            "potencia_sistema_kw": gerador.uniform(1, 75),
+            "forma_desconto": gerador.choice(FORMAS_DESCONTO),
+            "valor_desconto": gerador.uniform(0, 15),
+        }
+        # Metade das linhas sobrescreve alguns padrões, a outra usa VALORES_PADRAO
+        if gerador.random() < 0.5:
+            proposta.update({
+                "indice_irrad": gerador.uniform(3, 6),
+                "taxa_desempenho": gerador.uniform(0.6, 0.9),
+                "percentual_margem": gerador.uniform(0, 0.5),
+                "aliquota_impostos": gerador.uniform(0, 0.3),
+                "valor_adicional": gerador.uniform(0, 2000),
+            })
+        propostas.append(proposta)
+    return propostas
+
+
+def test_lote_igual_ao_calculo_escalar_linha_a_linha():
+    propostas = _propostas_aleatorias(500)
+    for proposta, resultado in zip(propostas, calcular_valor_proposta_lote(propostas)):
+        esperado = calcular_detalhamento_proposta(proposta)
+        assert "erro" not in resultado
+        assert resultado["valor_proposta"] == esperado["valor_proposta"]
+        assert resultado["quantidade_modulos"] == esperado["quantidade_modulos"]
+
+
+def test_linhas_invalidas_nao_impedem_as_demais():
+    valida = _propostas_aleatorias(1)[0]
+    sem_campo = {k: v for k, v in valida.items() if k != "potencia_sistema_kw"}
+    texto = {**valida, "consumo_medio_mensal": "abc"}
+    sem_geracao = {**valida, "taxa_desempenho": 0}
+
+    resultados = calcular_valor_proposta_lote([valida, sem_campo, texto, sem_geracao])
+
+    assert resultados[0]["valor_proposta"] == calcular_detalhamento_proposta(valida)["valor_proposta"]
+    assert "potencia_sistema_kw" in resultados[1]["erro"]
+    assert "consumo_medio_mensal" in resultados[2]["erro"]
+    assert "erro" in resultados[3]
+    assert [r["indice"] for r in resultados] == [0, 1, 2, 3]
+    with pytest.raises(ZeroDivisionError):
+        calcular_detalhamento_proposta(sem_geracao)
+
+
+def test_lote_vazio():
+    assert calcular_valor_proposta_lote([]) == []
@@ -0,0 +1,86 @@
+# backend/tests/test_webhook_queue.py
+
+import time
+
+import pytest
+
+from services.webhook_queue import CONCLUIDO, FALHOU, PENDENTE, PROCESSANDO, WebhookQueue
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "fila.db")
+
+
+def test_mesma_chave_enfileira_um_so_job(caminho):
+    fila = WebhookQueue(caminho)
+    job, duplicado = fila.enfileirar_com_chave("chave", "loc", {"a": 1}, ttl_segundos=60)
+    repetido, duplicado_repetido = fila.enfileirar_com_chave("chave", "loc", {"a": 1}, ttl_segundos=60)
+
+    assert not duplicado and duplicado_repetido
+    assert repetido["id"] == job["id"]
+    assert fila.contar_por_status()[PENDENTE] == 1
+
+
+def test_job_em_falhou_libera_a_chave(caminho):
+    fila = WebhookQueue(caminho)
+    job, _ = fila.enfileirar_com_chave("chave", "loc", {}, ttl_segundos=60)
+    fila.reservar()
+    assert fila.falhar(job["id"], "erro", definitivo=True) == FALHOU
+
+    novo, duplicado = fila.enfileirar_com_chave("chave", "loc", {}, ttl_segundos=60)
+    assert not duplicado
+    assert novo["id"] != job["id"]
+
+
+def test_chaves_limitadas_a_max_chaves(caminho):
+    fila = WebhookQueue(caminho)
+    for i in range(10):
+        fila.enfileirar_com_chave(f"chave-{i}", "loc", {}, ttl_segundos=60, max_chaves=4)
+    assert fila.contar_chaves() == 4
+    # As mais novas continuam valendo
+    _, duplicado = fila.enfileirar_com_chave("chave-9", "loc", {}, ttl_segundos=60, max_chaves=4)
+    assert duplicado
+
+
+def test_falhas_vao_para_falhou_ao_esgotar_as_tentativas(caminho):
+    fila = WebhookQueue(caminho, max_tentativas=2, backoff_base=0, backoff_max=0)
+    job_id = fila.enfileirar("loc", {})
+
+    fila.reservar()
+    assert fila.falhar(job_id, "erro 1") == PENDENTE
+    fila.reservar()
+    assert fila.falhar(job_id, "erro 2") == FALHOU
+    assert fila.reservar() is None
+
+    assert fila.reprocessar([job_id]) == 1
+    assert fila.reservar()["tentativas"] == 1
+
+
+def test_reserva_vencida_sem_tentativas_vai_para_falhou(caminho):
+    fila = WebhookQueue(caminho, max_tentativas=2, reserva_segundos=0.01)
+    outro_processo = WebhookQueue(caminho, max_tentativas=2, reserva_segundos=0.01)
+    job_id = fila.enfileirar("loc", {})
+
+    assert fila.reservar()["tentativas"] == 1
+    time.sleep(0.02)
+    assert outro_processo.reservar()["tentativas"] == 2
+    time.sleep(0.02)
+    assert fila.reservar() is None
+    assert fila.obter(job_id)["status"] == FALHOU
+
+
+def test_so_o_dono_da_reserva_conclui_ou_registra_falha(caminho):
+    fila = WebhookQueue(caminho, reserva_segundos=0.01)
+    outro_processo = WebhookQueue(caminho, reserva_segundos=60)
+    job_id = fila.enfileirar("loc", {})
+
+    fila.reservar()
+    time.sleep(0.02)
+    outro_processo.reservar()
+
+    assert fila.concluir(job_id) is False
+    assert fila.falhar(job_id, "erro") is None
+    assert fila.obter(job_id)["status"] == PROCESSANDO
+    assert outro_processo.concluir(job_id, {"ok": True}) is True
+    assert fila.obter(job_id)["status"] == CONCLUIDO
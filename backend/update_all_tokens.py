@@ -1,30 +1,70 @@
 # backend/update_all_tokens.py
 
+import math
+import os
 import time
-from services.ghl_client import refresh_agency_token, get_installed_locations, manage_location_tokens
+from services.ghl_client import (
+    GHL_TOKEN_CONCORRENCIA, refresh_agency_token, get_installed_locations, manage_location_tokens,
+)
+from services.logging_config import configurar_logging
+from services.token_db import token_db
+
+# Mesma liderança do agendador da API: o refresh_token da agência é de uso único
+DONO_LIDERANCA = f"update_all_tokens:{os.getpid()}"
+# Duração base da liderança e o pior caso por "rodada" de /oauth/locationToken
+# (timeout de 20 s da requisição + conexão), usado para dimensionar o passo 3
+LIDERANCA_BASE = 600
+LIDERANCA_POR_RODADA = 25
+
+
+def _renovar_lideranca(duracao: float) -> None:
+    """Renova a liderança antes do próximo passo; aborta se outro processo a assumiu."""
+    if not token_db.adquirir_lideranca(DONO_LIDERANCA, duracao):
+        print("\n>>> Liderança do refresh perdida para outro processo. Abortando.")
+        exit(1)
+
+
+def _duracao_passo_locations() -> float:
+    rodadas = math.ceil(len(token_db.listar_locations()) / max(1, GHL_TOKEN_CONCORRENCIA))
+    return LIDERANCA_BASE + rodadas * LIDERANCA_POR_RODADA
+
 
 if __name__ == "__main__":
+    configurar_logging(formato="texto")
     print(f"=== Iniciando Update Completo de Tokens ({time.strftime('%Y-%m-%d %H:%M:%S')}) ===\n")
 
-    # 1) Atualiza o token da agência
-    if not refresh_agency_token():
-        print("\n>>> FALHA no refresh do token da agência. Verifique os logs acima.")
+    if not token_db.adquirir_lideranca(DONO_LIDERANCA, LIDERANCA_BASE):
+        print(">>> Outro processo (agendador da API) está renovando os tokens agora. "
+              "Pare a API ou desative TOKEN_REFRESH_ATIVO e tente de novo.")
         exit(1)
-    else:
-        print("\n>>> [update_all_tokens] Token da agência atualizado com sucesso.\n")
 
-    # 2) Busca e salva as installed locations
-    if not get_installed_locations():
-        print("\n>>> FALHA ao obter installed locations. Verifique os logs acima.")
-        exit(1)
-    else:
-        print("\n>>> [update_all_tokens] Installed locations obtidas com sucesso.\n")
+    # Libera a liderança em qualquer saída, inclusive nas falhas: senão o
+    # agendador da API fica bloqueado até ela vencer
+    try:
+        # 1) Atualiza o token da agência
+        if not refresh_agency_token():
+            print("\n>>> FALHA no refresh do token da agência. Verifique os logs acima.")
+            exit(1)
+        else:
+            print("\n>>> [update_all_tokens] Token da agência atualizado com sucesso.\n")
 
-    # 3) Para cada installed location, obtém o token e salva no JSON
-    if not manage_location_tokens():
-        print("\n>>> FALHA ao obter tokens de location. Verifique os logs acima.")
-        exit(1)
-    else:
-        print("\n>>> [update_all_tokens] Tokens de todas as locations obtidos com sucesso.\n")
+        # 2) Busca e salva as installed locations
+        _renovar_lideranca(LIDERANCA_BASE)
+        if not get_installed_locations():
+            print("\n>>> FALHA ao obter installed locations. Verifique os logs acima.")
+            exit(1)
+        else:
+            print("\n>>> [update_all_tokens] Installed locations obtidas com sucesso.\n")
+
+        # 3) Para cada installed location, obtém o token e salva no banco de tokens;
+        #    a liderança cobre o pior caso para a quantidade de locations
+        _renovar_lideranca(_duracao_passo_locations())
+        if not manage_location_tokens():
+            print("\n>>> FALHA ao obter tokens de location. Verifique os logs acima.")
+            exit(1)
+        else:
+            print("\n>>> [update_all_tokens] Tokens de todas as locations obtidos com sucesso.\n")
+    finally:
+        token_db.liberar_lideranca(DONO_LIDERANCA)
 
     print("=== update_all_tokens.py concluído com sucesso! ===")
@@ -0,0 +1,83 @@
+# backend/webhook_jobs.py
+
+import argparse
+import json
+import time
+
+from services.webhook_queue import WebhookQueue, FALHOU
+
+
+def _formatar_data(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def cmd_resumo(fila: WebhookQueue, args) -> int:
+    for status, total in fila.contar_por_status().items():
+        print(f"{status:<12} {total}")
+    return 0
+
+
+def cmd_listar(fila: WebhookQueue, args) -> int:
+    jobs = fila.listar(status=args.status, limite=args.limite)
+    if not jobs:
+        print("Nenhum job encontrado.")
+        return 0
+    print(f"{'ID':>6} | {'STATUS':<11} | {'TENT.':>5} | {'LOCATION':<22} | {'ATUALIZADO EM':<19} | ÚLTIMO ERRO")
+    print("-" * 110)
+    for job in jobs:
+        erro = (job["ultimo_erro"] or "").replace("\n", " ")[:60]
+        print(f"{job['id']:>6} | {job['status']:<11} | {job['tentativas']:>5} | {job['location_id']:<22} | "
+              f"{_formatar_data(job['atualizado_em'])} | {erro}")
+    return 0
+
+
+def cmd_mostrar(fila: WebhookQueue, args) -> int:
+    job = fila.obter(args.job_id)
+    if not job:
+        print(f"Job {args.job_id} não encontrado.")
+        return 1
+    print(json.dumps(job, indent=2, ensure_ascii=False))
+    return 0
+
+
+def cmd_reprocessar(fila: WebhookQueue, args) -> int:
+    if not args.todos and not args.job_ids:
+        print("Informe os IDs dos jobs ou use --todos.")
+        return 1
+    total = fila.reprocessar(None if args.todos else args.job_ids)
+    print(f"{total} job(s) com status '{FALHOU}' devolvido(s) à fila. Os workers da API farão o reprocessamento.")
+    return 0
+
+
+def cmd_limpar(fila: WebhookQueue, args) -> int:
+    total = fila.limpar_concluidos(args.dias * 86400)
+    print(f"{total} job(s) concluído(s) há mais de {args.dias} dia(s) removido(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerencia a fila de webhooks (SQLite) da API de Precificação.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    sub.add_parser("resumo", help="Total de jobs por status.").set_defaults(func=cmd_resumo)
+
+    p_listar = sub.add_parser("listar", help="Lista os jobs mais recentes.")
+    p_listar.add_argument("--status", default=None, help=f"Filtra por status (ex.: {FALHOU}).")
+    p_listar.add_argument("--limite", type=int, default=50)
+    p_listar.set_defaults(func=cmd_listar)
+
+    p_mostrar = sub.add_parser("mostrar", help="Exibe um job completo, com payload.")
+    p_mostrar.add_argument("job_id", type=int)
+    p_mostrar.set_defaults(func=cmd_mostrar)
+
+    p_reprocessar = sub.add_parser("reprocessar", help=f"Devolve jobs com status '{FALHOU}' à fila.")
+    p_reprocessar.add_argument("job_ids", type=int, nargs="*")
+    p_reprocessar.add_argument("--todos", action="store_true", help=f"Reprocessa todos os jobs '{FALHOU}'.")
+    p_reprocessar.set_defaults(func=cmd_reprocessar)
+
+    p_limpar = sub.add_parser("limpar", help="Remove jobs concluídos antigos.")
+    p_limpar.add_argument("--dias", type=float, default=7)
+    p_limpar.set_defaults(func=cmd_limpar)
+
+    args = parser.parse_args()
+    exit(args.func(WebhookQueue(), args))